@@ -1,10 +1,16 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import text
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 import os
+import time
 
-from backend.routers import auth, employees, devices, assignments, reports, plans, users
+from backend.database import async_engine, engine, pool_monitors
+from backend.routers import auth, employees, devices, assignments, reports, plans, users, imports
+from backend.services import import_jobs, pdf_jobs, snapshots
+from backend.services.pdf_store import PdfStaticFiles
+from backend.services.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, install_query_hooks, render_prometheus
 
 # Cargar variables de entorno
 load_dotenv()
@@ -25,11 +31,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paginación por cursor (ver backend/services/pagination.py)
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
-# Montar directorio de PDFs generados
-os.makedirs("backend/static/pdfs", exist_ok=True)
-app.mount("/pdfs", StaticFiles(directory="backend/static/pdfs"), name="pdfs")
+# Métricas de peticiones y consultas SQL (ver /metrics)
+app.add_middleware(MetricsMiddleware)
+install_query_hooks(engine)
+if async_engine is not None:
+    install_query_hooks(async_engine)
+
+# Montar directorio de PDFs generados (con ETag, Cache-Control y Range)
+os.makedirs(pdf_jobs.PDF_DIR, exist_ok=True)
+app.mount("/pdfs", PdfStaticFiles(directory=pdf_jobs.PDF_DIR), name="pdfs")
 
 # Registrar routers
 app.include_router(auth.router)
@@ -40,6 +54,20 @@ app.include_router(reports.router)
 app.include_router(reports.router)
 app.include_router(plans.router)
 app.include_router(users.router)
+app.include_router(imports.router)
+
+@app.on_event("startup")
+def start_scheduler():
+    """Foto diaria del inventario (ver GET /reports/snapshots)"""
+    snapshots.start_scheduler()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Esperar a que terminen las actas en generación y las importaciones antes de apagar"""
+    snapshots.shutdown()
+    pdf_jobs.shutdown()
+    import_jobs.shutdown()
+
 
 # Ruta raíz
 @app.get("/")
@@ -57,6 +85,35 @@ async def health_check():
     return {"status": "healthy"}
 
 
+def _pool_snapshots() -> dict:
+    return {name: monitor.snapshot() for name, monitor in pool_monitors.items()}
+
+
+@app.get("/health/db")
+def health_db():
+    """Conectividad con la base de datos y telemetría de los pools de conexiones"""
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        # El detalle (host, usuario, driver) solo va al log: el endpoint no requiere
+        # autenticación. La telemetría de los pools sí se devuelve (diagnóstico de agotamiento)
+        print(f"Health check de base de datos falló: {e!r}")
+        return JSONResponse({"status": "unhealthy", "pools": _pool_snapshots()}, status_code=503)
+    return {
+        "status": "healthy",
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "pools": _pool_snapshots(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas en formato Prometheus (latencia por ruta, consultas SQL y pools)"""
+    return Response(render_prometheus(pool_monitors), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
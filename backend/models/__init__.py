@@ -4,3 +4,6 @@ from backend.models.device import Device
 from backend.models.plan import Plan
 from backend.models.assignment import Assignment
 from backend.models.user_activity import UserActivity
+from backend.models.import_job import ImportJob
+from backend.models.plan_cost_rollup import PlanCostRollup, PlanCostRollupVersion
+from backend.models.fleet_snapshot import FleetSnapshot
@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import enum
 from backend.database import Base
 
 
+class ActaStatus(str, enum.Enum):
+    """Estado de generación de un acta (PDF) en segundo plano"""
+    PENDIENTE = "pendiente"
+    LISTO = "listo"
+    ERROR = "error"
+
+
 class Assignment(Base):
     """Modelo de asignaciones de dispositivos a empleados (historial)"""
     __tablename__ = "assignments"
@@ -16,12 +24,22 @@ class Assignment(Base):
     observaciones = Column(Text, nullable=True)
     acta_entrega_url = Column(String(500), nullable=True)
     acta_remision_url = Column(String(500), nullable=True)
+    acta_entrega_estado = Column(String(20), nullable=True)
+    acta_remision_estado = Column(String(20), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relaciones
-    device = relationship("Device", back_populates="assignments")
-    employee = relationship("Employee", back_populates="assignments")
+    device = relationship("Device", back_populates="assignments", foreign_keys=[device_id])
+    employee = relationship("Employee", back_populates="assignments", foreign_keys=[employee_id])
+
+    __table_args__ = (
+        # Una sola asignación activa por dispositivo, también con peticiones concurrentes
+        Index(
+            "uq_assignments_device_activa", "device_id", unique=True,
+            postgresql_where=fecha_devolucion.is_(None), sqlite_where=fecha_devolucion.is_(None),
+        ),
+    )
 
     def __repr__(self):
         return f"<Assignment(device_id={self.device_id}, employee_id={self.employee_id}, fecha={self.fecha_asignacion})>"
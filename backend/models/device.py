@@ -33,6 +33,12 @@ class Device(Base):
     imei = Column(String(20), nullable=True, unique=True, index=True)
     numero_telefono = Column(String(20), nullable=True, unique=True, index=True)
     plan_id = Column(Integer, ForeignKey("plans.id"), nullable=True)
+    # Asignación activa (la mantiene services/current_assignment.py al asignar y devolver)
+    current_assignment_id = Column(
+        Integer,
+        ForeignKey("assignments.id", ondelete="SET NULL", use_alter=True, name="fk_devices_current_assignment"),
+        nullable=True
+    )
     costo_inicial = Column(Float, nullable=False)
     fecha_compra = Column(Date, nullable=False)
     estado_fisico = Column(Enum(PhysicalCondition), nullable=False, default=PhysicalCondition.NUEVO)
@@ -41,7 +47,9 @@ class Device(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relaciones
-    assignments = relationship("Assignment", back_populates="device", cascade="all, delete-orphan")
+    assignments = relationship("Assignment", back_populates="device", cascade="all, delete-orphan",
+                               foreign_keys="Assignment.device_id")
+    current_assignment = relationship("Assignment", foreign_keys=[current_assignment_id], viewonly=True)
     plan = relationship("Plan")
 
     def __repr__(self):
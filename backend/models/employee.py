@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -22,11 +22,19 @@ class Employee(Base):
     departamento = Column(String(255), nullable=True)
     empresa = Column(String(255), nullable=True)
     estado = Column(Enum(EmployeeStatus), nullable=False, default=EmployeeStatus.ACTIVO)
+    # Primera asignación activa (la de menor id, si tiene varios equipos)
+    current_assignment_id = Column(
+        Integer,
+        ForeignKey("assignments.id", ondelete="SET NULL", use_alter=True, name="fk_employees_current_assignment"),
+        nullable=True
+    )
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relaciones
-    assignments = relationship("Assignment", back_populates="employee", cascade="all, delete-orphan")
+    assignments = relationship("Assignment", back_populates="employee", cascade="all, delete-orphan",
+                               foreign_keys="Assignment.employee_id")
+    current_assignment = relationship("Assignment", foreign_keys=[current_assignment_id], viewonly=True)
 
     def __repr__(self):
         return f"<Employee(nombre='{self.nombre_completo}', cargo='{self.cargo}')>"
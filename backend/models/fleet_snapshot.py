@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime
+from datetime import datetime
+from backend.database import Base
+
+
+class FleetSnapshot(Base):
+    """Foto diaria del inventario: conteos por estado, costo, valor en libros y asignaciones"""
+    __tablename__ = "fleet_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fecha = Column(Date, nullable=False, unique=True, index=True)
+    dispositivos = Column(Integer, nullable=False, default=0)
+    disponibles = Column(Integer, nullable=False, default=0)
+    asignados = Column(Integer, nullable=False, default=0)
+    baja = Column(Integer, nullable=False, default=0)
+    costo_total = Column(Float, nullable=False, default=0)
+    valor_libros = Column(Float, nullable=False, default=0)
+    asignaciones_activas = Column(Integer, nullable=False, default=0)
+    empleados = Column(Integer, nullable=False, default=0)
+    origen = Column(String(20), nullable=False, default="programado")  # programado / manual
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<FleetSnapshot(fecha={self.fecha}, dispositivos={self.dispositivos}, valor=${self.valor_libros})>"
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text
+from datetime import datetime
+import enum
+from backend.database import Base
+
+
+class ImportStatus(str, enum.Enum):
+    """Estado de una importación en segundo plano"""
+    PENDIENTE = "pendiente"
+    PROCESANDO = "procesando"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+
+class ImportJob(Base):
+    """Modelo de importaciones de archivos del plan (progreso y resultado)"""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), nullable=False)
+    estado = Column(String(20), nullable=False, default=ImportStatus.PENDIENTE.value, index=True)
+    dry_run = Column(Boolean, nullable=False, default=False)
+    total_filas = Column(Integer, nullable=True)  # estimado a partir de las dimensiones de las hojas
+    filas_procesadas = Column(Integer, nullable=False, default=0)
+    resultado = Column(JSON, nullable=True)  # conteos por entidad (ver ImportResult)
+    errores = Column(JSON, nullable=True, default=list)  # [{"hoja", "fila", "error"}]
+    mensaje = Column(Text, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ImportJob(id={self.id}, filename='{self.filename}', estado='{self.estado}')>"
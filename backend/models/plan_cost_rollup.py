@@ -0,0 +1,50 @@
+from sqlalchemy import DDL, Column, Integer, String, Float, Date, DateTime, UniqueConstraint, event
+from datetime import datetime
+from backend.database import Base
+
+
+class PlanCostRollup(Base):
+    """
+    Costo mensual de líneas por departamento, ubicación y empresa (meses cerrados)
+
+    Tabla derivada de las asignaciones, ver services/plan_costs.py. Las dimensiones
+    vacías se guardan como "" para que la restricción única cubra también esos grupos.
+    """
+    __tablename__ = "plan_cost_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mes = Column(Date, nullable=False, index=True)  # primer día del mes
+    departamento = Column(String(255), nullable=False, default="")
+    ubicacion = Column(String(255), nullable=False, default="")
+    empresa = Column(String(255), nullable=False, default="")
+    lineas = Column(Integer, nullable=False, default=0)
+    costo_planes = Column(Float, nullable=False, default=0)
+    depreciacion = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("mes", "departamento", "ubicacion", "empresa", name="uq_plan_cost_rollups_grupo"),
+    )
+
+    def __repr__(self):
+        return f"<PlanCostRollup(mes={self.mes}, departamento='{self.departamento}', costo=${self.costo_planes})>"
+
+
+class PlanCostRollupVersion(Base):
+    """
+    Versión de plan_cost_rollups (una sola fila, id 1)
+
+    Cada invalidación la incrementa; el llenado la vuelve a leer con FOR UPDATE antes de
+    su commit y descarta lo calculado si cambió (ver services/plan_costs.py).
+    """
+    __tablename__ = "plan_cost_rollup_version"
+
+    id = Column(Integer, primary_key=True)
+    generacion = Column(Integer, nullable=False, default=0)
+
+
+# La fila se crea junto con la tabla (init_db, upgrade_db)
+event.listen(
+    PlanCostRollupVersion.__table__, "after_create",
+    DDL("INSERT INTO plan_cost_rollup_version (id, generacion) VALUES (1, 0)"),
+)
@@ -1,43 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
-from fastapi.responses import StreamingResponse, FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import date
 import os
-import pandas as pd
-import io
 
-from backend.database import get_db
-from backend.models.assignment import Assignment
+from backend.database import get_db, get_read_db, run_db
+from backend.models.assignment import Assignment, ActaStatus
 from backend.models.device import Device, DeviceStatus
 from backend.models.employee import Employee
 from backend.models.user import User
-from backend.schemas.assignment import AssignmentCreate, AssignmentUpdate, AssignmentResponse, AssignmentWithDetails
+from backend.schemas.assignment import AssignmentCreate, AssignmentUpdate, AssignmentResponse, AssignmentWithDetails, AssignmentPdfStatus, ActaBatchRequest
 from backend.services.auth import get_current_user, get_current_editor
-from backend.services.pdf_generator import generate_acta_entrega, generate_acta_remision
+from backend.services.current_assignment import refresh_current_assignments
+from backend.services.plan_costs import invalidate_plan_cost_rollup
+from backend.services.pdf_jobs import build_acta_data, enqueue_acta, pdf_file_path, render_acta
+from backend.services.pdf_store import pdf_response
+from backend.services.acta_batch import ACTAS_BATCH_MAX, PDF_MEDIA_TYPE, ZIP_MEDIA_TYPE, prepare_jobs, iter_merged_pdf, iter_zip
+from backend.services.exporter import export_response
+from backend.services.report_cache import invalidate_reports
+from backend.services.pagination import paginate
+from backend.services.search import apply_search, join_search
+from backend.services.query_budget import query_budget
 
 router = APIRouter(prefix="/assignments", tags=["Assignments"])
 
-@router.get("/export")
+@router.get("/export", dependencies=[Depends(query_budget(2))])
 def export_assignments(
     search: Optional[str] = None,
     employee_id: Optional[int] = None,
     device_id: Optional[int] = None,
     active_only: bool = False,
+    formato: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Exportar historial de asignaciones a Excel"""
-    query = db.query(Assignment)
+    """Exportar historial de asignaciones a Excel (o CSV) transmitiendo las filas a medida que se leen"""
+    # Empleado y dispositivo en la misma consulta (sin cargas perezosas por fila)
+    query = db.query(
+        Assignment,
+        Employee.nombre_completo,
+        Employee.cargo,
+        Device.marca,
+        Device.modelo,
+        Device.imei,
+        Device.numero_telefono
+    )
+    query = query.outerjoin(Employee, Assignment.employee_id == Employee.id)
+    query = query.outerjoin(Device, Assignment.device_id == Device.id)
     
-    if search:
-        query = query.join(Assignment.employee).join(Assignment.device).filter(
-            (Employee.nombre_completo.ilike(f"%{search}%")) |
-            (Device.marca.ilike(f"%{search}%")) |
-            (Device.modelo.ilike(f"%{search}%")) |
-            (Device.imei.ilike(f"%{search}%")) |
-            (Device.numero_telefono.ilike(f"%{search}%"))
-        )
+    query = apply_search(query, db, "assignments", Assignment.id, search, ranked=False)
 
     if employee_id:
         query = query.filter(Assignment.employee_id == employee_id)
@@ -47,62 +60,34 @@ def export_assignments(
         
     if active_only:
         query = query.filter(Assignment.fecha_devolucion == None)
-        
-    assignments = query.all()
-    
-    data = []
-    for assign in assignments:
+
+    def to_row(result):
+        assign, nombre, cargo, marca, modelo, imei, numero_telefono = result
         estado = "Activa" if not assign.fecha_devolucion else "Devuelta"
+        has_device = marca is not None
         
-        data.append({
-            "ID asignación": assign.id,
-            "Empleado": assign.employee.nombre_completo if assign.employee else "N/A",
-            "Cargo": assign.employee.cargo if assign.employee else "N/A",
-            "Dispositivo": f"{assign.device.marca} {assign.device.modelo}" if assign.device else "N/A",
-            "IMEI": assign.device.imei if assign.device else "N/A",
-            "Línea": assign.device.numero_telefono if assign.device else "N/A",
-            "Fecha Asignación": assign.fecha_asignacion,
-            "Fecha Devolución": assign.fecha_devolucion,
-            "Estado": estado,
-            "Observaciones": assign.observaciones
-        })
-    
-    df = pd.DataFrame(data)
-    stream = io.BytesIO()
-    
-    with pd.ExcelWriter(stream, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Asignaciones')
-    
-    stream.seek(0)
-    
-    return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=asignaciones.xlsx"}
-    )
+        return [
+            assign.id,
+            nombre if nombre is not None else "N/A",
+            cargo if nombre is not None else "N/A",
+            f"{marca} {modelo}" if has_device else "N/A",
+            imei if has_device else "N/A",
+            numero_telefono if has_device else "N/A",
+            assign.fecha_asignacion,
+            assign.fecha_devolucion,
+            estado,
+            assign.observaciones
+        ]
 
-@router.get("/", response_model=List[AssignmentResponse])
-def read_assignments(
-    skip: int = 0,
-    limit: int = 100,
-    search: Optional[str] = None,
-    employee_id: Optional[int] = None,
-    device_id: Optional[int] = None,
-    active_only: bool = False,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Listar asignaciones con filtros opcionales"""
-    query = db.query(Assignment)
-    
-    if search:
-        query = query.join(Assignment.employee).join(Assignment.device).filter(
-            (Employee.nombre_completo.ilike(f"%{search}%")) |
-            (Device.marca.ilike(f"%{search}%")) |
-            (Device.modelo.ilike(f"%{search}%")) |
-            (Device.imei.ilike(f"%{search}%")) |
-            (Device.numero_telefono.ilike(f"%{search}%"))
-        )
+    headers = [
+        "ID asignación", "Empleado", "Cargo", "Dispositivo", "IMEI", "Línea",
+        "Fecha Asignación", "Fecha Devolución", "Estado", "Observaciones"
+    ]
+    query = query.order_by(Assignment.fecha_asignacion.desc(), Assignment.id.desc())
+    return export_response(db, query, headers, to_row, "asignaciones", "Asignaciones", formato)
+
+def filter_assignments(query, employee_id: Optional[int], device_id: Optional[int], active_only: bool):
+    """Filtros del listado de asignaciones (además de la búsqueda)"""
 
     if employee_id:
         query = query.filter(Assignment.employee_id == employee_id)
@@ -112,8 +97,71 @@ def read_assignments(
         
     if active_only:
         query = query.filter(Assignment.fecha_devolucion == None)
-        
-    return query.order_by(Assignment.fecha_asignacion.desc()).offset(skip).limit(limit).all()
+
+    return query
+
+@router.get("/", response_model=List[AssignmentResponse], dependencies=[Depends(query_budget(3))])
+async def read_assignments(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    search: Optional[str] = None,
+    employee_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    active_only: bool = False,
+    db = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Listar asignaciones con filtros opcionales (paginado por cursor, ver X-Next-Cursor)"""
+    def list_assignments(session: Session):
+        # Dispositivo y empleado en la misma consulta (la respuesta los incluye)
+        query = session.query(Assignment).options(joinedload(Assignment.device), joinedload(Assignment.employee))
+        query, rank = join_search(query, session, "assignments", Assignment.id, search)
+        query = filter_assignments(query, employee_id, device_id, active_only)
+        keys = [(Assignment.fecha_asignacion, True), (Assignment.id, True)]
+        assignments = paginate(query, keys, response, limit, skip, cursor, include_total, rank)
+        return [AssignmentResponse.model_validate(a) for a in assignments]
+
+    return await run_db(db, list_assignments)
+
+@router.post("/actas/batch")
+def download_actas_batch(
+    batch: ActaBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Descargar actas en lote (zip o PDF combinado), generando en paralelo las que falten"""
+    query = db.query(Assignment).options(joinedload(Assignment.employee), joinedload(Assignment.device))
+    if batch.ids is not None:
+        query = query.filter(Assignment.id.in_(batch.ids))
+    else:
+        query = apply_search(query, db, "assignments", Assignment.id, batch.search)
+        query = filter_assignments(query, batch.employee_id, batch.device_id, batch.active_only)
+
+    if batch.doc_type == "remision":
+        # Solo las asignaciones devueltas tienen acta de remisión
+        query = query.filter(Assignment.fecha_devolucion != None)
+
+    assignments = query.order_by(Assignment.fecha_asignacion.desc(), Assignment.id.desc()).limit(ACTAS_BATCH_MAX + 1).all()
+    if not assignments:
+        raise HTTPException(status_code=404, detail="No hay asignaciones que coincidan")
+    if len(assignments) > ACTAS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"El lote supera el máximo de {ACTAS_BATCH_MAX} actas")
+
+    jobs = prepare_jobs(assignments, batch.doc_type, current_user)
+    filename = f"actas_{batch.doc_type}_{date.today().strftime('%Y%m%d')}"
+    if batch.formato == "pdf":
+        body, media_type = iter_merged_pdf(jobs), PDF_MEDIA_TYPE
+    else:
+        body, media_type = iter_zip(jobs), ZIP_MEDIA_TYPE
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{batch.formato}"}
+    )
 
 @router.get("/{id}", response_model=AssignmentWithDetails)
 def read_assignment(
@@ -135,48 +183,54 @@ def create_assignment(
     current_user: User = Depends(get_current_editor)
 ):
     """Crear una nueva asignación y generar Acta de Entrega"""
-    # Verificar si el dispositivo existe y está disponible
-    device = db.query(Device).filter(Device.id == assignment.device_id).first()
+    # Verificar si el dispositivo existe y está disponible. FOR UPDATE bloquea solo esta
+    # fila hasta el commit: una asignación concurrente del mismo equipo espera y luego
+    # lo ve asignado (409); las de otros equipos no se bloquean entre sí
+    device = db.query(Device).filter(Device.id == assignment.device_id).with_for_update().first()
     if not device:
         raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
     if device.estado != DeviceStatus.DISPONIBLE:
-        raise HTTPException(status_code=400, detail="El dispositivo no está disponible")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El dispositivo no está disponible")
     
     # Verificar si el empleado existe
     employee = db.query(Employee).filter(Employee.id == assignment.employee_id).first()
     if not employee:
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
     
-    # Crear asignación
-    db_assignment = Assignment(**assignment.dict())
-    db.add(db_assignment)
-    
-    # Actualizar estado del dispositivo
-    device.estado = DeviceStatus.ASIGNADO
-    
-    db.commit()
-    db.refresh(db_assignment)
-    
-    # Generar Acta de Entrega
     try:
-        data_pdf = {
-            "employee_name": employee.nombre_completo,
-            "employee_cargo": employee.cargo,
-            "responsable_nombre": current_user.username,
-            "responsable_cargo": current_user.role.value,
-            "fecha_asignacion": db_assignment.fecha_asignacion,
-            "numero_telefono": device.numero_telefono,
-            "device_marca": device.marca,
-            "device_modelo": device.modelo,
-            "device_imei": device.imei,
-            "device_estado_fisico": device.estado_fisico.value
-        }
-        pdf_path = generate_acta_entrega(data_pdf)
-        db_assignment.acta_entrega_url = f"/pdfs/{os.path.basename(pdf_path)}"
+        # Crear asignación
+        db_assignment = Assignment(**assignment.dict())
+        db.add(db_assignment)
+        
+        # Actualizar estado del dispositivo y los punteros a la asignación activa
+        device.estado = DeviceStatus.ASIGNADO
+        refresh_current_assignments(db, [device.id], [employee.id])
+        # Una asignación con fecha pasada cambia los meses ya cerrados del costo por línea
+        invalidate_plan_cost_rollup(db, db_assignment.fecha_asignacion)
+        
         db.commit()
-    except Exception as e:
-        print(f"Error generando PDF: {e}")
-        # No bloqueamos la creación de la asignación si falla el PDF, pero avisamos en logs
+    except IntegrityError:
+        # Sin FOR UPDATE (SQLite) decide el índice único de asignaciones activas
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El dispositivo ya tiene una asignación activa")
+    invalidate_reports()
+    db.refresh(db_assignment)
+    
+    # Generar Acta de Entrega en segundo plano (ver GET /assignments/{id}/pdf-status)
+    data_pdf = {
+        "employee_name": employee.nombre_completo,
+        "employee_cargo": employee.cargo,
+        "responsable_nombre": current_user.username,
+        "responsable_cargo": current_user.role.value,
+        "fecha_asignacion": db_assignment.fecha_asignacion,
+        "numero_telefono": device.numero_telefono,
+        "device_marca": device.marca,
+        "device_modelo": device.modelo,
+        "device_imei": device.imei,
+        "device_estado_fisico": device.estado_fisico.value
+    }
+    enqueue_acta(db, db_assignment, "entrega", data_pdf)
+    db.refresh(db_assignment)
     
     return db_assignment
 
@@ -193,44 +247,70 @@ def return_device(
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
     
     if db_assignment.fecha_devolucion is not None:
-        raise HTTPException(status_code=400, detail="Este equipo ya fue devuelto")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Este equipo ya fue devuelto")
     
-    # Actualizar asignación
-    db_assignment.fecha_devolucion = return_data.fecha_devolucion or date.today()
+    # Actualizar asignación solo si sigue activa (UPDATE condicional): entre devoluciones
+    # concurrentes una sola modifica la fila, las demás esperan su commit y reciben 409
+    fecha_devolucion = return_data.fecha_devolucion or date.today()
+    returned = (
+        db.query(Assignment)
+        .filter(Assignment.id == id, Assignment.fecha_devolucion == None)
+        .update({Assignment.fecha_devolucion: fecha_devolucion})
+    )
+    if returned != 1:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Este equipo ya fue devuelto")
     if return_data.observaciones:
         db_assignment.observaciones = (db_assignment.observaciones or "") + "\n" + return_data.observaciones
     
-    # Actualizar estado del dispositivo
+    # Actualizar estado del dispositivo y los punteros a la asignación activa
     db_assignment.device.estado = DeviceStatus.DISPONIBLE
+    refresh_current_assignments(db, [db_assignment.device_id], [db_assignment.employee_id])
+    invalidate_plan_cost_rollup(db, fecha_devolucion)
     
     db.commit()
+    invalidate_reports()
     db.refresh(db_assignment)
     
-    # Generar Acta de Remisión
-    try:
-        data_pdf = {
-            "employee_name": db_assignment.employee.nombre_completo,
-            "employee_cargo": db_assignment.employee.cargo,
-            "fecha_asignacion": db_assignment.fecha_asignacion,
-            "fecha_devolucion": db_assignment.fecha_devolucion,
-            "device_marca": db_assignment.device.marca,
-            "device_modelo": db_assignment.device.modelo,
-            "device_numero_serie": db_assignment.device.numero_serie,
-            "device_imei": db_assignment.device.imei,
-            "observaciones": return_data.observaciones
-        }
-        pdf_path = generate_acta_remision(data_pdf)
-        db_assignment.acta_remision_url = f"/pdfs/{os.path.basename(pdf_path)}"
-        db.commit()
-    except Exception as e:
-        print(f"Error generando PDF de remisión: {e}")
+    # Generar Acta de Remisión en segundo plano (ver GET /assignments/{id}/pdf-status)
+    data_pdf = {
+        "employee_name": db_assignment.employee.nombre_completo,
+        "employee_cargo": db_assignment.employee.cargo,
+        "fecha_asignacion": db_assignment.fecha_asignacion,
+        "fecha_devolucion": db_assignment.fecha_devolucion,
+        "device_marca": db_assignment.device.marca,
+        "device_modelo": db_assignment.device.modelo,
+        "device_numero_serie": db_assignment.device.numero_serie,
+        "device_imei": db_assignment.device.imei,
+        "observaciones": return_data.observaciones
+    }
+    enqueue_acta(db, db_assignment, "remision", data_pdf)
+    db.refresh(db_assignment)
     
     return db_assignment
 
+@router.get("/{id}/pdf-status", response_model=AssignmentPdfStatus)
+def get_assignment_pdf_status(
+    id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Consultar el estado de generación de las actas de una asignación"""
+    assignment = db.query(Assignment).filter(Assignment.id == id).first()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Asignación no encontrada")
+    
+    return {
+        "id": assignment.id,
+        "entrega": {"estado": assignment.acta_entrega_estado, "url": assignment.acta_entrega_url},
+        "remision": {"estado": assignment.acta_remision_estado, "url": assignment.acta_remision_url}
+    }
+
 @router.get("/{id}/pdf/{doc_type}")
 def get_assignment_pdf(
     id: int,
     doc_type: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -242,61 +322,28 @@ def get_assignment_pdf(
     if not assignment:
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
         
-    # Determinar campo de URL y función generadora
+    # Determinar campo de URL
     url_field = f"acta_{doc_type}_url"
-    current_url = getattr(assignment, url_field)
     
     # Si ya existe el archivo, devolverlo
-    if current_url:
-        # El URL guardado es relativo a static, ej: /pdfs/archivo.pdf
-        # Necesitamos la ruta física. Asumimos que static está en backend/static
-        # current_url starts with /pdfs/
-        filename = os.path.basename(current_url)
-        # Construct absolute path safely
-        file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "pdfs", filename)
-        
-        if os.path.exists(file_path):
-            return FileResponse(file_path, media_type="application/pdf", filename=filename)
+    file_path = pdf_file_path(getattr(assignment, url_field))
+    if file_path:
+        return pdf_response(request, file_path, filename=os.path.basename(file_path))
+    
+    # Solo si está devuelto
+    if doc_type == "remision" and not assignment.fecha_devolucion:
+        raise HTTPException(status_code=400, detail="El equipo no ha sido devuelto aún")
     
     # Si no existe, generarlo
     try:
-        if doc_type == "entrega":
-            data_pdf = {
-                "employee_name": assignment.employee.nombre_completo,
-                "employee_cargo": assignment.employee.cargo,
-                "responsable_nombre": current_user.username,
-                "responsable_cargo": getattr(current_user.role, "value", "Admin"),
-                "fecha_asignacion": assignment.fecha_asignacion,
-                "numero_telefono": assignment.device.numero_telefono,
-                "device_marca": assignment.device.marca,
-                "device_modelo": assignment.device.modelo,
-                "device_imei": assignment.device.imei,
-                "device_estado_fisico": assignment.device.estado_fisico.value
-            }
-            pdf_path = generate_acta_entrega(data_pdf)
-        else: # remision
-            # Solo si está devuelto
-            if not assignment.fecha_devolucion:
-                raise HTTPException(status_code=400, detail="El equipo no ha sido devuelto aún")
-                
-            data_pdf = {
-                "employee_name": assignment.employee.nombre_completo,
-                "employee_cargo": assignment.employee.cargo,
-                "fecha_asignacion": assignment.fecha_asignacion,
-                "fecha_devolucion": assignment.fecha_devolucion,
-                "device_marca": assignment.device.marca,
-                "device_modelo": assignment.device.modelo,
-                "device_numero_serie": assignment.device.numero_serie,
-                "device_imei": assignment.device.imei,
-                "observaciones": assignment.observaciones
-            }
-            pdf_path = generate_acta_remision(data_pdf)
+        pdf_path = render_acta(doc_type, build_acta_data(assignment, doc_type, current_user))
             
         # Actualizar DB
         setattr(assignment, url_field, f"/pdfs/{os.path.basename(pdf_path)}")
+        setattr(assignment, f"acta_{doc_type}_estado", ActaStatus.LISTO.value)
         db.commit()
         
-        return FileResponse(pdf_path, media_type="application/pdf", filename=os.path.basename(pdf_path))
+        return pdf_response(request, pdf_path, filename=os.path.basename(pdf_path))
         
     except Exception as e:
         print(f"Error generando PDF manual: {e}")
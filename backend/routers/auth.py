@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 
 from backend.database import get_db
@@ -10,7 +11,7 @@ from backend.schemas.user import UserCreate, UserResponse, Token
 from backend.services.auth import (
     authenticate_user,
     create_access_token,
-    get_password_hash,
+    hash_password,
     get_current_user,
     get_current_active_admin,
     ACCESS_TOKEN_EXPIRE_MINUTES
@@ -25,8 +26,13 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    """Login de usuario"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    """
+    Login de usuario
+
+    Async: la base de datos va al threadpool y bcrypt a su pool acotado, esperados con
+    await, así una ráfaga de logins no retiene los hilos de las demás peticiones.
+    """
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,6 +40,9 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Datos del token antes del commit (que expira al usuario si volvió a la sesión)
+    claims = {"sub": user.username, "role": user.role.value}
+
     # Registrar actividad de login
     activity = UserActivity(
         user_id=user.id,
@@ -42,11 +51,11 @@ async def login(
         user_agent=request.headers.get("user-agent"),
     )
     db.add(activity)
-    db.commit()
+    await run_in_threadpool(db.commit)
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "role": user.role.value},
+        data=claims,
         expires_delta=access_token_expires
     )
     
@@ -54,7 +63,7 @@ async def login(
 
 
 @router.post("/logout")
-async def logout(
+def logout(
     request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -77,35 +86,38 @@ async def register(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_admin)
 ):
-    """Registrar nuevo usuario (solo admin)"""
-    # Verificar si el username ya existe
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El nombre de usuario ya existe"
-        )
-    
-    # Verificar si el email ya existe
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
-    if existing_email:
+    """Registrar nuevo usuario (solo admin; async como el login, bcrypt esperado con await)"""
+    def find_existing():
+        # Verificar si el username o el email ya existen
+        if db.query(User).filter(User.username == user_data.username).first():
+            return "El nombre de usuario ya existe"
+        if db.query(User).filter(User.email == user_data.email).first():
+            return "El email ya está registrado"
+        # Libera la conexión mientras bcrypt genera el hash
+        db.close()
+        return None
+
+    existing = await run_in_threadpool(find_existing)
+    if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El email ya está registrado"
+            detail=existing
         )
     
     # Crear nuevo usuario
     new_user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await hash_password(user_data.password),
         role=user_data.role
     )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+
+    await run_in_threadpool(save)
     return new_user
 
 
@@ -1,141 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
-import pandas as pd
-import io
+import json
 
-from backend.database import get_db
+from backend.database import get_db, get_read_db, run_db
 from backend.models.device import Device, DeviceStatus, PhysicalCondition
 from backend.models.user import User
-from backend.schemas.device import DeviceCreate, DeviceUpdate, DeviceResponse, DeviceWithDepreciation, DeviceHistory
+from backend.schemas.device import DeviceCreate, DeviceUpdate, DeviceResponse, DeviceWithDepreciation, DeviceHistory, DepreciationBatchRequest
 from backend.services.auth import get_current_user, get_current_editor, get_current_active_admin
+from backend.services.device_queries import annotate_device_holders
+from backend.services.depreciation import VALUATION_CHUNK, iter_depreciation
+from backend.services.exporter import CSV_MEDIA_TYPE, export_response, iter_csv, stream_query_rows
+from backend.services.report_cache import invalidate_reports
+from backend.services.pagination import paginate
+from backend.services.search import apply_search, join_search
+from backend.services.query_budget import query_budget
 
 router = APIRouter(prefix="/devices", tags=["Devices"])
 
 from backend.models.assignment import Assignment
 from backend.models.employee import Employee
-from sqlalchemy import or_
 
-@router.get("/export")
+@router.get("/export", dependencies=[Depends(query_budget(2))])
 def export_devices(
     search: Optional[str] = None,
     estado: Optional[DeviceStatus] = None,
+    formato: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Exportar dispositivos a Excel"""
-    query = db.query(Device)
-    
-    if search:
-        query = query.outerjoin(Assignment, (Assignment.device_id == Device.id) & (Assignment.fecha_devolucion == None))
-        query = query.outerjoin(Employee, Assignment.employee_id == Employee.id)
-        
-        query = query.filter(
-            or_(
-                Device.marca.ilike(f"%{search}%"),
-                Device.modelo.ilike(f"%{search}%"),
-                Device.imei.ilike(f"%{search}%"),
-                Device.numero_telefono.ilike(f"%{search}%"),
-                Employee.nombre_completo.ilike(f"%{search}%")
-            )
-        )
+    """Exportar dispositivos a Excel (o CSV) transmitiendo las filas a medida que se leen"""
+    # Traer el nombre del responsable actual en la misma consulta (sin cargas perezosas por fila)
+    query = db.query(Device, Employee.nombre_completo)
+    query = query.outerjoin(Assignment, Assignment.id == Device.current_assignment_id)
+    query = query.outerjoin(Employee, Assignment.employee_id == Employee.id)
+
+    query = apply_search(query, db, "devices", Device.id, search, ranked=False)
     
     if estado:
         query = query.filter(Device.estado == estado)
-        
-    devices = query.all()
-    
-    data = []
-    for dev in devices:
+
+    def to_row(result):
+        dev, employee_name = result
         asignado_a = "Disponible"
-        active_assignment = next((a for a in dev.assignments if a.fecha_devolucion is None), None)
-        
-        if active_assignment and active_assignment.employee:
-            asignado_a = active_assignment.employee.nombre_completo
-        elif dev.estado == DeviceStatus.baja:
+        if employee_name:
+            asignado_a = employee_name
+        elif dev.estado == DeviceStatus.BAJA:
             asignado_a = "De Baja"
-            
-        data.append({
-            "ID": dev.id,
-            "Marca": dev.marca,
-            "Modelo": dev.modelo,
-            "IMEI": dev.imei,
-            "Número": dev.numero_telefono,
-            "Estado": dev.estado.value,
-            "Estado Físico": dev.estado_fisico.value,
-            "Costo Inicial": dev.costo_inicial,
-            "Fecha Compra": dev.fecha_compra,
-            "Asignado A": asignado_a
-        })
-    
-    df = pd.DataFrame(data)
-    stream = io.BytesIO()
-    
-    with pd.ExcelWriter(stream, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Dispositivos')
-    
-    stream.seek(0)
-    
-    return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=dispositivos.xlsx"}
-    )
-
-@router.get("/", response_model=List[DeviceResponse])
-def read_devices(
-    skip: int = 0,
-    limit: int = 100,
+
+        return [
+            dev.id,
+            dev.marca,
+            dev.modelo,
+            dev.imei,
+            dev.numero_telefono,
+            dev.estado.value,
+            dev.estado_fisico.value,
+            dev.costo_inicial,
+            dev.fecha_compra,
+            asignado_a
+        ]
+
+    headers = ["ID", "Marca", "Modelo", "IMEI", "Número", "Estado", "Estado Físico", "Costo Inicial", "Fecha Compra", "Asignado A"]
+    return export_response(db, query.order_by(Device.id), headers, to_row, "dispositivos", "Dispositivos", formato)
+
+@router.get("/", response_model=List[DeviceResponse], dependencies=[Depends(query_budget(4))])
+async def read_devices(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     search: Optional[str] = None,
     estado: Optional[DeviceStatus] = None,
-    db: Session = Depends(get_db),
+    db = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Listar dispositivos con filtros opcionales"""
-    query = db.query(Device)
-    
-    if search:
-        # Unir tablas para buscar por nombre de empleado
-        # Usamos outerjoin para no perder dispositivos que no tienen asignaciones
-        query = query.outerjoin(Assignment, (Assignment.device_id == Device.id) & (Assignment.fecha_devolucion == None))
-        query = query.outerjoin(Employee, Assignment.employee_id == Employee.id)
-        
-        query = query.filter(
-            or_(
-                Device.marca.ilike(f"%{search}%"),
-                Device.modelo.ilike(f"%{search}%"),
-                Device.imei.ilike(f"%{search}%"),
-                Device.numero_telefono.ilike(f"%{search}%"),
-                Employee.nombre_completo.ilike(f"%{search}%")
-            )
-        )
-    
-    if estado:
-        query = query.filter(Device.estado == estado)
-        
-    devices = query.offset(skip).limit(limit).all()
-
-    # Enriquecer con nombre del empleado asignado o historial reciente
-    for dev in devices:
-        active_assignment = next((a for a in dev.assignments if a.fecha_devolucion is None), None)
-        
-        if active_assignment and active_assignment.employee:
-            dev.asignado_a = active_assignment.employee.nombre_completo
-        else:
-            # Si no está asignado, buscar la última asignación (historial)
-            past_assignments = [a for a in dev.assignments if a.fecha_devolucion is not None]
-            if past_assignments:
-                # Ordenar por fecha de devolución descendente
-                last_assignment = sorted(past_assignments, key=lambda x: x.fecha_devolucion, reverse=True)[0]
-                if last_assignment.employee:
-                    dev.ultimo_asignado = last_assignment.employee.nombre_completo
-                    dev.fecha_devolucion_ultimo = last_assignment.fecha_devolucion
-
-    return devices
-
-@router.get("/available", response_model=List[DeviceResponse])
+    """Listar dispositivos con filtros opcionales (paginado por cursor, ver X-Next-Cursor)"""
+    def list_devices(session: Session):
+        query = session.query(Device)
+
+        # Búsqueda por datos del equipo o nombre del empleado asignado, ordenada por relevancia
+        query, rank = join_search(query, session, "devices", Device.id, search)
+
+        if estado:
+            query = query.filter(Device.estado == estado)
+
+        devices = paginate(query, [(Device.id, False)], response, limit, skip, cursor, include_total, rank)
+
+        # Enriquecer con nombre del empleado asignado o historial reciente (una sola consulta)
+        return [DeviceResponse.model_validate(d) for d in annotate_device_holders(session, devices)]
+
+    return await run_db(db, list_devices)
+
+@router.get("/available", response_model=List[DeviceResponse], dependencies=[Depends(query_budget(2))])
 def read_available_devices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -143,6 +103,54 @@ def read_available_devices(
     """Listar solo dispositivos disponibles"""
     return db.query(Device).filter(Device.estado == DeviceStatus.DISPONIBLE).all()
 
+DEPRECIATION_FIELDS = ["device_id", "costo_inicial", "fecha_compra", "fecha_calculo", "meses_uso", "vida_util_meses",
+                       "depreciacion_mensual", "depreciacion_acumulada", "valor_actual", "porcentaje_depreciado"]
+
+
+def _iter_json_array(blocks):
+    """Arreglo JSON por fragmentos: un fragmento por bloque de resultados"""
+    separator = "["
+    for results in blocks:
+        if results:
+            yield (separator + json.dumps(results, separators=(",", ":"))[1:-1]).encode("utf-8")
+            separator = ","
+    yield b"[]" if separator == "[" else b"]"
+
+
+@router.post("/depreciation", dependencies=[Depends(query_budget(2))])
+def calculate_depreciation_batch(
+    batch: DepreciationBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Depreciación de muchos dispositivos en una o más fechas (reemplaza un GET /devices/{id} por dispositivo)
+
+    Por IDs o con los filtros del listado. Devuelve un resultado por dispositivo y fecha
+    con los campos de Device.calcular_depreciacion más device_id, calculados con NumPy
+    por bloques y transmitidos a medida que se leen los dispositivos.
+    """
+    query = db.query(Device.id, Device.costo_inicial, Device.fecha_compra)
+    # Una lista de IDs vacía no devuelve nada (no es "sin filtro")
+    if batch.ids is not None:
+        query = query.filter(Device.id.in_(batch.ids))
+    else:
+        query = apply_search(query, db, "devices", Device.id, batch.search, ranked=False)
+        if batch.estado:
+            query = query.filter(Device.estado == batch.estado)
+
+    devices = stream_query_rows(db, query.order_by(Device.id), lambda row: row, fetch_size=VALUATION_CHUNK)
+    blocks = iter_depreciation(devices, batch.fechas)
+    if batch.formato == "csv":
+        rows = ([r[field] for field in DEPRECIATION_FIELDS] for results in blocks for r in results)
+        filename = f"depreciacion_{date.today().strftime('%Y%m%d')}.csv"
+        return StreamingResponse(
+            iter_csv(DEPRECIATION_FIELDS, rows),
+            media_type=CSV_MEDIA_TYPE,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    return StreamingResponse(_iter_json_array(blocks), media_type="application/json")
+
 @router.get("/{id}", response_model=DeviceWithDepreciation)
 def read_device(
     id: int,
@@ -173,6 +181,7 @@ def create_device(
     db_device = Device(**device.dict())
     db.add(db_device)
     db.commit()
+    invalidate_reports()
     db.refresh(db_device)
     return db_device
 
@@ -193,6 +202,7 @@ def update_device(
         setattr(db_device, key, value)
     
     db.commit()
+    invalidate_reports()
     db.refresh(db_device)
     return db_device
 
@@ -209,10 +219,11 @@ def delete_device(
     
     db_device.estado = DeviceStatus.BAJA
     db.commit()
+    invalidate_reports()
     db.refresh(db_device)
     return db_device
 
-@router.get("/{id}/history", response_model=DeviceHistory)
+@router.get("/{id}/history", response_model=DeviceHistory, dependencies=[Depends(query_budget(4))])
 def read_device_history(
     id: int,
     db: Session = Depends(get_db),
@@ -1,106 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
-import pandas as pd
-import io
 
-from backend.database import get_db
+from backend.database import get_db, get_read_db, run_db
 from backend.models.employee import Employee, EmployeeStatus
 from backend.models.user import User
 from backend.schemas.employee import EmployeeCreate, EmployeeUpdate, EmployeeResponse, EmployeeWithDevices
 from backend.services.auth import get_current_user, get_current_editor
+from backend.services.current_assignment import refresh_current_assignments
+from backend.services.exporter import export_response
+from backend.services.report_cache import invalidate_reports
+from backend.services.pagination import paginate
+from backend.services.search import apply_search, join_search
+from backend.services.query_budget import query_budget
 
 router = APIRouter(prefix="/employees", tags=["Employees"])
 
-@router.get("/", response_model=List[EmployeeResponse])
-def read_employees(
-    skip: int = 0,
-    limit: int = 100,
+@router.get("/", response_model=List[EmployeeResponse], dependencies=[Depends(query_budget(3))])
+async def read_employees(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     search: Optional[str] = None,
     estado: Optional[EmployeeStatus] = None,
-    db: Session = Depends(get_db),
+    db = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Listar empleados con filtros opcionales"""
-    query = db.query(Employee)
-    
-    if search:
-        query = query.filter(Employee.nombre_completo.ilike(f"%{search}%"))
-    
-    if estado:
-        query = query.filter(Employee.estado == estado)
-        
-    employees = query.offset(skip).limit(limit).all()
+    """Listar empleados con filtros opcionales (paginado por cursor, ver X-Next-Cursor)"""
+    def list_employees(session: Session):
+        # Asignación actual, dispositivo y plan en la misma consulta (puntero current_assignment_id)
+        query = session.query(Employee).options(
+            joinedload(Employee.current_assignment).joinedload(Assignment.device).joinedload(Device.plan)
+        )
+        query, rank = join_search(query, session, "employees", Employee.id, search)
+
+        if estado:
+            query = query.filter(Employee.estado == estado)
+
+        employees = paginate(query, [(Employee.id, False)], response, limit, skip, cursor, include_total, rank)
+
+        # Enriquecer con datos del dispositivo actual
+        for emp in employees:
+            active_assignment = emp.current_assignment
+            if active_assignment and active_assignment.device:
+                emp.dispositivo_actual = f"{active_assignment.device.marca} {active_assignment.device.modelo}"
+                emp.linea_actual = active_assignment.device.numero_telefono or "Sin línea"
+                if active_assignment.device.plan:
+                     emp.linea_actual += f" - {active_assignment.device.plan.nombre} (${active_assignment.device.plan.costo_mensual:.2f})"
+            else:
+                emp.dispositivo_actual = "Sin asignar"
+                emp.linea_actual = "-"
 
-    # Enriquecer con datos del dispositivo actual
-    for emp in employees:
-        active_assignment = next((a for a in emp.assignments if a.fecha_devolucion is None), None)
-        if active_assignment and active_assignment.device:
-            emp.dispositivo_actual = f"{active_assignment.device.marca} {active_assignment.device.modelo}"
-            emp.linea_actual = active_assignment.device.numero_telefono or "Sin línea"
-            if active_assignment.device.plan:
-                 emp.linea_actual += f" - {active_assignment.device.plan.nombre} (${active_assignment.device.plan.costo_mensual:.2f})"
-        else:
-            emp.dispositivo_actual = "Sin asignar"
-            emp.linea_actual = "-"
+        return [EmployeeResponse.model_validate(emp) for emp in employees]
 
-    return employees
+    return await run_db(db, list_employees)
 
-@router.get("/export")
+@router.get("/export", dependencies=[Depends(query_budget(2))])
 def export_employees(
     search: Optional[str] = None,
     estado: Optional[EmployeeStatus] = None,
+    formato: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Exportar empleados a Excel"""
-    query = db.query(Employee)
+    """Exportar empleados a Excel (o CSV) transmitiendo las filas a medida que se leen"""
+    # Traer el dispositivo actual en la misma consulta (sin cargas perezosas por fila).
+    # Si el empleado tiene varias asignaciones activas se toma la primera, como en el listado.
+    query = db.query(Employee, Device.marca, Device.modelo, Device.numero_telefono)
+    query = query.outerjoin(Assignment, Assignment.id == Employee.current_assignment_id)
+    query = query.outerjoin(Device, Assignment.device_id == Device.id)
     
-    if search:
-        query = query.filter(Employee.nombre_completo.ilike(f"%{search}%"))
+    query = apply_search(query, db, "employees", Employee.id, search, ranked=False)
     
     if estado:
         query = query.filter(Employee.estado == estado)
-        
-    employees = query.all()
-    
-    data = []
-    for emp in employees:
-        active_assignment = next((a for a in emp.assignments if a.fecha_devolucion is None), None)
+
+    def to_row(result):
+        emp, marca, modelo, numero_telefono = result
         dispositivo = "Sin asignar"
         linea = "-"
         
-        if active_assignment and active_assignment.device:
-             dispositivo = f"{active_assignment.device.marca} {active_assignment.device.modelo}"
-             linea = active_assignment.device.numero_telefono or "Sin línea"
+        if marca is not None:
+            dispositivo = f"{marca} {modelo}"
+            linea = numero_telefono or "Sin línea"
         
-        data.append({
-            "ID": emp.id,
-            "Nombre Completo": emp.nombre_completo,
-            "Cargo": emp.cargo,
-            "Departamento": emp.departamento,
-            "Ubicación": emp.ubicacion,
-            "Empresa": emp.empresa,
-            "Estado": emp.estado.value,
-            "Dispositivo Actual": dispositivo,
-            "Línea": linea
-        })
-    
-    df = pd.DataFrame(data)
-    stream = io.BytesIO()
-    
-    # Auto-adjust columns width logic is a bit complex with pandas alone, but basic export works
-    with pd.ExcelWriter(stream, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Empleados')
-    
-    stream.seek(0)
-    
-    return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=empleados.xlsx"}
-    )
+        return [
+            emp.id,
+            emp.nombre_completo,
+            emp.cargo,
+            emp.departamento,
+            emp.ubicacion,
+            emp.empresa,
+            emp.estado.value,
+            dispositivo,
+            linea
+        ]
+
+    headers = ["ID", "Nombre Completo", "Cargo", "Departamento", "Ubicación", "Empresa", "Estado", "Dispositivo Actual", "Línea"]
+    return export_response(db, query.order_by(Employee.id), headers, to_row, "empleados", "Empleados", formato)
 
 @router.get("/{id}", response_model=EmployeeWithDevices)
 def read_employee(
@@ -113,8 +112,14 @@ def read_employee(
     if not employee:
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
     
-    # Obtener dispositivos actualmente asignados
-    active_assignments = [a for a in employee.assignments if a.fecha_devolucion is None]
+    # Obtener dispositivos actualmente asignados (solo las asignaciones activas)
+    active_assignments = (
+        db.query(Assignment)
+        .options(joinedload(Assignment.device))
+        .filter(Assignment.employee_id == employee.id, Assignment.fecha_devolucion == None)
+        .order_by(Assignment.id)
+        .all()
+    )
     
     # Preparar respuesta
     result = EmployeeWithDevices.from_orm(employee)
@@ -133,8 +138,7 @@ def read_employee(
 
 from backend.models.device import Device, DeviceStatus
 from backend.models.assignment import Assignment
-from backend.services.pdf_generator import generate_acta_entrega
-import os
+from backend.services.pdf_jobs import enqueue_acta
 from datetime import date
 
 @router.post("/", response_model=EmployeeResponse, status_code=status.HTTP_201_CREATED)
@@ -151,6 +155,7 @@ def create_employee(
     db_employee = Employee(**emp_data)
     db.add(db_employee)
     db.commit()
+    invalidate_reports()
     db.refresh(db_employee)
 
     # Manejar asignación inicial de plan si se solicitó
@@ -177,28 +182,25 @@ def create_employee(
             observaciones="Asignación automática al crear empleado con plan"
         )
         db.add(assignment)
+        refresh_current_assignments(db, [new_device.id], [db_employee.id])
         db.commit()
+        invalidate_reports()
         db.refresh(assignment)
 
-        # Generar Acta de Entrega
-        try:
-            data_pdf = {
-                "employee_name": db_employee.nombre_completo,
-                "employee_cargo": db_employee.cargo,
-                "responsable_nombre": current_user.username,
-                "responsable_cargo": getattr(current_user.role, 'value', 'Admin'),
-                "fecha_asignacion": assignment.fecha_asignacion,
-                "numero_telefono": new_device.numero_telefono,
-                "device_marca": new_device.marca,
-                "device_modelo": new_device.modelo,
-                "device_imei": new_device.imei,
-                "device_estado_fisico": new_device.estado_fisico.value
-            }
-            pdf_path = generate_acta_entrega(data_pdf)
-            assignment.acta_entrega_url = f"/pdfs/{os.path.basename(pdf_path)}"
-            db.commit()
-        except Exception as e:
-            print(f"Error generando PDF de entrega automática: {e}")
+        # Generar Acta de Entrega en segundo plano
+        data_pdf = {
+            "employee_name": db_employee.nombre_completo,
+            "employee_cargo": db_employee.cargo,
+            "responsable_nombre": current_user.username,
+            "responsable_cargo": getattr(current_user.role, 'value', 'Admin'),
+            "fecha_asignacion": assignment.fecha_asignacion,
+            "numero_telefono": new_device.numero_telefono,
+            "device_marca": new_device.marca,
+            "device_modelo": new_device.modelo,
+            "device_imei": new_device.imei,
+            "device_estado_fisico": new_device.estado_fisico.value
+        }
+        enqueue_acta(db, assignment, "entrega", data_pdf)
 
     return db_employee
 
@@ -221,8 +223,8 @@ def update_employee(
     if 'new_plan_id' in obj_data:
         new_plan_id = obj_data.pop('new_plan_id')
         if new_plan_id:
-             # Buscar asignación activa
-            active_assignment = next((a for a in db_employee.assignments if a.fecha_devolucion is None), None)
+             # Asignación activa (puntero current_assignment_id)
+            active_assignment = db_employee.current_assignment
             if active_assignment and active_assignment.device:
                 active_assignment.device.plan_id = new_plan_id
                 # El cambio se dispara en cascada o se guarda al commit
@@ -231,10 +233,11 @@ def update_employee(
         setattr(db_employee, key, value)
     
     db.commit()
+    invalidate_reports()
     db.refresh(db_employee)
     return db_employee
 
-@router.get("/{id}/history", response_model=List[dict])
+@router.get("/{id}/history", response_model=List[dict], dependencies=[Depends(query_budget(3))])
 def read_employee_history(
     id: int,
     db: Session = Depends(get_db),
@@ -269,4 +272,5 @@ def delete_employee(
     
     db.delete(db_employee)
     db.commit()
+    invalidate_reports()
     return None
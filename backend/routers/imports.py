@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, status, UploadFile
+from sqlalchemy.orm import Session
+from typing import List
+import os
+
+from backend.database import get_db
+from backend.models.import_job import ImportJob
+from backend.models.user import User
+from backend.schemas.import_job import ImportJobDetail, ImportJobResponse
+from backend.services import import_jobs
+from backend.services.auth import get_current_editor
+from backend.services.importer import IMPORT_EXTENSIONS
+from backend.services.query_budget import query_budget
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+
+@router.post("/", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_import(
+    file: UploadFile = File(...),
+    dry_run: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_editor)
+):
+    """
+    Importar el plan de la operadora (.xlsx con una hoja por plan, o .csv de un plan)
+
+    Se procesa en segundo plano: responde 202 con el trabajo; el progreso, los conteos
+    y los errores por fila se consultan en GET /imports/{id}.
+    """
+    filename = os.path.basename(file.filename or "")
+    if not filename.lower().endswith(IMPORT_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato no soportado. Use: {', '.join(IMPORT_EXTENSIONS)}"
+        )
+    try:
+        return import_jobs.start_import(db, file.file, filename, dry_run, current_user.id)
+    except import_jobs.UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+
+@router.get("/", response_model=List[ImportJobResponse], dependencies=[Depends(query_budget(2))])
+def read_imports(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_editor)
+):
+    """Importaciones recientes (sin los errores por fila)"""
+    return db.query(ImportJob).order_by(ImportJob.id.desc()).limit(limit).all()
+
+
+@router.get("/{import_id}", response_model=ImportJobDetail)
+def read_import(
+    import_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_editor)
+):
+    """Progreso y resultado de una importación, con los errores por fila"""
+    job = db.query(ImportJob).filter(ImportJob.id == import_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return job
@@ -5,6 +5,7 @@ from backend.database import get_db
 from backend.models.user import User
 from backend.models.plan import Plan
 from backend.services.auth import get_current_user
+from backend.services.query_budget import query_budget
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -22,7 +23,7 @@ class PlanSchema(BaseModel):
     class Config:
         from_attributes = True
 
-@router.get("/", response_model=List[PlanSchema])
+@router.get("/", response_model=List[PlanSchema], dependencies=[Depends(query_budget(2))])
 def read_plans(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
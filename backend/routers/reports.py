@@ -1,50 +1,63 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Bundle, Session
+from sqlalchemy import func, select
+from datetime import date, timedelta
+from typing import List, Optional
+import numpy as np
 
-from backend.database import get_db
+from backend.database import get_db, get_read_db, run_db
 from backend.models.device import Device, DeviceStatus
 from backend.models.employee import Employee
 from backend.models.assignment import Assignment
+from backend.models.fleet_snapshot import FleetSnapshot
 from backend.models.user import User
-from backend.services.auth import get_current_user
+from backend.schemas.snapshot import FleetSnapshotResponse
+from backend.schemas.utilization import DeviceUtilization
+from backend.services.auth import get_current_user, get_current_active_admin
+from backend.services.depreciation import VIDA_UTIL_MESES, book_values, device_valuation_subquery, month_ends
+from backend.services.exporter import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, export_response, iter_csv, iter_xlsx
+from backend.services.plan_costs import ROLLUP_DIMENSIONS, month_start, plan_cost_rows, shift_months
+from backend.services.report_cache import report_cache
+from backend.services.snapshots import take_snapshot
+from backend.services.utilization import device_utilization_subquery, utilization_window
+from backend.services.pagination import paginate
+from backend.services.query_budget import query_budget
+from backend.services.search import join_search
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
-@router.get("/dashboard")
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Estadísticas generales para el dashboard"""
-    total_devices = db.query(Device).count()
-    assigned_devices = db.query(Device).filter(Device.estado == DeviceStatus.ASIGNADO).count()
-    available_devices = db.query(Device).filter(Device.estado == DeviceStatus.DISPONIBLE).count()
-    baja_devices = db.query(Device).filter(Device.estado == DeviceStatus.BAJA).count()
-    
-    total_employees = db.query(Employee).count()
-    
-    # Calcular valor actual total (depreciado)
-    devices = db.query(Device).all()
-    total_value_initial = sum(d.costo_inicial for d in devices)
-    
-    # Hoy
-    today = date.today()
-    total_value_current = 0
-    for d in devices:
-        dep = d.calcular_depreciacion(today)
-        total_value_current += dep["valor_actual"]
+def _compute_dashboard_stats(db: Session, today: date) -> dict:
+    """Calcula las estadísticas del dashboard"""
+    # Una sola consulta agregada: conteos por estado (COUNT FILTER), totales financieros
+    # con la depreciación calculada en SQL y el total de empleados
+    valuation = device_valuation_subquery(today, Device.estado)
+    status_counts = [
+        func.count(valuation.c.id).filter(valuation.c.estado == estado).label(estado.value)
+        for estado in DeviceStatus
+    ]
+    row = db.execute(
+        select(
+            func.count(valuation.c.id).label("total"),
+            *status_counts,
+            func.coalesce(func.sum(valuation.c.costo_inicial), 0).label("total_value_initial"),
+            func.coalesce(func.sum(valuation.c.valor_actual), 0).label("total_value_current"),
+            select(func.count(Employee.id)).scalar_subquery().label("total_employees"),
+        )
+    ).one()
+
+    total_value_initial = float(row.total_value_initial)
+    total_value_current = float(row.total_value_current)
     
     return {
         "devices": {
-            "total": total_devices,
-            "assigned": assigned_devices,
-            "available": available_devices,
-            "baja": baja_devices
+            "total": row.total,
+            "assigned": getattr(row, DeviceStatus.ASIGNADO.value),
+            "available": getattr(row, DeviceStatus.DISPONIBLE.value),
+            "baja": getattr(row, DeviceStatus.BAJA.value)
         },
         "employees": {
-            "total": total_employees
+            "total": row.total_employees
         },
         "financial": {
             "total_value_initial": round(total_value_initial, 2),
@@ -53,11 +66,357 @@ def get_dashboard_stats(
         }
     }
 
-@router.get("/devices-by-status")
-def get_devices_by_status(
-    db: Session = Depends(get_db),
+@router.get("/dashboard", dependencies=[Depends(query_budget(2))])
+async def get_dashboard_stats(
+    db = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Estadísticas generales para el dashboard"""
+    today = date.today()
+    # La fecha forma parte de la clave: el valor depreciado cambia cada día
+    # El lock de la caché se toma fuera de run_db (que con AsyncSession corre en el event loop)
+    return await report_cache.get_or_compute_async(
+        f"dashboard:{today.isoformat()}",
+        lambda: run_db(db, lambda session: _compute_dashboard_stats(session, today))
+    )
+
+@router.get("/devices-by-status", dependencies=[Depends(query_budget(2))])
+async def get_devices_by_status(
+    db = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Agrupación de dispositivos por estado"""
-    stats = db.query(Device.estado, func.count(Device.id)).group_by(Device.estado).all()
-    return {s[0].value: s[1] for s in stats}
+    def compute(session: Session):
+        stats = session.query(Device.estado, func.count(Device.id)).group_by(Device.estado).all()
+        return {s[0].value: s[1] for s in stats}
+
+    return await report_cache.get_or_compute_async("devices-by-status", lambda: run_db(db, compute))
+
+
+def _load_fleet(db: Session, estado: Optional[DeviceStatus]):
+    """Dispositivos a valorar: una consulta con solo las columnas necesarias"""
+    query = select(Device.id, Device.marca, Device.modelo, Device.fecha_compra, Device.costo_inicial).order_by(Device.id)
+    if estado:
+        query = query.where(Device.estado == estado)
+    return db.execute(query).all()
+
+
+def _valuation_matrix(devices, fechas):
+    """Valor en libros (dispositivos x fechas) con NaN antes de la fecha de compra"""
+    compras = np.array([d.fecha_compra for d in devices], dtype="datetime64[D]")
+    valores = book_values([d.costo_inicial for d in devices], compras, fechas)
+    comprado = compras[:, None] <= np.array(fechas, dtype="datetime64[D]")[None, :]
+    valores[~comprado] = np.nan
+    return valores, comprado
+
+
+def _valuation_totals(devices, fechas, valores, comprado) -> list:
+    """Totales de la flota por fecha (solo dispositivos ya comprados)"""
+    costos = np.array([d.costo_inicial for d in devices], dtype=np.float64)
+    cantidad = comprado.sum(axis=0)
+    costo_total = (costos[:, None] * comprado).sum(axis=0)
+    valor_total = np.nansum(valores, axis=0)
+    acumulada = costo_total - valor_total
+    totales = []
+    for i, fecha in enumerate(fechas):
+        totales.append({
+            "fecha": fecha.isoformat(),
+            "dispositivos": int(cantidad[i]),
+            "costo_inicial": round(float(costo_total[i]), 2),
+            "valor_libros": round(float(valor_total[i]), 2),
+            "depreciacion_acumulada": round(float(acumulada[i]), 2),
+            # Gasto del mes: variación de la depreciación acumulada (sin dato en el primer mes)
+            "depreciacion_mes": round(float(acumulada[i] - acumulada[i - 1]), 2) if i else None,
+        })
+    return totales
+
+
+@router.get("/valuation", dependencies=[Depends(query_budget(2))])
+def get_valuation(
+    meses_atras: int = Query(36, ge=0, le=120),
+    meses_adelante: int = Query(36, ge=0, le=120),
+    estado: Optional[DeviceStatus] = None,
+    detalle: bool = False,
+    formato: str = Query("json", pattern="^(json|xlsx|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Valor en libros de la flota a fin de cada mes (pasados y proyectados)
+
+    Línea recta a 36 meses como Device.calcular_depreciacion, calculada con NumPy para
+    todos los dispositivos y meses en una pasada. Un dispositivo cuenta desde su fecha
+    de compra. Con detalle=true incluye la matriz por dispositivo (xlsx / csv: una fila
+    por dispositivo y una columna por mes).
+    """
+    today = date.today()
+    fechas = month_ends(today, meses_atras, meses_adelante)
+
+    def compute() -> dict:
+        devices = _load_fleet(db, estado)
+        valores, comprado = _valuation_matrix(devices, fechas)
+        report = {
+            "fecha_calculo": today.isoformat(),
+            "vida_util_meses": VIDA_UTIL_MESES,
+            "fechas": [f.isoformat() for f in fechas],
+            "totales": _valuation_totals(devices, fechas, valores, comprado),
+        }
+        if detalle:
+            # Conversión en bloque a listas de Python (None antes de la compra)
+            matriz = valores.astype(object)
+            matriz[~comprado] = None
+            report["dispositivos"] = [
+                {
+                    "id": d.id,
+                    "marca": d.marca,
+                    "modelo": d.modelo,
+                    "fecha_compra": d.fecha_compra.isoformat(),
+                    "costo_inicial": d.costo_inicial,
+                    "valores": row,
+                }
+                for d, row in zip(devices, matriz.tolist())
+            ]
+        return report
+
+    if detalle:
+        report = compute()
+    else:
+        # Los totales se guardan en caché (se invalidan con las escrituras de dispositivos)
+        estado_key = estado.value if estado else "todos"
+        report = report_cache.get_or_compute(
+            f"valuation:{today.isoformat()}:{meses_atras}:{meses_adelante}:{estado_key}", compute
+        )
+    if formato == "json":
+        return report
+
+    if detalle:
+        headers = ["ID", "Marca", "Modelo", "Fecha Compra", "Costo Inicial", *report["fechas"]]
+        rows = (
+            [d["id"], d["marca"], d["modelo"], date.fromisoformat(d["fecha_compra"]), d["costo_inicial"], *d["valores"]]
+            for d in report["dispositivos"]
+        )
+    else:
+        headers = ["Fecha", "Dispositivos", "Costo Inicial", "Valor en Libros", "Depreciación Acumulada", "Depreciación del Mes"]
+        rows = (
+            [date.fromisoformat(t["fecha"]), t["dispositivos"], t["costo_inicial"], t["valor_libros"],
+             t["depreciacion_acumulada"], t["depreciacion_mes"]]
+            for t in report["totales"]
+        )
+
+    filename = f"valoracion_{today.strftime('%Y%m%d')}"
+    if formato == "csv":
+        body, media_type = iter_csv(headers, rows), CSV_MEDIA_TYPE
+    else:
+        body, media_type = iter_xlsx(headers, rows, sheet_name="Valoración"), XLSX_MEDIA_TYPE
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{formato}"}
+    )
+
+
+@router.get("/plan-costs", dependencies=[Depends(query_budget(5))])
+def get_plan_costs(
+    agrupar_por: List[str] = Query(["departamento"]),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    depreciacion: bool = False,
+    formato: str = Query("json", pattern="^(json|xlsx|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Costo mensual de líneas (planes) por departamento, ubicación y/o empresa
+
+    Cada mes suma el costo mensual del plan de las líneas asignadas al cierre del mes
+    (hoy para el mes en curso) y, con depreciacion=true, la depreciación de sus equipos
+    en el mes. Los meses cerrados salen de la tabla agregada plan_cost_rollups, que se
+    completa fuera de la petición (upgrade_db, foto diaria o en segundo plano). Los
+    meses que todavía se están calculando se listan en meses_pendientes (JSON); una
+    exportación con meses pendientes responde 503 para reintentar. Por defecto, los
+    últimos 12 meses.
+    """
+    invalidas = [d for d in agrupar_por if d not in ROLLUP_DIMENSIONS]
+    if invalidas or not agrupar_por:
+        raise HTTPException(status_code=400, detail=f"agrupar_por admite: {', '.join(ROLLUP_DIMENSIONS)}")
+    dimensions = list(dict.fromkeys(agrupar_por))
+
+    today = date.today()
+    hasta = min(hasta or today, today)
+    desde = month_start(desde or shift_months(month_start(hasta), -11))
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior a hasta")
+
+    filas, pendientes = plan_cost_rows(db, dimensions, desde, hasta, depreciacion)
+    if formato == "json":
+        return {
+            "agrupar_por": dimensions,
+            "desde": desde.strftime("%Y-%m"),
+            "hasta": hasta.strftime("%Y-%m"),
+            "filas": filas,
+            "meses_pendientes": [m.strftime("%Y-%m") for m in pendientes],
+        }
+    if pendientes:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Calculando el costo por línea de {len(pendientes)} meses, reintentar en unos segundos",
+            headers={"Retry-After": "10"},
+        )
+
+    titles = {"departamento": "Departamento", "ubicacion": "Ubicación", "empresa": "Empresa"}
+    headers = ["Mes", *[titles[d] for d in dimensions], "Líneas", "Costo Planes"]
+    if depreciacion:
+        headers.append("Depreciación")
+    rows = ([f[key] for key in f] for f in filas)
+
+    filename = f"costo_lineas_{today.strftime('%Y%m%d')}"
+    if formato == "csv":
+        body, media_type = iter_csv(headers, rows), CSV_MEDIA_TYPE
+    else:
+        body, media_type = iter_xlsx(headers, rows, sheet_name="Costo por línea"), XLSX_MEDIA_TYPE
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{formato}"}
+    )
+
+
+@router.get("/snapshots", response_model=List[FleetSnapshotResponse], dependencies=[Depends(query_budget(2))])
+async def get_snapshots(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    db = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Fotos diarias del inventario entre desde y hasta (por defecto, el último año)
+
+    Conteos por estado, costo, valor en libros y asignaciones activas de cada día,
+    para gráficos de tendencia. Los días sin foto (servidor apagado) no aparecen.
+    """
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=365)
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior a hasta")
+
+    def list_snapshots(session: Session):
+        snapshots = (
+            session.query(FleetSnapshot)
+            .filter(FleetSnapshot.fecha >= desde, FleetSnapshot.fecha <= hasta)
+            .order_by(FleetSnapshot.fecha)
+            .all()
+        )
+        return [FleetSnapshotResponse.model_validate(s) for s in snapshots]
+
+    return await run_db(db, list_snapshots)
+
+
+@router.post("/snapshots", response_model=FleetSnapshotResponse, status_code=status.HTTP_201_CREATED)
+def create_snapshot(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Tomar ahora la foto del día (reemplaza la existente; Solo Admin)"""
+    return take_snapshot(db, origen="manual")
+
+
+def _utilization_period(desde: Optional[date], hasta: Optional[date]):
+    """Periodo del reporte de uso (por defecto, el último año)"""
+    today = date.today()
+    hasta = hasta or today
+    desde = desde or hasta - timedelta(days=365)
+    if desde >= utilization_window(desde, hasta, today):
+        raise HTTPException(status_code=400, detail="El periodo debe incluir días anteriores a hoy")
+    return desde, hasta
+
+
+def _utilization_query(session: Session, desde: date, hasta: date, search: Optional[str],
+                       estado: Optional[DeviceStatus]):
+    """Dispositivos con su uso en el periodo (una fila por dispositivo) y la subquery de uso"""
+    usage = device_utilization_subquery(desde, hasta)
+    fila = Bundle(
+        "fila",
+        Device.id, Device.marca, Device.modelo, Device.numero_telefono, Device.estado, Device.fecha_compra,
+        usage.c.dias_periodo, usage.c.dias_asignado, usage.c.dias_inactivo, usage.c.utilizacion,
+        usage.c.responsables, usage.c.asignaciones, usage.c.inactivo_max, usage.c.dias_sin_asignar,
+    )
+    query = session.query(fila).select_from(Device).join(usage, usage.c.id == Device.id)
+    query, rank = join_search(query, session, "devices", Device.id, search)
+    if estado:
+        query = query.filter(Device.estado == estado)
+    return query, usage, rank
+
+
+def _utilization_row(fila) -> DeviceUtilization:
+    row = DeviceUtilization.model_validate(fila)
+    if row.utilizacion is not None:
+        row.utilizacion = round(row.utilizacion, 2)
+    return row
+
+
+@router.get("/utilization", response_model=List[DeviceUtilization], dependencies=[Depends(query_budget(3))])
+async def get_utilization(
+    response: Response,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    search: Optional[str] = None,
+    estado: Optional[DeviceStatus] = None,
+    orden: str = Query("utilizacion", pattern="^(utilizacion|sin_asignar|id)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Uso de cada dispositivo en un periodo: días asignado y sin asignar, responsables
+
+    Calculado en la base con funciones de ventana (MAX acumulado de los fines de las
+    asignaciones anteriores de cada equipo, que no cuenta dos veces los tramos
+    solapados o anidados). Orden: utilizacion (los menos usados primero),
+    sin_asignar (más días en el cajón al final del periodo) o id. Paginado por cursor
+    (ver X-Next-Cursor); exportable en /reports/utilization/export.
+    """
+    desde, hasta = _utilization_period(desde, hasta)
+
+    def list_utilization(session: Session):
+        query, usage, rank = _utilization_query(session, desde, hasta, search, estado)
+        keys = {
+            "utilizacion": [(usage.c.utilizacion, False), (Device.id, False)],
+            "sin_asignar": [(usage.c.dias_sin_asignar, True), (Device.id, False)],
+            "id": [(Device.id, False)],
+        }[orden]
+        rows = paginate(query, keys, response, limit, skip, cursor, include_total, rank)
+        return [_utilization_row(fila) for fila in rows]
+
+    return await run_db(db, list_utilization)
+
+
+@router.get("/utilization/export", dependencies=[Depends(query_budget(2))])
+def export_utilization(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    search: Optional[str] = None,
+    estado: Optional[DeviceStatus] = None,
+    formato: str = Query("xlsx", pattern="^(xlsx|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Exportar el uso de los dispositivos en el periodo (los menos usados primero)"""
+    desde, hasta = _utilization_period(desde, hasta)
+    query, usage, _ = _utilization_query(db, desde, hasta, search, estado)
+
+    def to_row(result):
+        row = _utilization_row(result[0])
+        return [
+            row.id, row.marca, row.modelo, row.numero_telefono, row.estado.value, row.fecha_compra,
+            row.dias_periodo, row.dias_asignado, row.dias_inactivo, row.utilizacion,
+            row.responsables, row.asignaciones, row.inactivo_max, row.dias_sin_asignar,
+        ]
+
+    headers = ["ID", "Marca", "Modelo", "Número", "Estado", "Fecha Compra", "Días Periodo", "Días Asignado",
+               "Días Sin Asignar", "Utilización (%)", "Responsables", "Asignaciones", "Mayor Tramo Sin Asignar",
+               "Sin Asignar al Cierre"]
+    query = query.order_by(usage.c.utilizacion, Device.id)
+    return export_response(db, query, headers, to_row, f"uso_dispositivos_{desde:%Y%m%d}_{hasta:%Y%m%d}", "Uso", formato)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -6,19 +6,24 @@ from backend.database import get_db
 from backend.models.user import User, UserRole
 from backend.models.user_activity import UserActivity
 from backend.schemas.user import UserCreate, UserUpdate, UserResponse, UserActivityResponse
-from backend.services.auth import get_current_active_admin, get_password_hash
+from backend.services.auth import get_current_active_admin, get_password_hash, invalidate_principals
+from backend.services.pagination import paginate
+from backend.services.query_budget import query_budget
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=List[UserResponse], dependencies=[Depends(query_budget(2))])
 def read_users(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_admin)
 ):
-    """Listar todos los usuarios (solo admin)"""
-    users = db.query(User).offset(skip).limit(limit).all()
+    """Listar todos los usuarios (solo admin, paginado por cursor, ver X-Next-Cursor)"""
+    users = paginate(db.query(User), [(User.id, False)], response, limit, skip, cursor, include_total)
     return users
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -71,10 +76,11 @@ def update_user(
         user.hashed_password = get_password_hash(user_update.password)
         
     db.commit()
+    invalidate_principals()
     db.refresh(user)
     return user
 
-@router.get("/{user_id}/activity", response_model=List[UserActivityResponse])
+@router.get("/{user_id}/activity", response_model=List[UserActivityResponse], dependencies=[Depends(query_budget(2))])
 def read_user_activity(
     user_id: int,
     limit: int = 50,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 
@@ -48,6 +48,8 @@ class AssignmentResponse(AssignmentBase):
     fecha_devolucion: Optional[date] = None
     acta_entrega_url: Optional[str] = None
     acta_remision_url: Optional[str] = None
+    acta_entrega_estado: Optional[str] = None
+    acta_remision_estado: Optional[str] = None
     device: Optional[DeviceBrief] = None
     employee: Optional[EmployeeBrief] = None
     created_at: datetime
@@ -57,6 +59,30 @@ class AssignmentResponse(AssignmentBase):
         from_attributes = True
 
 
+class ActaJobStatus(BaseModel):
+    """Schema del estado de generación de un acta"""
+    estado: Optional[str] = None
+    url: Optional[str] = None
+
+
+class AssignmentPdfStatus(BaseModel):
+    """Schema del estado de las actas de una asignación"""
+    id: int
+    entrega: ActaJobStatus
+    remision: ActaJobStatus
+
+
+class ActaBatchRequest(BaseModel):
+    """Schema para descargar actas en lote (por IDs o con los filtros del listado)"""
+    ids: Optional[List[int]] = None
+    search: Optional[str] = None
+    employee_id: Optional[int] = None
+    device_id: Optional[int] = None
+    active_only: bool = False
+    doc_type: str = Field("entrega", pattern="^(entrega|remision)$")
+    formato: str = Field("zip", pattern="^(zip|pdf)$")
+
+
 class AssignmentWithDetails(AssignmentResponse):
     """Schema de asignación con detalles extendidos"""
     pass
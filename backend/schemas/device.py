@@ -56,3 +56,12 @@ class DeviceWithDepreciation(DeviceResponse):
 class DeviceHistory(DeviceResponse):
     """Schema de dispositivo con historial de asignaciones"""
     historial: List[dict] = []
+
+
+class DepreciationBatchRequest(BaseModel):
+    """Schema para calcular la depreciación en lote (por IDs o con los filtros del listado)"""
+    ids: Optional[List[int]] = Field(None, max_length=10000)
+    search: Optional[str] = None
+    estado: Optional[DeviceStatus] = None
+    fechas: List[date] = Field(default_factory=lambda: [date.today()], min_length=1, max_length=120)
+    formato: str = Field("json", pattern="^(json|csv)$")
@@ -0,0 +1,42 @@
+from pydantic import BaseModel, computed_field
+from typing import Optional, List
+from datetime import datetime
+
+
+class ImportRowError(BaseModel):
+    """Error de una fila del archivo importado"""
+    hoja: str
+    fila: int
+    error: str
+
+
+class ImportJobResponse(BaseModel):
+    """Schema de respuesta de una importación (progreso y resultado)"""
+    id: int
+    filename: str
+    estado: str
+    dry_run: bool
+    total_filas: Optional[int] = None
+    filas_procesadas: int
+    resultado: Optional[dict] = None
+    mensaje: Optional[str] = None
+    user_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def progreso(self) -> Optional[float]:
+        """Porcentaje de filas leídas (None mientras no se conoce el total)"""
+        if not self.total_filas:
+            return None
+        return round(min(self.filas_procesadas / self.total_filas, 1.0) * 100, 1)
+
+    class Config:
+        from_attributes = True
+
+
+class ImportJobDetail(ImportJobResponse):
+    """Importación con los errores por fila"""
+    errores: Optional[List[ImportRowError]] = None
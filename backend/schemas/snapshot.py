@@ -0,0 +1,25 @@
+from pydantic import BaseModel, computed_field
+from datetime import datetime, date
+
+
+class FleetSnapshotResponse(BaseModel):
+    """Schema de respuesta de una foto diaria del inventario"""
+    fecha: date
+    dispositivos: int
+    disponibles: int
+    asignados: int
+    baja: int
+    costo_total: float
+    valor_libros: float
+    asignaciones_activas: int
+    empleados: int
+    origen: str
+    updated_at: datetime
+
+    @computed_field
+    @property
+    def depreciacion_acumulada(self) -> float:
+        return round(self.costo_total - self.valor_libros, 2)
+
+    class Config:
+        from_attributes = True
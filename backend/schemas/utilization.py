@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+from backend.models.device import DeviceStatus
+
+
+class DeviceUtilization(BaseModel):
+    """Schema de uso de un dispositivo en un periodo (días asignado, en el cajón y responsables)"""
+    id: int
+    marca: str
+    modelo: str
+    numero_telefono: Optional[str] = None
+    estado: DeviceStatus
+    fecha_compra: date
+    dias_periodo: int
+    dias_asignado: int
+    dias_inactivo: int
+    utilizacion: Optional[float] = None  # porcentaje del periodo asignado
+    responsables: int
+    asignaciones: int
+    inactivo_max: int  # mayor tramo sin asignar dentro del periodo
+    dias_sin_asignar: int  # días sin asignar al final del periodo
+
+    class Config:
+        from_attributes = True
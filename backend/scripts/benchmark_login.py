@@ -0,0 +1,142 @@
+"""
+Benchmark de latencia durante una ráfaga de logins
+
+Levanta la API con uvicorn sobre una base SQLite temporal y mide la latencia de
+GET / (async, sin threadpool) y de GET /plans/ (endpoint sync autenticado, usa el
+threadpool compartido) mientras se hacen N logins en paralelo:
+- "inline": login async con bcrypt en el event loop (primera versión)
+- "sync": login sync esperando el pool de bcrypt (retiene un hilo del threadpool)
+- "pool": /auth/login actual (async, bcrypt en el pool acotado esperado con await)
+
+Uso: python backend/scripts/benchmark_login.py [logins]
+"""
+import sys
+import os
+import asyncio
+import socket
+import statistics
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Base temporal: debe definirse antes de importar backend.database
+_tmpdir = tempfile.mkdtemp(prefix="bench_login_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import httpx
+import uvicorn
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+
+from backend.database import Base, SessionLocal, engine
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.services.auth import _hash_executor, create_access_token, get_password_hash, pwd_context
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+PROBES = 200
+
+
+@app.post("/bench/login-inline")
+async def login_inline(form_data: OAuth2PasswordRequestForm = Depends()):
+    """Login como era antes: consulta y bcrypt bloqueando el event loop"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == form_data.username).first()
+        if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+            raise HTTPException(status_code=401)
+        return {"access_token": create_access_token({"sub": user.username}), "token_type": "bearer"}
+    finally:
+        db.close()
+
+
+@app.post("/bench/login-sync")
+def login_sync(form_data: OAuth2PasswordRequestForm = Depends()):
+    """Login sync: bloquea un hilo del threadpool mientras espera el pool de bcrypt"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == form_data.username).first()
+        if not user or not _hash_executor.submit(pwd_context.verify, form_data.password, user.hashed_password).result():
+            raise HTTPException(status_code=401)
+        return {"access_token": create_access_token({"sub": user.username}), "token_type": "bearer"}
+    finally:
+        db.close()
+
+
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(User(username=USERNAME, email="bench@example.com",
+                    hashed_password=get_password_hash(PASSWORD), role=UserRole.ADMIN))
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_server() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+PROBE_PATHS = ("/", "/plans/")
+
+
+async def run(base_url: str, login_path: str, logins: int):
+    """Latencias de cada ruta de PROBE_PATHS durante la ráfaga y duración total"""
+    limits = httpx.Limits(max_connections=logins + 10)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': USERNAME, 'role': 'admin'})}"}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for path in PROBE_PATHS:
+            (await client.get(path, headers=headers)).raise_for_status()
+
+        async def login():
+            r = await client.post(login_path, data={"username": USERNAME, "password": PASSWORD})
+            r.raise_for_status()
+
+        async def probe(path, latencies):
+            for _ in range(PROBES):
+                start = time.perf_counter()
+                await client.get(path, headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+
+        latencies = {path: [] for path in PROBE_PATHS}
+        start = time.perf_counter()
+        await asyncio.gather(*[probe(path, latencies[path]) for path in PROBE_PATHS],
+                             *[login() for _ in range(logins)])
+        total = time.perf_counter() - start
+    return latencies, total
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    setup_db()
+    base_url = start_server()
+
+    print(f"📊 {logins} logins en paralelo, {PROBES} peticiones concurrentes a cada ruta\n")
+    print(f"{'modo':<8} {'ruta':<8} {'p50 ms':>9} {'p99 ms':>9} {'máx ms':>9} {'total s':>9}")
+    modes = (("inline", "/bench/login-inline"), ("sync", "/bench/login-sync"), ("pool", "/auth/login"))
+    for label, login_path in modes:
+        latencies, total = asyncio.run(run(base_url, login_path, logins))
+        for path in PROBE_PATHS:
+            values = latencies[path]
+            print(f"{label:<8} {path:<8} {statistics.median(values):>9.1f} {percentile(values, 99):>9.1f} "
+                  f"{max(values):>9.1f} {total:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
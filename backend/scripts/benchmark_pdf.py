@@ -0,0 +1,82 @@
+"""
+Micro-benchmark del render de actas
+
+Compara el tiempo por documento reconstruyendo la plantilla en cada render
+(comportamiento anterior: estilos, logo y párrafos fijos por llamada) contra la
+plantilla compilada una vez por proceso.
+
+Uso: python backend/scripts/benchmark_pdf.py [repeticiones]
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# Las rutas de static/ son relativas a la raíz del proyecto
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.services import pdf_generator
+from backend.services.pdf_generator import generate_acta_entrega, generate_acta_remision
+
+ENTREGA_DATA = {
+    "employee_name": "Juan Pérez",
+    "employee_cargo": "Analista",
+    "responsable_nombre": "Administrador",
+    "responsable_cargo": "Responsable de Informática",
+    "fecha_asignacion": date(2025, 3, 4),
+    "numero_telefono": "88887777",
+    "device_marca": "SAMSUNG",
+    "device_modelo": "A52",
+    "device_imei": "359000000000000",
+    "device_estado_fisico": "nuevo",
+}
+
+REMISION_DATA = {
+    "employee_name": "Ana López",
+    "employee_cargo": "Contadora",
+    "fecha_asignacion": date(2024, 3, 4),
+    "fecha_devolucion": date(2025, 1, 2),
+    "device_marca": "IPHONE",
+    "device_modelo": "13",
+    "device_numero_serie": "F2LXK0000000",
+    "device_imei": "356000000000000",
+    "observaciones": "Pantalla con rayones",
+}
+
+
+def _measure(generator, data, output_dir, repeticiones, compilada):
+    """Tiempo promedio por documento en milisegundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        if not compilada:
+            pdf_generator.get_template.cache_clear()
+        inicio = time.perf_counter()
+        path = generator(data, output_dir)
+        tiempos.append(time.perf_counter() - inicio)
+        os.remove(path)
+    return sum(tiempos) / len(tiempos) * 1000
+
+
+def benchmark(repeticiones: int = 50):
+    output_dir = tempfile.mkdtemp(prefix="bench_pdf_")
+    try:
+        # Calentamiento (imports perezosos de ReportLab, fuentes)
+        generate_acta_entrega(ENTREGA_DATA, output_dir)
+
+        print(f"📄 Render de actas ({repeticiones} repeticiones)")
+        print(f"{'Documento':<12}{'Sin plantilla (ms)':>20}{'Compilada (ms)':>18}{'Mejora':>10}")
+        for nombre, generator, data in [
+            ("entrega", generate_acta_entrega, ENTREGA_DATA),
+            ("remision", generate_acta_remision, REMISION_DATA),
+        ]:
+            antes = _measure(generator, data, output_dir, repeticiones, compilada=False)
+            despues = _measure(generator, data, output_dir, repeticiones, compilada=True)
+            print(f"{nombre:<12}{antes:>20.2f}{despues:>18.2f}{antes / despues:>9.2f}x")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,57 @@
+"""
+Benchmark y verificación del motor de valoración vectorizado
+
+Genera N dispositivos sintéticos y calcula su valor en libros a fin de cada mes
+(36 meses atrás y 36 adelante) con book_values (NumPy) y, sobre una muestra, con
+Device.calcular_depreciacion mes a mes. Falla (código de salida 1) si algún valor
+difiere; el tiempo del bucle se extrapola a todos los dispositivos.
+
+Uso: python backend/scripts/benchmark_valuation.py [dispositivos]
+"""
+import sys
+import os
+import random
+import time
+from datetime import date, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.models.device import Device
+from backend.services.depreciation import book_values, month_ends
+
+MUESTRA = 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    random.seed(11)
+    today = date.today()
+    fechas = month_ends(today, 36, 36)
+    # Compras hasta un año después de hoy: incluye dispositivos aún no comprados en algunos meses
+    compras = [today - timedelta(days=random.randint(-365, 6 * 365)) for _ in range(n)]
+    costos = [round(random.uniform(50, 1500), 2) for _ in range(n)]
+
+    start = time.perf_counter()
+    valores = book_values(costos, compras, fechas)
+    vectorizado = time.perf_counter() - start
+
+    muestra = random.sample(range(n), min(MUESTRA, n))
+    start = time.perf_counter()
+    diferencias = 0
+    for i in muestra:
+        device = Device(costo_inicial=costos[i], fecha_compra=compras[i])
+        for j, fecha in enumerate(fechas):
+            if device.calcular_depreciacion(fecha)["valor_actual"] != valores[i, j]:
+                diferencias += 1
+    bucle = (time.perf_counter() - start) * n / len(muestra)
+
+    print(f"📊 {n} dispositivos x {len(fechas)} meses ({n * len(fechas)} valores)\n")
+    print(f"  calcular_depreciacion (bucle, estimado): {bucle:>8.2f}s")
+    print(f"  book_values (NumPy):                     {vectorizado:>8.2f}s  ({bucle / vectorizado:.0f}x)")
+    if diferencias:
+        print(f"\n❌ {diferencias} valores difieren de Device.calcular_depreciacion")
+        sys.exit(1)
+    print(f"\n✅ {len(muestra) * len(fechas)} valores de la muestra idénticos a Device.calcular_depreciacion")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Verificación de asignaciones y devoluciones concurrentes
+
+Levanta la API con uvicorn y, en cada ronda, dispara N POST /assignments en paralelo
+sobre un mismo dispositivo disponible (cada uno para un empleado distinto) y luego N
+PUT /assignments/{id}/return sobre la asignación ganadora. Falla (código de salida 1)
+si no hay exactamente un 201 / 200 y el resto 409, o si queda más de una asignación
+activa. Al final asigna N dispositivos distintos en paralelo para comprobar que el
+bloqueo es por fila y no serializa todas las asignaciones.
+
+Por defecto usa una base SQLite temporal (sin FOR UPDATE: deciden el índice único de
+asignaciones activas y el UPDATE condicional de la devolución). Para probar el bloqueo
+de filas de Postgres, definir CONCURRENCY_DATABASE_URL con una base de pruebas.
+
+Uso: python backend/scripts/check_concurrent_assignments.py [peticiones] [rondas]
+"""
+import sys
+import os
+import asyncio
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Base y carpeta de actas temporales: deben definirse antes de importar el backend
+_tmpdir = tempfile.mkdtemp(prefix="concurrency_")
+os.environ["DATABASE_URL"] = os.getenv("CONCURRENCY_DATABASE_URL") or f"sqlite:///{os.path.join(_tmpdir, 'concurrency.db')}"
+
+from backend.services import pdf_jobs
+pdf_jobs.PDF_DIR = _tmpdir
+
+import httpx
+import uvicorn
+
+from backend.database import Base, SessionLocal, engine
+from backend.main import app
+from backend.models.assignment import Assignment
+from backend.models.device import Device
+from backend.models.employee import Employee
+from backend.models.user import User, UserRole
+from backend.services.auth import create_access_token
+
+
+def setup_db(requests: int, rounds: int):
+    """Usuario editor, un empleado por petición y un dispositivo por ronda (más los del final)"""
+    Base.metadata.create_all(bind=engine)
+    tag = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        username = f"concurrency_{tag}"
+        db.add(User(username=username, email=f"{username}@example.com", hashed_password="-", role=UserRole.RRHH))
+        employees = [Employee(nombre_completo=f"Concurrencia {tag} {i}") for i in range(requests)]
+        devices = [
+            Device(marca="TEST", modelo=f"C{i}", numero_telefono=f"{tag}{i:04d}", costo_inicial=100,
+                   fecha_compra=date(2024, 1, 1))
+            for i in range(rounds + requests)
+        ]
+        db.add_all(employees + devices)
+        db.commit()
+        return username, [e.id for e in employees], [d.id for d in devices]
+    finally:
+        db.close()
+
+
+def start_server() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def active_assignments(device_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Assignment).filter(
+            Assignment.device_id == device_id, Assignment.fecha_devolucion == None
+        ).count()
+    finally:
+        db.close()
+
+
+async def race(client, requests):
+    """Lanza las peticiones a la vez y devuelve (códigos de estado, respuestas)"""
+    responses = await asyncio.gather(*requests)
+    return Counter(r.status_code for r in responses), responses
+
+
+async def run(base_url: str, headers: dict, employee_ids, device_ids, rounds: int) -> int:
+    failures = 0
+    limits = httpx.Limits(max_connections=len(employee_ids) + 10)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=120) as client:
+        for n, device_id in enumerate(device_ids[:rounds], start=1):
+            codes, responses = await race(client, [
+                client.post("/assignments/", json={
+                    "device_id": device_id, "employee_id": employee_id, "fecha_asignacion": date.today().isoformat()
+                })
+                for employee_id in employee_ids
+            ])
+            activas = active_assignments(device_id)
+            ok = codes[201] == 1 and codes[409] == len(employee_ids) - 1 and activas == 1
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} ronda {n}: asignar  {dict(codes)}  activas: {activas}")
+            winner = next((r.json()["id"] for r in responses if r.status_code == 201), None)
+            if winner is None:
+                continue
+
+            codes, _ = await race(client, [client.put(f"/assignments/{winner}/return", json={})
+                                           for _ in employee_ids])
+            activas = active_assignments(device_id)
+            ok = codes[200] == 1 and codes[409] == len(employee_ids) - 1 and activas == 0
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} ronda {n}: devolver {dict(codes)}  activas: {activas}")
+
+        # Dispositivos distintos: ninguna debe fallar ni esperar a las demás
+        start = time.perf_counter()
+        codes, _ = await race(client, [
+            client.post("/assignments/", json={
+                "device_id": device_id, "employee_id": employee_id, "fecha_asignacion": date.today().isoformat()
+            })
+            for device_id, employee_id in zip(device_ids[rounds:], employee_ids)
+        ])
+        ok = codes[201] == len(employee_ids)
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {len(employee_ids)} dispositivos distintos en paralelo: {dict(codes)} "
+              f"en {time.perf_counter() - start:.2f}s")
+    return failures
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    username, employee_ids, device_ids = setup_db(requests, rounds)
+    base_url = start_server()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': username, 'role': 'rrhh'})}"}
+
+    print(f"🔀 {requests} peticiones simultáneas por ronda, {rounds} rondas ({engine.dialect.name})\n")
+    failures = asyncio.run(run(base_url, headers, employee_ids, device_ids, rounds))
+    if failures:
+        print(f"\n❌ {failures} verificaciones fallaron")
+        sys.exit(1)
+    print("\n✅ Exactamente un ganador por dispositivo en cada ronda")
+
+
+if __name__ == "__main__":
+    main()
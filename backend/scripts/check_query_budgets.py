@@ -0,0 +1,208 @@
+"""
+Verificación de los presupuestos de consultas SQL de los listados y exportaciones
+
+Crea una base SQLite temporal con unos miles de filas, recorre cada listado y
+exportación con QUERY_BUDGET_MODE=raise y falla (código de salida 1) si alguna
+petición ejecuta más consultas que las declaradas con query_budget() en su endpoint.
+Como el número de consultas no debe crecer con las filas, un N+1 nuevo aparece aquí
+aunque con los datos de desarrollo pase desapercibido.
+
+Las tablas agregadas (plan_cost_rollups) empiezan vacías, como tras una invalidación:
+el reporte se verifica primero sin meses calculados (la exportación responde 503
+mientras se completan en segundo plano) y después con la tabla completa.
+
+Uso: python backend/scripts/check_query_budgets.py [filas]
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Base temporal y modo estricto: deben definirse antes de importar el backend
+_tmpdir = tempfile.mkdtemp(prefix="query_budget_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'budget.db')}"
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+
+from fastapi.testclient import TestClient
+
+from backend.database import Base, SessionLocal, engine
+from backend.main import app
+from backend.models.assignment import Assignment
+from backend.models.device import Device, DeviceStatus
+from backend.models.employee import Employee
+from backend.models.plan import Plan
+from backend.models.user import User, UserRole
+from backend.models.user_activity import UserActivity
+from backend.services.auth import create_access_token
+from backend.services.current_assignment import refresh_current_assignments
+from backend.services.metrics import request_metrics
+from backend.services.plan_costs import invalidate_plan_cost_rollup, refresh_plan_cost_rollup, wait_plan_cost_refresh
+from backend.services.query_budget import QueryBudgetExceeded
+from backend.services.search import install_search_indexes
+from backend.services.snapshots import take_snapshot
+
+# Endpoints a verificar (listados y exportaciones) con sus parámetros
+ENDPOINTS = [
+    ("/devices/", {"limit": 100}),
+    ("/devices/", {"limit": 100, "search": "sam"}),
+    ("/devices/", {"limit": 100, "estado": "asignado", "include_total": True}),
+    ("/devices/available", {}),
+    ("/devices/export", {"formato": "csv"}),
+    ("/devices/export", {"formato": "xlsx"}),
+    ("/devices/1/history", {}),
+    ("/employees/", {"limit": 100}),
+    ("/employees/", {"limit": 100, "search": "empleado 1", "include_total": True}),
+    ("/employees/export", {"formato": "csv"}),
+    ("/employees/1/history", {}),
+    ("/assignments/", {"limit": 100}),
+    ("/assignments/", {"limit": 100, "active_only": True, "include_total": True}),
+    ("/assignments/", {"limit": 100, "search": "iphone"}),
+    ("/assignments/export", {"formato": "csv"}),
+    ("/plans/", {}),
+    ("/users/", {}),
+    ("/users/1/activity", {}),
+    ("/reports/dashboard", {}),
+    ("/reports/devices-by-status", {}),
+    ("/reports/valuation", {}),
+    ("/reports/valuation", {"detalle": True, "formato": "xlsx"}),
+    ("/reports/snapshots", {}),
+    ("/reports/utilization", {"limit": 100}),
+    ("/reports/utilization", {"limit": 100, "search": "sam", "orden": "sin_asignar", "include_total": True}),
+    ("/reports/utilization/export", {"formato": "csv", "desde": "2023-01-01", "hasta": "2023-12-31"}),
+]
+
+# Reportes que leen tablas agregadas: se verifican con la tabla vacía y completa
+ROLLUP_ENDPOINTS = [
+    ("/reports/plan-costs", {}),
+    ("/reports/plan-costs", {"agrupar_por": ["departamento", "ubicacion", "empresa"], "depreciacion": True,
+                             "desde": "2023-01-01", "formato": "xlsx"}),
+]
+
+# Endpoints POST con cuerpo JSON
+POST_ENDPOINTS = [
+    ("/devices/depreciation", {"fechas": ["2023-12-31", "2024-12-31", "2025-12-31"]}),
+    ("/devices/depreciation", {"search": "sam", "formato": "csv"}),
+]
+
+
+def seed(rows: int):
+    """Datos de prueba: rows empleados y dispositivos, ~2 asignaciones por dispositivo"""
+    Base.metadata.create_all(bind=engine)
+    install_search_indexes(engine)
+    random.seed(7)
+    db = SessionLocal()
+    try:
+        admin = User(username="admin", email="admin@example.com", hashed_password="-", role=UserRole.ADMIN)
+        db.add(admin)
+        plans = [Plan(nombre=f"PLAN {i}", costo_mensual=10 + i * 5) for i in range(5)]
+        db.add_all(plans)
+        db.flush()
+        db.add_all([UserActivity(user_id=admin.id, action="login") for _ in range(100)])
+
+        employees = [
+            Employee(nombre_completo=f"Empleado {i}", cargo="Analista", departamento=random.choice(["TI", "RRHH", "Ventas"]),
+                     ubicacion="Managua", empresa="NC")
+            for i in range(rows)
+        ]
+        db.add_all(employees)
+        devices = [
+            Device(marca=random.choice(["SAMSUNG", "IPHONE", "HUAWEI"]), modelo=f"M{i}", imei=f"35{i:013d}",
+                   numero_telefono=f"8{i:07d}", costo_inicial=150 + (i % 40) * 10,
+                   fecha_compra=date(2022, 1, 1) + timedelta(days=i % 900), plan_id=plans[i % len(plans)].id)
+            for i in range(rows)
+        ]
+        db.add_all(devices)
+        db.flush()
+
+        for device in devices:
+            start = date(2023, 1, 1) + timedelta(days=random.randint(0, 200))
+            for k in range(random.randint(1, 3)):
+                employee = random.choice(employees)
+                active = k == 2 or random.random() < 0.3
+                end = start + timedelta(days=random.randint(20, 120))
+                db.add(Assignment(device_id=device.id, employee_id=employee.id, fecha_asignacion=start,
+                                  fecha_devolucion=None if active else end))
+                if active:
+                    device.estado = DeviceStatus.ASIGNADO
+                    break
+                start = end + timedelta(days=3)
+        refresh_current_assignments(db)
+        db.commit()
+        take_snapshot(db)
+    finally:
+        db.close()
+
+
+def prepare_rollup(filled: bool):
+    """Deja plan_cost_rollups completa o vacía (como tras invalidar todos los meses)"""
+    wait_plan_cost_refresh()
+    db = SessionLocal()
+    try:
+        if filled:
+            refresh_plan_cost_rollup(db)
+        else:
+            invalidate_plan_cost_rollup(db)
+            db.commit()
+    finally:
+        db.close()
+
+
+def request_queries() -> int:
+    """Consultas contadas dentro de peticiones (sin las de hilos en segundo plano)"""
+    return int(sum(h.snapshot()["sum"] for h in list(request_metrics.queries.values())))
+
+
+def check_request(client, headers, method: str, path: str, params: dict, label: str = "",
+                  expected=(200,)) -> bool:
+    """Hace la petición y muestra sus consultas; False si excede el presupuesto o falla"""
+    before = request_queries()
+    try:
+        if method == "POST":
+            response = client.post(path, json=params, headers=headers)
+        else:
+            response = client.get(path, params=params, headers=headers)
+        result = "OK" if response.status_code in expected else f"HTTP {response.status_code}"
+    except QueryBudgetExceeded as e:
+        result = f"EXCEDIDO: {e}"
+    used = request_queries() - before
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    detail = result if result != "OK" else (f"({label})" if label else "")
+    print(f"{'✅' if result == 'OK' else '❌'} {used:>4} consultas  {method} {path}{'?' + query if query else ''}  {detail}")
+    return result == "OK"
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Creando {rows} empleados y dispositivos en {_tmpdir}...")
+    seed(rows)
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+
+    failures = 0
+    requests = [("GET", path, params) for path, params in ENDPOINTS]
+    requests += [("POST", path, body) for path, body in POST_ENDPOINTS]
+    for method, path, params in requests:
+        failures += not check_request(client, headers, method, path, params)
+
+    # Sin meses calculados (el reporte los calcula en vivo y lanza el llenado) y con la tabla completa
+    for filled in (False, True):
+        for path, params in ROLLUP_ENDPOINTS:
+            prepare_rollup(filled)
+            pending = not filled and params.get("formato", "json") != "json"
+            failures += not check_request(client, headers, "GET", path, params,
+                                          "tabla completa" if filled else "sin meses calculados",
+                                          (200,) if filled or not pending else (503,))
+            wait_plan_cost_refresh()
+    requests += [("GET", path, params) for path, params in ROLLUP_ENDPOINTS] * 2
+
+    if failures:
+        print(f"\n❌ {failures} endpoints fallaron")
+        sys.exit(1)
+    print(f"\n✅ {len(requests)} endpoints dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
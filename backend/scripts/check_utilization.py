@@ -0,0 +1,151 @@
+"""
+Verificación del reporte de uso de dispositivos (device_utilization_subquery)
+
+Crea una base SQLite temporal con historiales de asignación aleatorios (consecutivos,
+solapados y anidados, como los del Excel importado) y compara, para varios periodos,
+cada columna del reporte contra un recorrido día por día en Python. Falla (código de
+salida 1) si algún dispositivo no coincide.
+
+Uso: python backend/scripts/check_utilization.py [dispositivos]
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Base temporal: debe definirse antes de importar el backend
+_tmpdir = tempfile.mkdtemp(prefix="utilization_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'utilization.db')}"
+
+from sqlalchemy import select
+
+from backend.database import Base, SessionLocal, engine
+from backend.models.assignment import Assignment
+from backend.models.device import Device
+from backend.models.employee import Employee
+from backend.services.utilization import device_utilization_subquery, utilization_window
+
+COLUMNS = ("dias_periodo", "dias_asignado", "dias_inactivo", "utilizacion",
+           "responsables", "asignaciones", "inactivo_max", "dias_sin_asignar")
+
+# Caso fijo: dos asignaciones anidadas dentro de una larga (121 días asignados en 2024, no 140)
+NESTED_YEAR = 2024
+NESTED = [((2, 1), (6, 1)), ((3, 1), (3, 10)), ((4, 1), (4, 20))]
+
+
+def seed(db, devices: int, today: date):
+    """Historiales aleatorios y el caso anidado fijo; devuelve {device_id: [(ini, fin, empleado)]}"""
+    random.seed(25)
+    employees = [Employee(nombre_completo=f"Uso {i}") for i in range(50)]
+    db.add_all(employees)
+    db.flush()
+
+    historial = {}
+    nested = Device(marca="TEST", modelo="Anidado", costo_inicial=100, fecha_compra=date(NESTED_YEAR, 1, 1))
+    db.add(nested)
+    db.flush()
+    historial[nested.id] = [(date(NESTED_YEAR, *ini), date(NESTED_YEAR, *fin), employees[i].id)
+                            for i, (ini, fin) in enumerate(NESTED)]
+
+    for i in range(devices):
+        device = Device(marca="TEST", modelo=f"U{i}", costo_inicial=100,
+                        fecha_compra=today - timedelta(days=random.randint(30, 1500)))
+        db.add(device)
+        db.flush()
+        tramos = []
+        start = device.fecha_compra + timedelta(days=random.randint(0, 300))
+        while start < today and random.random() < 0.85:
+            end = start + timedelta(days=random.randint(1, 250))
+            employee = random.choice(employees).id
+            if end >= today or random.random() < 0.1:
+                tramos.append((start, None, employee))
+                break
+            tramos.append((start, end, employee))
+            # Siguiente: a veces antes del fin de la actual (solapada o anidada)
+            start = random.choice([end, end + timedelta(days=random.choice([1, 5, 30, 200])),
+                                   start + timedelta(days=random.randint(0, (end - start).days))])
+        historial[device.id] = [(ini, fin or today, emp) for ini, fin, emp in tramos]
+        db.add_all(Assignment(device_id=device.id, employee_id=emp, fecha_asignacion=ini, fecha_devolucion=fin)
+                   for ini, fin, emp in tramos)
+
+    db.add_all(Assignment(device_id=nested.id, employee_id=emp, fecha_asignacion=ini, fecha_devolucion=fin)
+               for ini, fin, emp in historial[nested.id])
+    db.commit()
+    compras = dict(db.execute(select(Device.id, Device.fecha_compra)).all())
+    return historial, compras, nested.id
+
+
+def expected(historial, compras, desde: date, hasta: date, today: date):
+    """Las columnas del reporte calculadas día por día"""
+    fin = utilization_window(desde, hasta, today)
+    result = {}
+    for device_id, tramos in historial.items():
+        if compras[device_id] >= fin:
+            continue
+        inicio = max(desde, compras[device_id])
+        dias, dia = [], inicio
+        while dia < fin:
+            dias.append(any(ini <= dia < f for ini, f, _ in tramos))
+            dia += timedelta(days=1)
+        en_periodo = [t for t in tramos if t[0] < fin and t[1] > inicio]
+        racha = maximo = 0
+        for asignado in dias:
+            racha = 0 if asignado else racha + 1
+            maximo = max(maximo, racha)
+        n, k = len(dias), sum(dias)
+        result[device_id] = dict(
+            dias_periodo=n, dias_asignado=k, dias_inactivo=n - k,
+            utilizacion=round(k * 100 / n, 2) if n else None,
+            responsables=len({emp for *_, emp in en_periodo}), asignaciones=len(en_periodo),
+            inactivo_max=maximo, dias_sin_asignar=racha,
+        )
+    return result
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    today = date.today()
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Creando {devices} dispositivos con historial en {_tmpdir}...")
+        historial, compras, nested_id = seed(db, devices, today)
+
+        year = today.year - 1
+        periodos = [
+            (today - timedelta(days=365), today),
+            (date(year, 1, 1), date(year, 12, 31)),
+            (date(year - 2, 3, 15), today - timedelta(days=40)),
+        ]
+        failures = 0
+        for desde, hasta in periodos:
+            usage = device_utilization_subquery(desde, hasta, today)
+            got = {}
+            for row in db.execute(select(usage)).mappings():
+                values = dict(row)
+                if values["utilizacion"] is not None:
+                    values["utilizacion"] = round(values["utilizacion"], 2)
+                got[values.pop("id")] = {c: values[c] for c in COLUMNS}
+            exp = expected(historial, compras, desde, hasta, today)
+            bad = [k for k in exp.keys() | got.keys() if exp.get(k) != got.get(k)]
+            failures += len(bad)
+            print(f"{'✅' if not bad else '❌'} {desde} a {hasta}: {len(exp)} dispositivos, {len(bad)} distintos")
+            for k in bad[:3]:
+                print(f"   {k}: esperado {exp.get(k)}, reporte {got.get(k)}")
+
+        usage = device_utilization_subquery(date(NESTED_YEAR, 1, 1), date(NESTED_YEAR, 12, 31), today)
+        anidado = db.execute(select(usage.c.dias_asignado).where(usage.c.id == nested_id)).scalar()
+        if anidado != 121:
+            failures += 1
+        print(f"{'✅' if anidado == 121 else '❌'} Asignaciones anidadas: {anidado} días asignados (esperado 121)")
+    finally:
+        db.close()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
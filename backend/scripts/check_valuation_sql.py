@@ -0,0 +1,83 @@
+"""
+Verificación de la valoración en SQL (device_valuation_subquery)
+
+Crea una base SQLite temporal con dispositivos de costos y fechas de compra
+aleatorios (fines de mes, 29 de febrero, compras posteriores a la fecha de cálculo)
+y compara el valor_actual de device_valuation_subquery con el de
+Device.calcular_depreciacion para varias fechas de cálculo. Falla (código de salida
+1) si algún valor difiere en más de medio centavo.
+
+Uso: python backend/scripts/check_valuation_sql.py [dispositivos]
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Base temporal: debe definirse antes de importar el backend
+_tmpdir = tempfile.mkdtemp(prefix="valuation_sql_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'valuation.db')}"
+
+from sqlalchemy import select
+
+from backend.database import Base, SessionLocal, engine
+from backend.models.device import Device
+from backend.services.depreciation import device_valuation_subquery
+
+# Fechas de compra que suelen romper el cálculo de meses con relativedelta
+COMPRAS_BORDE = [date(2024, 2, 29), date(2023, 1, 31), date(2023, 3, 31), date(2024, 12, 31),
+                 date(2022, 8, 30), date(2023, 2, 28)]
+
+FECHAS_CALCULO = [date(2024, 2, 29), date(2024, 3, 1), date(2025, 2, 28), date(2023, 4, 30),
+                  date(2024, 1, 31), date(2027, 6, 15)]
+
+
+def seed(db, n: int, today: date):
+    """Dispositivos con compras aleatorias y los casos de borde"""
+    random.seed(3)
+    compras = COMPRAS_BORDE + [today - timedelta(days=random.randint(-400, 5 * 365)) for _ in range(n)]
+    devices = [
+        Device(marca="TEST", modelo=f"V{i}", costo_inicial=round(random.uniform(50, 1500), 2), fecha_compra=compra)
+        for i, compra in enumerate(compras)
+    ]
+    db.add_all(devices)
+    db.commit()
+    return devices
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    today = date.today()
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Creando {n} dispositivos en {_tmpdir}...")
+        devices = seed(db, n, today)
+        fechas = FECHAS_CALCULO + [today] + [today + timedelta(days=random.randint(-900, 400)) for _ in range(6)]
+
+        failures = 0
+        for fecha in fechas:
+            valuation = device_valuation_subquery(fecha)
+            sql = dict(db.execute(select(valuation.c.id, valuation.c.valor_actual)).all())
+            distintos = []
+            for device in devices:
+                valor_modelo = device.calcular_depreciacion(fecha)["valor_actual"]
+                valor_sql = sql.get(device.id)
+                if valor_sql is None or abs(valor_sql - valor_modelo) > 0.005:
+                    distintos.append((device, valor_sql, valor_modelo))
+            failures += len(distintos)
+            print(f"{'✅' if not distintos else '❌'} {fecha}: {len(devices)} dispositivos, {len(distintos)} distintos")
+            for device, valor_sql, valor_modelo in distintos[:3]:
+                print(f"   {device.id} (compra {device.fecha_compra}, costo {device.costo_inicial}): "
+                      f"SQL {valor_sql}, modelo {valor_modelo}")
+    finally:
+        db.close()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
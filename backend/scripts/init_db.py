@@ -11,12 +11,18 @@ from backend.models.employee import Employee
 from backend.models.device import Device
 from backend.models.assignment import Assignment
 from backend.models.plan import Plan
+from backend.models.import_job import ImportJob
+from backend.models.plan_cost_rollup import PlanCostRollup, PlanCostRollupVersion
+from backend.models.fleet_snapshot import FleetSnapshot
+from backend.services.search import install_search_indexes
 
 def init_db():
     """Crear todas las tablas"""
     print("Creando tablas en la base de datos...")
     Base.metadata.create_all(bind=engine)
     print("✓ Tablas creadas exitosamente")
+    backend = install_search_indexes(engine)
+    print(f"✓ Índices de búsqueda creados ({backend})")
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,74 @@
+"""
+Script para eliminar actas huérfanas de backend/static/pdfs
+
+Borra los PDFs que ninguna asignación referencia (copias de regeneraciones
+anteriores) y los temporales de renders interrumpidos. Solo toca archivos con más
+de PDF_PRUNE_GRACE_MINUTES de antigüedad: un render en curso todavía no tiene su URL
+guardada y su temporal sigue escribiéndose.
+
+Uso: python backend/scripts/prune_pdfs.py [--apply]   (sin --apply solo lista)
+"""
+import sys
+import os
+import glob
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import SessionLocal
+# Import all models to ensure relationships work
+from backend.models.user import User
+from backend.models.employee import Employee
+from backend.models.device import Device
+from backend.models.assignment import Assignment
+from backend.models.plan import Plan
+from backend.services.pdf_jobs import PDF_DIR
+
+# Antigüedad mínima (minutos) de un archivo para considerarlo huérfano
+PDF_PRUNE_GRACE_MINUTES = int(os.getenv("PDF_PRUNE_GRACE_MINUTES", "60"))
+
+
+def _older_than(path: str, cutoff: float) -> bool:
+    try:
+        return os.path.getmtime(path) < cutoff
+    except OSError:
+        # Renombrado o borrado mientras se listaba
+        return False
+
+
+def prune_pdfs(apply: bool = False):
+    db = SessionLocal()
+    try:
+        # Corte tomado antes de leer las URLs: un render que termine después deja un archivo más nuevo
+        cutoff = time.time() - PDF_PRUNE_GRACE_MINUTES * 60
+        referenced = set()
+        for entrega_url, remision_url in db.query(Assignment.acta_entrega_url, Assignment.acta_remision_url):
+            for url in (entrega_url, remision_url):
+                if url:
+                    referenced.add(os.path.basename(url))
+
+        files = glob.glob(os.path.join(PDF_DIR, "*.pdf")) + glob.glob(os.path.join(PDF_DIR, ".*.tmp"))
+        orphans = [f for f in files if os.path.basename(f) not in referenced and _older_than(f, cutoff)]
+        print(f"📊 {len(files)} archivos, {len(referenced)} referenciados, "
+              f"{len(orphans)} huérfanos con más de {PDF_PRUNE_GRACE_MINUTES} minutos.")
+
+        for f in orphans:
+            if not apply:
+                print(f"  - {os.path.basename(f)}")
+                continue
+            try:
+                os.remove(f)
+            except Exception as e:
+                print(f"Error borrando {f}: {e}")
+
+        if apply:
+            print(f"✅ {len(orphans)} archivos eliminados.")
+        elif orphans:
+            print("ℹ️  Ejecute con --apply para eliminarlos.")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    prune_pdfs(apply="--apply" in sys.argv)
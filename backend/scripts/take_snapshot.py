@@ -0,0 +1,30 @@
+"""
+Script para tomar la foto diaria del inventario (fleet_snapshots)
+
+La API la toma sola a SNAPSHOT_TIME (ver services/snapshots.py); este script sirve
+para cron cuando el programador está desactivado (SNAPSHOT_SCHEDULER_ENABLED=False)
+o para tomarla a mano. Reemplaza la foto del día si ya existe.
+
+Uso: python backend/scripts/take_snapshot.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import SessionLocal
+import backend.models  # noqa: F401 (registra todas las tablas y relaciones)
+from backend.services.snapshots import take_snapshot
+
+
+def main():
+    db = SessionLocal()
+    try:
+        snapshot = take_snapshot(db, origen="programado")
+        print(f"✓ Foto del {snapshot.fecha.isoformat()}: {snapshot.dispositivos} dispositivos "
+              f"({snapshot.asignados} asignados), valor en libros ${snapshot.valor_libros:,.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
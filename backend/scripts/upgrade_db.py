@@ -0,0 +1,79 @@
+"""
+Script para agregar a una base de datos existente las columnas e índices nuevos
+
+init_db.py (create_all) solo crea tablas que no existen; este script crea las tablas
+nuevas y aplica los cambios posteriores sobre tablas ya creadas. Es idempotente.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sqlalchemy import func, inspect, select, text
+from backend.database import engine, Base, SessionLocal
+import backend.models  # noqa: F401 (registra todas las tablas en Base.metadata)
+from backend.models.assignment import Assignment
+from backend.services.current_assignment import refresh_current_assignments
+from backend.services.plan_costs import refresh_plan_cost_rollup
+from backend.services.search import install_search_indexes
+
+# (tabla, columna, definición)
+NEW_COLUMNS = [
+    ("assignments", "acta_entrega_estado", "VARCHAR(20)"),
+    ("assignments", "acta_remision_estado", "VARCHAR(20)"),
+    ("devices", "current_assignment_id", "INTEGER REFERENCES assignments(id) ON DELETE SET NULL"),
+    ("employees", "current_assignment_id", "INTEGER REFERENCES assignments(id) ON DELETE SET NULL"),
+]
+
+
+def install_active_assignment_index(conn):
+    """Índice único parcial: una asignación activa por dispositivo"""
+    duplicated = conn.execute(
+        select(Assignment.device_id)
+        .where(Assignment.fecha_devolucion.is_(None))
+        .group_by(Assignment.device_id)
+        .having(func.count() > 1)
+    ).scalars().all()
+    if duplicated:
+        print(f"  ✗ Dispositivos con más de una asignación activa: {duplicated}. "
+              "Registre las devoluciones y vuelva a ejecutar el script")
+        return
+    index = next(i for i in Assignment.__table__.indexes if i.name == "uq_assignments_device_activa")
+    index.create(conn, checkfirst=True)
+    print(f"  ✓ Índice {index.name}")
+
+
+def upgrade_db():
+    """Crear tablas nuevas y agregar columnas faltantes"""
+    inspector = inspect(engine)
+    missing = [t for t in Base.metadata.sorted_tables if not inspector.has_table(t.name)]
+    if missing:
+        Base.metadata.create_all(bind=engine, tables=missing)
+        for table in missing:
+            print(f"  ✓ Tabla {table.name} creada")
+    with engine.begin() as conn:
+        added = set()
+        for table, column, definition in NEW_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing:
+                print(f"  - {table}.{column} ya existe")
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            print(f"  ✓ {table}.{column} agregada")
+            added.add(column)
+        if "current_assignment_id" in added:
+            refresh_current_assignments(conn)
+            print("  ✓ current_assignment_id calculada a partir de las asignaciones activas")
+        install_active_assignment_index(conn)
+    backend = install_search_indexes(engine)
+    print(f"  ✓ Índices de búsqueda ({backend})")
+    db = SessionLocal()
+    try:
+        meses = refresh_plan_cost_rollup(db)
+        print(f"  ✓ Costo por línea: {meses} meses cerrados calculados")
+    finally:
+        db.close()
+    print("✓ Base de datos actualizada")
+
+
+if __name__ == "__main__":
+    upgrade_db()
@@ -0,0 +1,113 @@
+from concurrent.futures import Future, as_completed
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from pypdf import PdfWriter
+import io
+import os
+import zipfile
+
+from backend.models.assignment import Assignment
+from backend.services.exporter import CHUNK_SIZE, StreamBuffer
+from backend.services.pdf_jobs import build_acta_data, pdf_file_path, track_render
+
+load_dotenv()
+
+# Máximo de actas por lote
+ACTAS_BATCH_MAX = int(os.getenv("ACTAS_BATCH_MAX", "500"))
+
+ZIP_MEDIA_TYPE = "application/zip"
+PDF_MEDIA_TYPE = "application/pdf"
+
+
+class ActaJob(NamedTuple):
+    """Acta de un lote: ya existente en disco (path) o en render (future)"""
+    assignment_id: int
+    doc_type: str
+    path: Optional[str]
+    future: Optional[Future]
+
+
+def prepare_jobs(assignments: List[Assignment], doc_type: str, user) -> List[ActaJob]:
+    """
+    Reutiliza las actas que ya están en disco y encola en el pool las que faltan
+
+    Los renders arrancan de inmediato en paralelo; al terminar cada uno se registra
+    su URL en la asignación igual que en las actas generadas en segundo plano.
+    """
+    jobs = []
+    for assignment in assignments:
+        path = pdf_file_path(getattr(assignment, f"acta_{doc_type}_url"))
+        if path:
+            jobs.append(ActaJob(assignment.id, doc_type, path, None))
+        else:
+            data_pdf = build_acta_data(assignment, doc_type, user)
+            jobs.append(ActaJob(assignment.id, doc_type, None, track_render(assignment.id, doc_type, data_pdf)))
+    return jobs
+
+
+def iter_ready(jobs: List[ActaJob]) -> Iterator[Tuple[ActaJob, Optional[str]]]:
+    """Devuelve cada acta a medida que está lista (ruta del PDF o None si falló)"""
+    for job in jobs:
+        if job.path:
+            yield job, job.path
+
+    pending = {job.future: job for job in jobs if job.future is not None}
+    for future in as_completed(pending):
+        job = pending[future]
+        try:
+            yield job, future.result()
+        except Exception as e:
+            print(f"Error generando PDF de {job.doc_type} (asignación {job.assignment_id}): {e}")
+            yield job, None
+
+
+def iter_zip(jobs: List[ActaJob]) -> Iterator[bytes]:
+    """
+    Genera un zip con las actas por fragmentos, agregando cada una en cuanto está lista
+
+    Los PDFs ya vienen comprimidos, así que se guardan sin volver a comprimir. Las
+    actas que no se pudieron generar se listan en errores.txt.
+    """
+    buffer = StreamBuffer()
+    errores = []
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for job, path in iter_ready(jobs):
+            if path is None:
+                errores.append(f"Asignación {job.assignment_id}: no se pudo generar el acta de {job.doc_type}")
+                continue
+            with open(path, "rb") as src, zf.open(f"{job.assignment_id}_{os.path.basename(path)}", mode="w") as dst:
+                while True:
+                    data = src.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    dst.write(data)
+                    if buffer.size >= CHUNK_SIZE:
+                        yield buffer.drain()
+            yield buffer.drain()
+        if errores:
+            zf.writestr("errores.txt", "\n".join(errores) + "\n")
+    yield buffer.drain()
+
+
+def iter_merged_pdf(jobs: List[ActaJob]) -> Iterator[bytes]:
+    """
+    Une las actas en un solo PDF, en el orden del lote
+
+    Las actas se renderizan en paralelo, pero el PDF combinado solo puede escribirse
+    cuando están todas (la tabla de referencias va al final del archivo).
+    """
+    paths = {}
+    for job, path in iter_ready(jobs):
+        paths[job.assignment_id] = path
+
+    writer = PdfWriter()
+    for job in jobs:
+        if paths.get(job.assignment_id):
+            writer.append(paths[job.assignment_id])
+
+    output = io.BytesIO()
+    writer.write(output)
+    writer.close()
+    data = output.getvalue()
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield data[start:start + CHUNK_SIZE]
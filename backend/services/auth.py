@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -5,12 +7,14 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
 
 from backend.database import get_db
 from backend.models.user import User, UserRole
 from backend.schemas.user import TokenData
+from backend.services.report_cache import MemoryCacheBackend
 
 load_dotenv()
 
@@ -19,21 +23,49 @@ SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-# Contexto de encriptación
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Caché del usuario autenticado por token: evita consultar users en cada petición.
+# Se invalida al modificar usuarios; entre workers el TTL acota cuánto puede durar un dato viejo
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", "1024"))
+_principal_cache = MemoryCacheBackend(maxsize=PRINCIPAL_CACHE_MAXSIZE)
+# Columnas guardadas en la caché (sin el hash de la contraseña)
+_PRINCIPAL_FIELDS = ("id", "username", "email", "role", "created_at", "updated_at")
+
+# Contexto de encriptación. Si BCRYPT_ROUNDS sube, los hashes con menos rondas se
+# re-generan en el siguiente login exitoso (PASSWORD_AUTO_UPGRADE)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_AUTO_UPGRADE = os.getenv("PASSWORD_AUTO_UPGRADE", "True").lower() == "true"
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt consume ~100-250 ms de CPU por operación y libera el GIL: se ejecuta en un pool
+# de hilos acotado para que un pico de logins no acapare todos los hilos ni la CPU. Los
+# endpoints lo esperan con await (hash_password, authenticate_user): un login en cola
+# no ocupa un hilo del threadpool compartido de las peticiones sync
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica que la contraseña coincida con el hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verifica que la contraseña coincida con el hash (en el pool de bcrypt)"""
+    return _hash_executor.submit(pwd_context.verify, plain_password, hashed_password).result()
 
 
 def get_password_hash(password: str) -> str:
-    """Genera hash de contraseña"""
-    return pwd_context.hash(password)
+    """Genera hash de contraseña (en el pool de bcrypt; bloquea: scripts y endpoints de admin)"""
+    return _hash_executor.submit(pwd_context.hash, password).result()
+
+
+async def _run_hash(fn, *args):
+    """Espera una operación de bcrypt en su pool sin bloquear el event loop ni un hilo de peticiones"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    """Genera hash de contraseña desde un endpoint async"""
+    return await _run_hash(pwd_context.hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -44,18 +76,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """Autentica usuario con username y password"""
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """
+    Autentica usuario con username y password
+
+    La consulta va al threadpool y bcrypt al pool acotado, esperado con await. La sesión
+    se cierra antes de esperar a bcrypt: un login en cola no retiene una conexión del
+    pool. El usuario vuelve a la sesión solo si su hash usa parámetros viejos; el hash
+    nuevo se guarda con el siguiente commit.
+    """
+    def find_user():
+        user = db.query(User).filter(User.username == username).first()
+        db.close()
+        return user
+
+    user = await run_in_threadpool(find_user)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await _run_hash(pwd_context.verify_and_update, password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash and PASSWORD_AUTO_UPGRADE:
+        user.hashed_password = new_hash
+        db.add(user)
     return user
 
 
@@ -79,13 +127,28 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    # Tokens sin iat (emitidos antes de la caché) siempre se resuelven en la base de datos
+    cache_key = f"{token_data.username}:{payload['iat']}" if payload.get("iat") is not None else None
+    if cache_key:
+        cached = _principal_cache.get(cache_key)
+        if isinstance(cached, dict):
+            # Usuario desacoplado de la sesión, solo para lectura
+            return User(**cached)
+    
     user = db.query(User).filter(User.username == token_data.username).first()
     if user is None:
         raise credentials_exception
     
+    if cache_key:
+        _principal_cache.set(cache_key, {f: getattr(user, f) for f in _PRINCIPAL_FIELDS}, PRINCIPAL_CACHE_TTL)
     return user
 
 
+def invalidate_principals() -> None:
+    """Descarta los usuarios autenticados en caché (tras cambiar rol, contraseña o username)"""
+    _principal_cache.clear()
+
+
 async def get_current_active_admin(current_user: User = Depends(get_current_user)) -> User:
     """Verifica que el usuario actual sea administrador"""
     if not current_user.is_admin:
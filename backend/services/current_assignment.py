@@ -0,0 +1,48 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from typing import Iterable, Optional
+
+from backend.models.assignment import Assignment
+from backend.models.device import Device
+from backend.models.employee import Employee
+
+
+def refresh_current_assignments(
+    db,
+    device_ids: Optional[Iterable[int]] = None,
+    employee_ids: Optional[Iterable[int]] = None,
+) -> None:
+    """
+    Recalcula devices.current_assignment_id y employees.current_assignment_id
+
+    Dos UPDATE con subconsulta correlacionada (usa el índice parcial de asignaciones
+    activas), en la transacción de quien llama: el puntero cambia junto con la
+    asignación. Sin ids (None) se recalculan todas las filas; con una lista vacía, ninguna.
+
+    Args:
+        db: Sesión o conexión
+        device_ids: Dispositivos a recalcular
+        employee_ids: Empleados a recalcular
+    """
+    if isinstance(db, Session):
+        # Los UPDATE en bloque no hacen autoflush: la asignación nueva o devuelta debe estar en la base
+        db.flush()
+    for model, column, ids in (
+        (Device, Assignment.device_id, device_ids),
+        (Employee, Assignment.employee_id, employee_ids),
+    ):
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                continue
+        active = (
+            select(func.min(Assignment.id))
+            .where(column == model.id, Assignment.fecha_devolucion.is_(None))
+            .scalar_subquery()
+        )
+        # updated_at se conserva: el puntero no es una edición del registro
+        stmt = update(model).values(current_assignment_id=active, updated_at=model.updated_at)
+        if ids is not None:
+            stmt = stmt.where(model.id.in_(ids))
+        # Sin sincronizar la sesión: los objetos cargados se refrescan en el próximo acceso tras commit
+        db.execute(stmt.execution_options(synchronize_session=False))
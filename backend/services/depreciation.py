@@ -0,0 +1,333 @@
+from sqlalchemy import case, cast, extract, func, select, Float
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Sequence
+import calendar
+import numpy as np
+
+from backend.models.device import Device
+
+# Misma regla que Device.calcular_depreciacion: línea recta a 36 meses
+VIDA_UTIL_MESES = 36
+
+
+def _days_in_month(year: int, month: int) -> int:
+    return calendar.monthrange(year, month)[1]
+
+
+def _least(a, b):
+    return case((a < b, a), else_=b)
+
+
+def _round_cents(centavos, error):
+    """
+    Redondeo a centavos idéntico a round(valor, 2) de Python
+
+    Python redondea según el valor binario exacto y resuelve los empates exactos al
+    par. valor * 100 en punto flotante puede caer justo en .5 sin que el valor real
+    sea un empate, así que se usa el error exacto del producto (error) para decidir
+    el sentido. Se evita CAST(... AS NUMERIC) porque PostgreSQL convierte el float con
+    15 dígitos y redondea los empates hacia arriba.
+    """
+    piso = func.floor(centavos)
+    par = func.floor(piso / 2) * 2 == piso
+    return case(
+        ((centavos - piso == 0.5) & (error > 0), piso + 1),
+        ((centavos - piso == 0.5) & (error < 0), piso),
+        (centavos - piso == 0.5, case((par, piso), else_=piso + 1)),
+        else_=func.floor(centavos + 0.5),
+    )
+
+
+def _meses_uso_sql(fecha_calculo: date, py, pm, pd):
+    """
+    Meses de uso equivalentes a relativedelta(fecha_calculo, fecha_compra)
+
+    Meses completos (con el día recortado al fin de mes) más los días restantes / 30.
+    Los días de cada mes solo dependen de fecha_calculo, así que se calculan aquí y se
+    envían como constantes; la expresión es portable (PostgreSQL y SQLite).
+    """
+    cy, cm, cd = fecha_calculo.year, fecha_calculo.month, fecha_calculo.day
+    prev_y, prev_m = (cy, cm - 1) if cm > 1 else (cy - 1, 12)
+    next_y, next_m = (cy, cm + 1) if cm < 12 else (cy + 1, 1)
+    dim_c = _days_in_month(cy, cm)
+    dim_prev = _days_in_month(prev_y, prev_m)
+    dim_next = _days_in_month(next_y, next_m)
+
+    m0 = (cy - py) * 12 + (cm - pm)
+    compra_no_futura = (m0 > 0) | ((m0 == 0) & (pd <= cd))
+    mes_completo = compra_no_futura & ((pd <= cd) | (cd == dim_c))
+
+    meses = case(
+        (mes_completo, m0),
+        (compra_no_futura, m0 - 1),
+        (pd < cd, m0 + 1),
+        else_=m0,
+    )
+    dias = case(
+        (mes_completo, cd - _least(pd, dim_c)),
+        (compra_no_futura, cd + dim_prev - _least(pd, dim_prev)),
+        (pd < cd, cd - dim_c - _least(pd, dim_next)),
+        else_=cd - _least(pd, dim_c),
+    )
+    return cast(meses, Float) + cast(dias, Float) / 30
+
+
+def device_valuation_subquery(fecha_calculo: date, *columns):
+    """
+    Subconsulta con el valor actual (depreciado) de cada dispositivo a fecha_calculo
+
+    Aplica la misma regla y el mismo orden de operaciones que Device.calcular_depreciacion,
+    incluido el redondeo a centavos por dispositivo, para que los totales coincidan.
+
+    Args:
+        fecha_calculo: Fecha de valoración
+        columns: Columnas adicionales de Device a incluir (ej: Device.estado)
+
+    Returns:
+        Subquery con columnas id, costo_inicial, valor_actual y las adicionales
+    """
+    partes = select(
+        Device.id.label("id"),
+        Device.costo_inicial.label("costo_inicial"),
+        extract("year", Device.fecha_compra).label("py"),
+        extract("month", Device.fecha_compra).label("pm"),
+        extract("day", Device.fecha_compra).label("pd"),
+        *columns,
+    ).subquery()
+
+    meses = select(
+        partes.c.id,
+        partes.c.costo_inicial,
+        _meses_uso_sql(fecha_calculo, partes.c.py, partes.c.pm, partes.c.pd).label("meses_uso"),
+        *[partes.c[c.key] for c in columns],
+    ).subquery()
+
+    depreciacion_mensual = meses.c.costo_inicial / VIDA_UTIL_MESES
+    acumulada = select(
+        meses.c.id,
+        meses.c.costo_inicial,
+        _least(depreciacion_mensual * meses.c.meses_uso, meses.c.costo_inicial).label("depreciacion_acumulada"),
+        *[meses.c[c.key] for c in columns],
+    ).subquery()
+
+    valor_actual = acumulada.c.costo_inicial - acumulada.c.depreciacion_acumulada
+    bruto = select(
+        acumulada.c.id,
+        acumulada.c.costo_inicial,
+        case((valor_actual > 0, valor_actual), else_=0.0).label("valor"),
+        *[acumulada.c[c.key] for c in columns],
+    ).subquery()
+
+    # Producto exacto valor * 100 (división de Veltkamp / Dekker): centavos + error
+    veltkamp = bruto.c.valor * 134217729
+    alto = veltkamp - (veltkamp - bruto.c.valor)
+    centavos = bruto.c.valor * 100
+    producto = select(
+        bruto.c.id,
+        bruto.c.costo_inicial,
+        centavos.label("centavos"),
+        ((alto * 100 - centavos) + (bruto.c.valor - alto) * 100).label("error"),
+        *[bruto.c[c.key] for c in columns],
+    ).subquery()
+
+    return select(
+        producto.c.id,
+        producto.c.costo_inicial,
+        (_round_cents(producto.c.centavos, producto.c.error) / 100).label("valor_actual"),
+        *[producto.c[c.key] for c in columns],
+    ).subquery()
+
+
+# --- Motor vectorizado (NumPy): muchos dispositivos x muchas fechas en una pasada ---
+
+# Dispositivos por bloque del cálculo (acota la memoria de los arreglos intermedios)
+VALUATION_CHUNK = 8192
+
+
+def month_ends(reference: date, months_back: int, months_forward: int) -> List[date]:
+    """Fines de mes desde months_back meses antes del mes de reference hasta months_forward después"""
+    fechas = []
+    for offset in range(-months_back, months_forward + 1):
+        year, month = divmod(reference.year * 12 + reference.month - 1 + offset, 12)
+        fechas.append(date(year, month + 1, _days_in_month(year, month + 1)))
+    return fechas
+
+
+def _date_parts(fechas: np.ndarray):
+    """Año, mes y día (int64) de un arreglo datetime64[D]"""
+    meses = fechas.astype("datetime64[M]")
+    year = meses.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = meses.astype(np.int64) % 12 + 1
+    day = (fechas - meses.astype("datetime64[D]")).astype(np.int64) + 1
+    return year, month, day
+
+
+def _month_days(year: np.ndarray, month: np.ndarray, offset: int = 0) -> np.ndarray:
+    """Días del mes (desplazado offset meses) de cada año / mes"""
+    inicio = ((year - 1970) * 12 + month - 1 + offset).astype("datetime64[M]")
+    return ((inicio + 1).astype("datetime64[D]") - inicio.astype("datetime64[D]")).astype(np.int64)
+
+
+def meses_uso_matrix(compras: np.ndarray, fechas: np.ndarray) -> np.ndarray:
+    """
+    Meses de uso equivalentes a relativedelta(fecha, fecha_compra) para cada par
+
+    Misma lógica que _meses_uso_sql: meses completos (día recortado al fin de mes) más
+    los días restantes / 30, también con compras posteriores a la fecha (negativos).
+
+    Args:
+        compras: Fechas de compra, datetime64[D] de forma (n,)
+        fechas: Fechas de valoración, datetime64[D] de forma (m,)
+
+    Returns:
+        Matriz (n, m) de float64
+    """
+    py, pm, pd = (part[:, None] for part in _date_parts(compras))
+    cy, cm, cd = _date_parts(fechas)
+    dim_c, dim_prev, dim_next = _month_days(cy, cm), _month_days(cy, cm, -1), _month_days(cy, cm, 1)
+
+    m0 = (cy - py) * 12 + (cm - pm)
+    compra_no_futura = (m0 > 0) | ((m0 == 0) & (pd <= cd))
+    mes_completo = compra_no_futura & ((pd <= cd) | (cd == dim_c))
+    siguiente = ~compra_no_futura & (pd < cd)
+
+    meses = np.select([mes_completo, compra_no_futura, siguiente], [m0, m0 - 1, m0 + 1], m0)
+    dias = np.select(
+        [mes_completo, compra_no_futura, siguiente],
+        [cd - np.minimum(pd, dim_c), cd + dim_prev - np.minimum(pd, dim_prev), cd - dim_c - np.minimum(pd, dim_next)],
+        cd - np.minimum(pd, dim_c),
+    )
+    return meses.astype(np.float64) + dias / 30
+
+
+def round_cents(valores: np.ndarray) -> np.ndarray:
+    """
+    Redondeo a centavos idéntico a round(valor, 2) de Python (ver _round_cents)
+
+    Los empates aparentes de valor * 100 se resuelven con el error exacto del producto
+    (división de Veltkamp / Dekker) y los empates reales al par.
+    """
+    centavos = valores * 100
+    veltkamp = valores * 134217729.0
+    alto = veltkamp - (veltkamp - valores)
+    error = (alto * 100 - centavos) + (valores - alto) * 100
+    piso = np.floor(centavos)
+    fraccion = centavos - piso
+    par = np.floor(piso / 2) * 2 == piso
+    arriba = np.where(fraccion == 0.5, (error > 0) | ((error == 0) & ~par), fraccion > 0.5)
+    return (piso + arriba) / 100
+
+
+def depreciation_block(costos: np.ndarray, compras: np.ndarray, fechas: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Campos de Device.calcular_depreciacion para un bloque de dispositivos x fechas
+
+    Mismas operaciones y en el mismo orden que el método, con el mismo redondeo a
+    centavos: cada celda coincide con device.calcular_depreciacion(fecha).
+
+    Args:
+        costos: Costo inicial, float64 de forma (n,)
+        compras: Fecha de compra, datetime64[D] de forma (n,)
+        fechas: Fechas de valoración, datetime64[D] de forma (m,)
+
+    Returns:
+        dict de matrices (n, m): meses_uso, depreciacion_mensual (n, 1),
+        depreciacion_acumulada, valor_actual y porcentaje_depreciado (NaN con costo 0)
+    """
+    costo = costos[:, None]
+    meses_uso = meses_uso_matrix(compras, fechas)
+    depreciacion_mensual = costo / VIDA_UTIL_MESES
+    depreciacion_acumulada = np.minimum(depreciacion_mensual * meses_uso, costo)
+    valor_actual = np.maximum(costo - depreciacion_acumulada, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        porcentaje = np.where(costo > 0, depreciacion_acumulada / costo * 100, np.nan)
+    return {
+        "meses_uso": round_cents(meses_uso),
+        "depreciacion_mensual": round_cents(depreciacion_mensual),
+        "depreciacion_acumulada": round_cents(depreciacion_acumulada),
+        "valor_actual": round_cents(valor_actual),
+        "porcentaje_depreciado": round_cents(porcentaje),
+    }
+
+
+def book_values(costos: Sequence[float], compras: Sequence[date], fechas: Sequence[date],
+                chunk_size: int = VALUATION_CHUNK) -> np.ndarray:
+    """
+    Valor actual (depreciado) de cada dispositivo en cada fecha
+
+    Cada celda coincide con device.calcular_depreciacion(fecha)["valor_actual"].
+
+    Args:
+        costos: Costo inicial de cada dispositivo
+        compras: Fecha de compra de cada dispositivo
+        fechas: Fechas de valoración
+        chunk_size: Dispositivos por bloque
+
+    Returns:
+        Matriz (dispositivos, fechas) de float64
+    """
+    costos = np.asarray(costos, dtype=np.float64)
+    compras = np.asarray(compras, dtype="datetime64[D]")
+    fechas = np.asarray(fechas, dtype="datetime64[D]")
+    valores = np.empty((len(costos), len(fechas)), dtype=np.float64)
+    for start in range(0, len(costos), chunk_size):
+        block = depreciation_block(costos[start:start + chunk_size], compras[start:start + chunk_size], fechas)
+        valores[start:start + chunk_size] = block["valor_actual"]
+    return valores
+
+
+def iter_depreciation(devices: Iterable, fechas: Sequence[date],
+                      chunk_size: int = VALUATION_CHUNK) -> Iterator[List[dict]]:
+    """
+    Depreciación de muchos dispositivos en varias fechas, por bloques
+
+    Cada resultado tiene los campos de device.calcular_depreciacion(fecha) más
+    device_id, en orden de dispositivo y luego de fecha. porcentaje_depreciado es None
+    con costo inicial 0 (el método fallaría por división entre cero).
+
+    Args:
+        devices: Filas con id, costo_inicial y fecha_compra (ej: un yield_per)
+        fechas: Fechas de cálculo
+        chunk_size: Dispositivos por bloque
+
+    Yields:
+        Lista de resultados de cada bloque de dispositivos
+    """
+    fechas_np = np.asarray(fechas, dtype="datetime64[D]")
+    fechas_iso = [f.isoformat() for f in fechas]
+    rows = iter(devices)
+    while True:
+        block = list(islice(rows, chunk_size))
+        if not block:
+            return
+        costos = np.array([d.costo_inicial for d in block], dtype=np.float64)
+        compras = np.array([d.fecha_compra for d in block], dtype="datetime64[D]")
+        campos = depreciation_block(costos, compras, fechas_np)
+        porcentajes = campos["porcentaje_depreciado"].astype(object)
+        porcentajes[np.isnan(campos["porcentaje_depreciado"])] = None
+
+        meses_uso = campos["meses_uso"].tolist()
+        mensual = campos["depreciacion_mensual"][:, 0].tolist()
+        acumulada = campos["depreciacion_acumulada"].tolist()
+        valor = campos["valor_actual"].tolist()
+        costo = round_cents(costos).tolist()
+        porcentajes = porcentajes.tolist()
+
+        results = []
+        for i, device in enumerate(block):
+            fecha_compra = device.fecha_compra.isoformat()
+            for j, fecha in enumerate(fechas_iso):
+                results.append({
+                    "device_id": device.id,
+                    "costo_inicial": costo[i],
+                    "fecha_compra": fecha_compra,
+                    "fecha_calculo": fecha,
+                    "meses_uso": meses_uso[i][j],
+                    "vida_util_meses": VIDA_UTIL_MESES,
+                    "depreciacion_mensual": mensual[i],
+                    "depreciacion_acumulada": acumulada[i][j],
+                    "valor_actual": valor[i][j],
+                    "porcentaje_depreciado": porcentajes[i][j],
+                })
+        yield results
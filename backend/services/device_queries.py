@@ -0,0 +1,78 @@
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List
+
+from backend.models.assignment import Assignment
+from backend.models.employee import Employee
+
+
+def get_device_holders(db: Session, device_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Obtiene el responsable actual o el último responsable de cada dispositivo en una sola consulta
+
+    Usa ROW_NUMBER() particionado por dispositivo: la asignación activa queda primero
+    y, si no hay, la devuelta más recientemente.
+
+    Args:
+        db: Sesión de base de datos
+        device_ids: IDs de los dispositivos a consultar
+
+    Returns:
+        dict {device_id: {"asignado_a", "ultimo_asignado", "fecha_devolucion_ultimo"}}
+    """
+    device_ids = list(device_ids)
+    if not device_ids:
+        return {}
+
+    ranked = (
+        select(
+            Assignment.device_id.label("device_id"),
+            Assignment.fecha_devolucion.label("fecha_devolucion"),
+            Employee.nombre_completo.label("employee_name"),
+            func.row_number().over(
+                partition_by=Assignment.device_id,
+                order_by=(
+                    # Activa primero (portable: Postgres ordena NULL primero en DESC, SQLite al final)
+                    case((Assignment.fecha_devolucion.is_(None), 0), else_=1),
+                    Assignment.fecha_devolucion.desc(),
+                    Assignment.id.desc(),
+                ),
+            ).label("rn"),
+        )
+        .join(Employee, Employee.id == Assignment.employee_id)
+        .where(Assignment.device_id.in_(device_ids))
+        .subquery()
+    )
+
+    rows = db.execute(
+        select(ranked.c.device_id, ranked.c.fecha_devolucion, ranked.c.employee_name)
+        .where(ranked.c.rn == 1)
+    ).all()
+
+    holders = {}
+    for device_id, fecha_devolucion, employee_name in rows:
+        if fecha_devolucion is None:
+            holders[device_id] = {
+                "asignado_a": employee_name,
+                "ultimo_asignado": None,
+                "fecha_devolucion_ultimo": None,
+            }
+        else:
+            holders[device_id] = {
+                "asignado_a": None,
+                "ultimo_asignado": employee_name,
+                "fecha_devolucion_ultimo": fecha_devolucion,
+            }
+    return holders
+
+
+def annotate_device_holders(db: Session, devices: List) -> List:
+    """Asigna asignado_a, ultimo_asignado y fecha_devolucion_ultimo a cada dispositivo"""
+    holders = get_device_holders(db, [dev.id for dev in devices])
+    for dev in devices:
+        info = holders.get(dev.id)
+        if info:
+            dev.asignado_a = info["asignado_a"]
+            dev.ultimo_asignado = info["ultimo_asignado"]
+            dev.fecha_devolucion_ultimo = info["fecha_devolucion_ultimo"]
+    return devices
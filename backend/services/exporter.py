@@ -0,0 +1,223 @@
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, Query
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, List, Sequence
+from xml.sax.saxutils import escape
+import csv
+import io
+import re
+import zipfile
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv"
+
+# Filas pedidas al cursor del servidor por cada viaje a la base de datos
+FETCH_SIZE = 1000
+# Bytes acumulados antes de entregar un fragmento al cliente
+CHUNK_SIZE = 64 * 1024
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilos: 0 = normal, 1 = fecha (dd/mm/yyyy), 2 = encabezado en negrita
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_FOOTER = '</sheetData></worksheet>'
+
+
+class StreamBuffer(io.RawIOBase):
+    """Destino no posicionable para zipfile: acumula bytes hasta que se drenan (XLSX y ZIP de actas)"""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def _cell_xml(value, style: int = 0) -> str:
+    """Serializa un valor como celda SpreadsheetML (cadenas en línea, sin tabla compartida)"""
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row_xml(values: Sequence, style: int = 0) -> bytes:
+    return ("<row>" + "".join(_cell_xml(v, style) for v in values) + "</row>").encode("utf-8")
+
+
+def iter_xlsx(headers: Sequence[str], rows: Iterable[Sequence], sheet_name: str = "Hoja1") -> Iterator[bytes]:
+    """
+    Genera un archivo xlsx por fragmentos a medida que se consumen las filas
+
+    El libro se escribe directamente dentro de un zip en modo streaming, por lo que
+    la memoria usada no depende del número de filas.
+
+    Args:
+        headers: Encabezados de columna
+        rows: Iterable de filas (secuencias de valores)
+        sheet_name: Nombre de la hoja
+
+    Yields:
+        bytes: Fragmentos del archivo
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(sheet_name=escape(sheet_name, {'"': "&quot;"})))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _STYLES)
+
+        with zf.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+            sheet.write(_SHEET_HEADER.encode("utf-8"))
+            sheet.write(_row_xml(headers, style=2))
+            for row in rows:
+                sheet.write(_row_xml(row))
+                if buffer.size >= CHUNK_SIZE:
+                    yield buffer.drain()
+            sheet.write(_SHEET_FOOTER.encode("utf-8"))
+    yield buffer.drain()
+
+
+def iter_csv(headers: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """Genera un CSV (UTF-8 con BOM para Excel) por fragmentos a medida que se consumen las filas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_query_rows(db: Session, query: Query, to_row: Callable, fetch_size: int = FETCH_SIZE) -> Iterator[List]:
+    """
+    Recorre una consulta con cursor del lado del servidor (yield_per) y cierra la sesión al terminar
+
+    La respuesta se consume después de que el endpoint retorna, por lo que la sesión
+    se cierra aquí y no depende del ciclo de vida de get_db.
+    """
+    try:
+        for result in query.yield_per(fetch_size):
+            yield to_row(result)
+    finally:
+        db.close()
+
+
+def export_response(
+    db: Session,
+    query: Query,
+    headers: Sequence[str],
+    to_row: Callable,
+    filename: str,
+    sheet_name: str,
+    formato: str = "xlsx",
+) -> StreamingResponse:
+    """
+    Construye la respuesta de exportación (xlsx o csv) que se transmite mientras se leen las filas
+
+    Args:
+        db: Sesión usada por la consulta (se cierra al terminar la transmisión)
+        query: Consulta a exportar
+        headers: Encabezados de columna
+        to_row: Función que convierte cada resultado de la consulta en una lista de valores
+        filename: Nombre base del archivo, sin extensión
+        sheet_name: Nombre de la hoja (solo xlsx)
+        formato: "xlsx" o "csv"
+    """
+    rows = stream_query_rows(db, query, to_row)
+    if formato == "csv":
+        body = iter_csv(headers, rows)
+        media_type = CSV_MEDIA_TYPE
+    else:
+        body = iter_xlsx(headers, rows, sheet_name=sheet_name)
+        media_type = XLSX_MEDIA_TYPE
+        formato = "xlsx"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{formato}"}
+    )
@@ -0,0 +1,137 @@
+# Las importaciones del plan corren en hilos de fondo: la petición solo guarda el archivo
+# y devuelve el trabajo, que se consulta en GET /imports/{id}
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Optional
+from dotenv import load_dotenv
+import os
+import tempfile
+import threading
+
+from backend.database import SessionLocal
+from backend.models.import_job import ImportJob, ImportStatus
+from backend.services.importer import ImportResult, count_rows, import_file
+from backend.services.report_cache import invalidate_reports
+
+load_dotenv()
+
+# Importaciones simultáneas por proceso. 0 = importar en línea (scripts y desarrollo)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))
+# Tamaño máximo del archivo subido
+IMPORT_MAX_MB = int(os.getenv("IMPORT_MAX_MB", "50"))
+# Máximo de errores por fila que se guardan en el trabajo
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class UploadTooLarge(ValueError):
+    """El archivo supera IMPORT_MAX_MB"""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+        return _executor
+
+
+def save_upload(source: BinaryIO, filename: str) -> str:
+    """Copia el archivo subido a un temporal (por bloques) y devuelve su ruta"""
+    suffix = os.path.splitext(filename)[1].lower()
+    fd, path = tempfile.mkstemp(prefix="import_", suffix=suffix)
+    max_bytes = IMPORT_MAX_MB * 1024 * 1024
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source.read(1024 * 1024):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"El archivo supera {IMPORT_MAX_MB} MB")
+                target.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _update_job(job_id: int, **values) -> None:
+    # Sesión propia: el progreso se confirma aunque la importación sea una simulación
+    db = SessionLocal()
+    try:
+        db.query(ImportJob).filter(ImportJob.id == job_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _summary(result: ImportResult) -> dict:
+    return {"filas": result.filas, **result.counts}
+
+
+def run_import(job_id: int, path: str, sheet_name: str, dry_run: bool) -> None:
+    """Procesa un trabajo de importación (en el pool; borra el archivo al terminar)"""
+    db = SessionLocal()
+    try:
+        _update_job(job_id, estado=ImportStatus.PROCESANDO.value, started_at=datetime.utcnow(),
+                    total_filas=count_rows(path))
+
+        def progress(leidas: int, result: ImportResult) -> None:
+            _update_job(job_id, filas_procesadas=leidas, resultado=_summary(result))
+
+        result = import_file(db, path, dry_run=dry_run, sheet_name=sheet_name, on_progress=progress)
+
+        errores = result.errores[:IMPORT_MAX_ERRORS]
+        mensaje = None
+        if len(result.errores) > len(errores):
+            mensaje = f"Se muestran {len(errores)} de {len(result.errores)} errores"
+        _update_job(job_id, estado=ImportStatus.COMPLETADO.value, resultado=_summary(result),
+                    errores=errores, mensaje=mensaje, finished_at=datetime.utcnow())
+        if not dry_run:
+            invalidate_reports()
+    except Exception as e:
+        print(f"✗ Error en la importación {job_id}: {e}")
+        db.rollback()
+        _update_job(job_id, estado=ImportStatus.ERROR.value, mensaje=str(e), finished_at=datetime.utcnow())
+    finally:
+        db.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def start_import(db, source: BinaryIO, filename: str, dry_run: bool, user_id: Optional[int]) -> ImportJob:
+    """
+    Registra el trabajo de importación y lo envía al pool
+
+    Args:
+        db: Sesión de base de datos
+        source: Archivo subido (se copia a un temporal antes de responder)
+        filename: Nombre original (.xlsx o .csv; el de un CSV es el nombre del plan)
+        dry_run: Simular sin guardar nada
+        user_id: Usuario que inicia la importación
+    """
+    path = save_upload(source, filename)
+    job = ImportJob(filename=filename, dry_run=dry_run, user_id=user_id,
+                    estado=ImportStatus.PENDIENTE.value, filas_procesadas=0, errores=[])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    sheet_name = os.path.splitext(os.path.basename(filename))[0]
+    if IMPORT_WORKERS <= 0:
+        run_import(job.id, path, sheet_name, dry_run)
+        db.refresh(job)
+    else:
+        _get_executor().submit(run_import, job.id, path, sheet_name, dry_run)
+    return job
+
+
+def shutdown() -> None:
+    """Espera las importaciones en curso (al apagar la aplicación)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
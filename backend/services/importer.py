@@ -0,0 +1,517 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+import numpy as np
+import openpyxl
+import pandas as pd
+import os
+
+from backend.models.assignment import Assignment
+from backend.models.device import Device, DeviceStatus, PhysicalCondition
+from backend.models.employee import Employee, EmployeeStatus
+from backend.models.plan import Plan
+from backend.services.current_assignment import refresh_current_assignments
+from backend.services.plan_costs import invalidate_plan_cost_rollup
+
+load_dotenv()
+
+# Filas por lote de inserciones / actualizaciones (y por commit en import_file)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+
+# Formatos aceptados
+IMPORT_EXTENSIONS = (".xlsx", ".csv")
+
+# Columnas de las hojas del plan de la operadora
+COL_NOMBRE = "Nombre Y Apellido"
+COL_CARGO = "Cargo"
+COL_UBICACION = "Ubicacion"
+COL_EMPRESA = "Empresa"
+COL_ESTADO = "Estado Contrato"
+COL_EQUIPO = "Equipo"
+COL_NUMERO = "Número"
+
+# Valores de los registros creados por la importación
+FECHA_ESTIMADA = date(2024, 1, 1)
+MAX_NOMBRE = 255
+MAX_TELEFONO = 20
+
+# Campos del empleado que la importación mantiene al día
+EMPLOYEE_FIELDS = ("cargo", "ubicacion", "empresa", "estado")
+
+
+def clean_phone_number(phone):
+    """Limpia y formatea número telefónico"""
+    if pd.isna(phone):
+        return None
+    phone_str = str(phone).strip()
+    # Remover espacios y caracteres no numéricos excepto +
+    phone_str = ''.join(c for c in phone_str if c.isdigit() or c == '+')
+    return phone_str if phone_str else None
+
+
+def clean_phone_numbers(values: pd.Series) -> pd.Series:
+    """clean_phone_number sobre toda la columna (mismo resultado, operaciones vectorizadas)"""
+    cleaned = values.astype(str).str.replace(r"[^\d+]", "", regex=True)
+    return cleaned.where(values.notna() & (cleaned != ""), None)
+
+
+def plan_cost(sheet_name: str) -> float:
+    """Costo del plan a partir del nombre de la hoja (ej: "PLAN 34.99" -> 34.99; 0.0 si no tiene)"""
+    for part in sheet_name.strip().split(' '):
+        if '.' in part and part.replace('.', '').isdigit():
+            return float(part)
+    return 0.0
+
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    """Columna de texto sin espacios, None en celdas vacías o si la columna no existe"""
+    if column not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    values = df[column]
+    return values.astype(str).str.strip().where(values.notna(), None).astype(object)
+
+
+def estimate_device_cost(marca: pd.Series, modelo: pd.Series) -> np.ndarray:
+    """Costo estimado del equipo según marca y modelo (valores aproximados)"""
+    marca, modelo = marca.str.upper(), modelo.str.upper()
+    return np.select(
+        [
+            modelo.str.contains("S24", regex=False) | modelo.str.contains("S22", regex=False),
+            marca.str.contains("IPHONE", regex=False),
+            modelo.str.contains("A5", regex=False) | modelo.str.contains("A3", regex=False),
+            modelo.str.contains("A0", regex=False) | modelo.str.contains("A1", regex=False)
+            | modelo.str.contains("A2", regex=False),
+        ],
+        [450.0, 400.0, 250.0, 150.0],
+        default=200.0,
+    )
+
+
+def normalize_rows(df: pd.DataFrame, first_row: int = 2) -> pd.DataFrame:
+    """
+    Normaliza una hoja (o un lote de filas) del plan con operaciones de pandas
+
+    Args:
+        df: Filas tal como se leyeron (encabezados del Excel)
+        first_row: Número de fila del Excel de la primera fila de df (para los errores)
+
+    Returns:
+        DataFrame con fila, nombre, cargo, ubicacion, empresa, estado, estado_nuevo, marca, modelo,
+        numero_telefono, costo_estimado y tiene_equipo. Sin las filas sin nombre.
+    """
+    df = df.reset_index(drop=True)
+    frame = pd.DataFrame({"fila": np.arange(len(df)) + first_row})
+    frame["nombre"] = _text(df, COL_NOMBRE)
+    frame["cargo"] = _text(df, COL_CARGO)
+    frame["ubicacion"] = _text(df, COL_UBICACION)
+    frame["empresa"] = _text(df, COL_EMPRESA)
+
+    # estado_nuevo: el de los empleados creados (sin la columna, ACTIVO; con la celda
+    # vacía, INACTIVO). estado: solo si la celda lo indica, para actualizar existentes
+    estado = _text(df, COL_ESTADO)
+    activo = (estado.str.upper() == "ACTIVO").map({True: EmployeeStatus.ACTIVO, False: EmployeeStatus.INACTIVO})
+    frame["estado"] = activo.where(estado.notna(), None)
+    frame["estado_nuevo"] = activo if COL_ESTADO in df.columns else EmployeeStatus.ACTIVO
+
+    equipo = _text(df, COL_EQUIPO).fillna("")
+    parts = equipo.str.split(n=1, expand=True).reindex(columns=[0, 1])
+    frame["tiene_equipo"] = equipo != ""
+    frame["marca"] = parts[0].fillna("DESCONOCIDO")
+    frame["modelo"] = parts[1].where(parts[1].notna(), equipo)
+    frame["costo_estimado"] = estimate_device_cost(frame["marca"], frame["modelo"])
+
+    numero = df[COL_NUMERO] if COL_NUMERO in df.columns else pd.Series([None] * len(df), dtype=object)
+    frame["numero_telefono"] = clean_phone_numbers(numero).astype(object)
+
+    return frame[frame["nombre"].notna() & (frame["nombre"] != "")]
+
+
+class ImportResult:
+    """Conteos de una importación: creados, actualizados y omitidos por entidad, y errores por fila"""
+
+    def __init__(self):
+        self.counts = {
+            "planes": {"creados": 0, "actualizados": 0, "omitidos": 0},
+            "empleados": {"creados": 0, "actualizados": 0, "omitidos": 0},
+            "dispositivos": {"creados": 0, "actualizados": 0, "omitidos": 0},
+            "asignaciones": {"creados": 0, "actualizados": 0, "omitidos": 0},
+        }
+        self.filas = 0
+        self.errores: List[dict] = []
+
+    def add(self, entity: str, key: str, amount: int = 1) -> None:
+        self.counts[entity][key] += int(amount)
+
+    def error(self, hoja: str, fila: int, mensaje: str) -> None:
+        self.errores.append({"hoja": hoja, "fila": int(fila), "error": mensaje})
+
+    def as_dict(self) -> dict:
+        return {"filas": self.filas, **self.counts, "errores": self.errores}
+
+
+class ImportIndex:
+    """
+    Índices en memoria de lo que ya existe (una consulta por tabla al inicio)
+
+    Reemplazan el SELECT por fila: empleados por nombre, dispositivos por número y
+    planes por nombre. Se actualizan con lo que crea la importación, también en modo
+    simulación (con ids negativos), para que las hojas siguientes vean esos registros.
+    seen_employees guarda los nombres ya procesados en esta importación.
+    """
+
+    def __init__(self, db: Session):
+        self.employees: Dict[str, dict] = {
+            row.nombre_completo: dict(row._mapping)
+            for row in db.execute(select(Employee.id, Employee.nombre_completo, *[getattr(Employee, f) for f in EMPLOYEE_FIELDS]))
+        }
+        self.devices: Dict[str, dict] = {
+            row.numero_telefono: {"id": row.id, "plan_id": row.plan_id}
+            for row in db.execute(select(Device.id, Device.numero_telefono, Device.plan_id).where(Device.numero_telefono != None))
+        }
+        self.plans: Dict[str, dict] = {
+            row.nombre: {"id": row.id, "costo_mensual": row.costo_mensual}
+            for row in db.execute(select(Plan.id, Plan.nombre, Plan.costo_mensual))
+        }
+        self.seen_employees: Set[str] = set()
+        self._fake_id = 0
+
+    def fake_id(self) -> int:
+        """Id provisional de un registro que la simulación habría creado"""
+        self._fake_id -= 1
+        return self._fake_id
+
+
+def _records(frame: pd.DataFrame, columns: Dict[str, str]) -> List[dict]:
+    """Filas del DataFrame como dicts {columna_modelo: valor} con None en lugar de NaN"""
+    subset = frame[list(columns)].rename(columns=columns).astype(object)
+    return subset.where(subset.notna(), None).to_dict("records")
+
+
+def import_plan(db: Session, index: ImportIndex, sheet_name: str, result: ImportResult, dry_run: bool = False) -> int:
+    """Crea el plan de la hoja o actualiza su costo. Devuelve el id del plan"""
+    nombre, costo = sheet_name.strip(), plan_cost(sheet_name)
+    plan = index.plans.get(nombre)
+    if plan is None:
+        plan_id = index.fake_id() if dry_run else db.execute(
+            insert(Plan).returning(Plan.id), {"nombre": nombre, "costo_mensual": costo}
+        ).scalar_one()
+        index.plans[nombre] = {"id": plan_id, "costo_mensual": costo}
+        result.add("planes", "creados")
+        return plan_id
+
+    if plan["costo_mensual"] != costo and costo > 0:
+        if not dry_run:
+            db.execute(update(Plan).where(Plan.id == plan["id"]).values(costo_mensual=costo))
+        plan["costo_mensual"] = costo
+        result.add("planes", "actualizados")
+    else:
+        result.add("planes", "omitidos")
+    return plan["id"]
+
+
+def _import_employees(db: Session, index: ImportIndex, frame: pd.DataFrame, result: ImportResult, dry_run: bool) -> None:
+    # Un empleado repetido en el archivo toma los datos de su primera fila, también si
+    # aparece en otro lote u otra hoja (si no, la última fila ganaría y cada
+    # reimportación lo contaría como actualizado)
+    employees = frame.drop_duplicates("nombre")
+    employees = employees[~employees["nombre"].isin(index.seen_employees)]
+    index.seen_employees.update(employees["nombre"])
+    is_new = ~employees["nombre"].isin(index.employees.keys())
+
+    new = employees[is_new]
+    if len(new):
+        records = _records(new, {"nombre": "nombre_completo", "cargo": "cargo", "ubicacion": "ubicacion",
+                                 "empresa": "empresa", "estado_nuevo": "estado"})
+        if dry_run:
+            created = [(index.fake_id(), r["nombre_completo"]) for r in records]
+        else:
+            created = db.execute(insert(Employee).returning(Employee.id, Employee.nombre_completo), records).all()
+        by_name = {r["nombre_completo"]: r for r in records}
+        for employee_id, nombre in created:
+            index.employees[nombre] = {**by_name[nombre], "id": employee_id}
+        result.add("empleados", "creados", len(records))
+
+    changes = []
+    for record in _records(employees[~is_new], {"nombre": "nombre", **{f: f for f in EMPLOYEE_FIELDS}}):
+        current = index.employees[record["nombre"]]
+        # Celdas vacías no borran datos existentes
+        values = {f: record[f] for f in EMPLOYEE_FIELDS if record[f] is not None and record[f] != current[f]}
+        if values:
+            current.update(values)
+            changes.append({"id": current["id"], **{f: current[f] for f in EMPLOYEE_FIELDS}})
+    if changes and not dry_run:
+        db.execute(update(Employee), changes)
+    result.add("empleados", "actualizados", len(changes))
+    result.add("empleados", "omitidos", len(employees) - len(new) - len(changes))
+
+
+def _upsert_devices(db: Session, records: List[dict]) -> List[int]:
+    """
+    INSERT ... ON CONFLICT (numero_telefono) DO UPDATE SET plan_id en un solo statement
+
+    Devuelve los ids en el orden de records. En bases sin upsert se inserta y se
+    actualiza por separado (los registros existentes traen su id).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(Device)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Device.numero_telefono], set_={"plan_id": stmt.excluded.plan_id}
+        ).returning(Device.id, sort_by_parameter_order=True)
+        rows = [{k: v for k, v in r.items() if k != "id"} for r in records]
+        return list(db.execute(stmt, rows).scalars())
+
+    new = [{k: v for k, v in r.items() if k != "id"} for r in records if r.get("id") is None]
+    new_ids = iter(db.execute(insert(Device).returning(Device.id, sort_by_parameter_order=True), new).scalars()) if new else iter(())
+    existing = [{"id": r["id"], "plan_id": r["plan_id"]} for r in records if r.get("id") is not None]
+    if existing:
+        db.execute(update(Device), existing)
+    return [r["id"] if r.get("id") is not None else next(new_ids) for r in records]
+
+
+def _import_devices(db: Session, index: ImportIndex, frame: pd.DataFrame, plan_id: int, nombre_plan: str,
+                    result: ImportResult, dry_run: bool) -> None:
+    devices = frame[frame["tiene_equipo"]]
+    # Un número repetido en el archivo se toma de su primera fila; sin número no se puede deduplicar
+    devices = devices[devices["numero_telefono"].isna() | ~devices["numero_telefono"].duplicated()]
+    if not len(devices):
+        return
+
+    records, owners = [], []
+    for row in _records(devices, {"nombre": "nombre", "marca": "marca", "modelo": "modelo",
+                                   "numero_telefono": "numero_telefono", "costo_estimado": "costo_inicial"}):
+        current = index.devices.get(row["numero_telefono"]) if row["numero_telefono"] else None
+        if current is not None:
+            if current["plan_id"] == plan_id:
+                result.add("dispositivos", "omitidos")
+                continue
+            result.add("dispositivos", "actualizados")
+        else:
+            result.add("dispositivos", "creados")
+        owners.append(row.pop("nombre"))
+        records.append({
+            **row,
+            "id": current["id"] if current else None,
+            "fecha_compra": FECHA_ESTIMADA,
+            "estado_fisico": PhysicalCondition.USADO,
+            "estado": DeviceStatus.ASIGNADO,
+            "plan_id": plan_id,
+        })
+    if not records:
+        return
+
+    ids = [r["id"] or index.fake_id() for r in records] if dry_run else _upsert_devices(db, records)
+
+    # Solo los dispositivos nuevos reciben asignación (los existentes ya tienen la suya)
+    assignments = []
+    for device_id, record, owner in zip(ids, records, owners):
+        if record["numero_telefono"]:
+            index.devices[record["numero_telefono"]] = {"id": device_id, "plan_id": plan_id}
+        if record["id"] is None:
+            assignments.append({
+                "device_id": device_id,
+                "employee_id": index.employees[owner]["id"],
+                "fecha_asignacion": FECHA_ESTIMADA,
+                "observaciones": f"Importado desde Excel - Plan {nombre_plan}",
+            })
+    if assignments and not dry_run:
+        db.execute(insert(Assignment), assignments)
+        refresh_current_assignments(db, [a["device_id"] for a in assignments],
+                                    {a["employee_id"] for a in assignments})
+        invalidate_plan_cost_rollup(db, FECHA_ESTIMADA)
+    result.add("asignaciones", "creados", len(assignments))
+
+
+def import_rows(db: Session, index: ImportIndex, sheet_name: str, plan_id: int, frame: pd.DataFrame,
+                result: ImportResult, dry_run: bool = False) -> None:
+    """
+    Importa un lote de filas normalizadas (normalize_rows) de una hoja
+
+    Empleados: inserción en bloque de los nuevos y UPDATE en bloque (por id) de los que
+    cambiaron. Dispositivos: upsert por número telefónico (nuevo plan de una línea
+    existente) y asignación de los nuevos a su empleado. No hace commit.
+    """
+    nombre_plan = sheet_name.strip()
+
+    # Validaciones por fila: las filas inválidas se reportan y no se importan
+    invalid = frame["nombre"].str.len() > MAX_NOMBRE
+    for fila in frame.loc[invalid, "fila"]:
+        result.error(sheet_name, fila, f"El nombre supera {MAX_NOMBRE} caracteres")
+    long_phone = frame["numero_telefono"].notna() & (frame["numero_telefono"].str.len() > MAX_TELEFONO)
+    for fila, numero in frame.loc[long_phone & ~invalid, ["fila", "numero_telefono"]].itertuples(index=False):
+        result.error(sheet_name, fila, f"Número telefónico inválido: {numero}")
+    frame = frame[~invalid & ~long_phone]
+
+    result.filas += len(frame)
+    if not len(frame):
+        return
+    _import_employees(db, index, frame, result, dry_run)
+    _import_devices(db, index, frame, plan_id, nombre_plan, result, dry_run)
+
+
+def import_sheet(db: Session, index: ImportIndex, sheet_name: str, df: pd.DataFrame, result: ImportResult,
+                 dry_run: bool = False, chunk_size: int = IMPORT_CHUNK_SIZE) -> None:
+    """Importa una hoja completa en lotes de chunk_size filas (sin commit)"""
+    plan_id = import_plan(db, index, sheet_name, result, dry_run)
+    frame = normalize_rows(df)
+    for start in range(0, len(frame), chunk_size):
+        import_rows(db, index, sheet_name, plan_id, frame.iloc[start:start + chunk_size], result, dry_run)
+
+
+def _header(values) -> List[str]:
+    """Encabezados como los de pd.read_excel: "Unnamed: i" en vacíos y ".n" en repetidos"""
+    columns, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+# Textos que pd.read_excel / pd.read_csv leen como celda vacía
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+
+def _cell(value):
+    if isinstance(value, str) and value in NA_VALUES:
+        return None
+    # Entero, no float: 58707913.0 se leería como "587079130" al limpiar el número
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _frame(rows: List[tuple], columns: List[str]) -> pd.DataFrame:
+    width = len(columns)
+    data = [tuple(_cell(v) for v in row[:width]) + (None,) * (width - len(row)) for row in rows]
+    # dtype object: los números no se convierten a float por las celdas vacías
+    return pd.DataFrame(data, columns=columns, dtype=object)
+
+
+def count_rows(path: str) -> Optional[int]:
+    """Filas de datos del archivo (estimado por las dimensiones de las hojas; None si no se conoce)"""
+    if path.lower().endswith(".csv"):
+        with open(path, "rb") as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        total = 0
+        for sheet in workbook.worksheets:
+            if sheet.max_row is None:
+                return None
+            total += max(sheet.max_row - 1, 0)
+        return total
+    finally:
+        workbook.close()
+
+
+def iter_batches(path: str, sheet_name: str = None,
+                 batch_size: int = IMPORT_CHUNK_SIZE) -> Iterator[Tuple[str, int, pd.DataFrame]]:
+    """
+    Lee el archivo por lotes de batch_size filas sin cargarlo completo en memoria
+
+    Excel: openpyxl en modo de solo lectura (las hojas se recorren en streaming). CSV:
+    pd.read_csv por bloques, con el nombre del archivo como nombre de la hoja (el plan).
+
+    Yields:
+        (hoja, número de fila del Excel de la primera fila del lote, DataFrame del lote).
+        Una hoja sin filas produce un lote vacío, para que igual se registre su plan.
+    """
+    if path.lower().endswith(".csv"):
+        sheet_name = sheet_name or os.path.splitext(os.path.basename(path))[0]
+        first_row = 2
+        for chunk in pd.read_csv(path, chunksize=batch_size, dtype=str, encoding="utf-8-sig"):
+            yield sheet_name, first_row, chunk.astype(object)
+            first_row += len(chunk)
+        if first_row == 2:
+            yield sheet_name, first_row, pd.DataFrame()
+        return
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            columns = _header(header) if header is not None else []
+            batch, first_row, yielded = [], 2, False
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    yield sheet.title, first_row, _frame(batch, columns)
+                    first_row += len(batch)
+                    batch, yielded = [], True
+            if batch or not yielded:
+                yield sheet.title, first_row, _frame(batch, columns)
+    finally:
+        workbook.close()
+
+
+def import_file(db: Session, path: str, dry_run: bool = False, sheet_name: str = None,
+                batch_size: int = IMPORT_CHUNK_SIZE,
+                on_progress: Callable[[int, ImportResult], None] = None) -> ImportResult:
+    """
+    Importa un archivo del plan (Excel o CSV) con un commit por lote
+
+    Un lote que falla se revierte y sus filas se reportan como errores; la importación
+    continúa con el siguiente. Los lotes ya confirmados no se revierten.
+
+    Args:
+        db: Sesión de base de datos
+        path: Ruta del archivo (.xlsx o .csv)
+        dry_run: Simular sin guardar nada
+        sheet_name: Nombre del plan para archivos CSV (por defecto el nombre del archivo)
+        batch_size: Filas por lote
+        on_progress: Llamado tras cada lote con las filas leídas y el resultado parcial
+    """
+    index = ImportIndex(db)
+    result = ImportResult()
+    plans: Dict[str, int] = {}
+    leidas = 0
+
+    for hoja, first_row, df in iter_batches(path, sheet_name, batch_size):
+        if hoja not in plans:
+            plans[hoja] = import_plan(db, index, hoja, result, dry_run)
+            if not dry_run:
+                db.commit()
+
+        counts = {entity: dict(values) for entity, values in result.counts.items()}
+        filas, frame = result.filas, None
+        seen = set(index.seen_employees)
+        try:
+            frame = normalize_rows(df, first_row)
+            import_rows(db, index, hoja, plans[hoja], frame, result, dry_run)
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"✗ Error en el lote de la hoja {hoja} desde la fila {first_row}: {e}")
+            # Los conteos y los índices vuelven al estado del último commit; en simulación
+            # la base no tiene las filas simuladas de los lotes anteriores y el índice se conserva
+            result.counts, result.filas = counts, filas
+            if not dry_run:
+                index = ImportIndex(db)
+            index.seen_employees = seen
+            rows = frame["fila"] if frame is not None else range(first_row, first_row + len(df))
+            mensaje = f"Lote no importado: {getattr(e, 'orig', None) or e}"
+            for fila in rows:
+                result.error(hoja, fila, mensaje)
+
+        leidas += len(df)
+        if on_progress is not None:
+            on_progress(leidas, result)
+    return result
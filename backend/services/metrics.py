@@ -0,0 +1,249 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+
+# Límites de los histogramas de peticiones (segundos) y de consultas por petición
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestQueries:
+    """Consultas SQL de la petición en curso (y su presupuesto, ver query_budget)"""
+
+    __slots__ = ("count", "seconds", "budget")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.budget = None
+
+
+# Consultas de la petición en curso. Los endpoints sync (threadpool) y
+# AsyncSession.run_sync heredan el contexto, así que las consultas que hagan se suman
+# a su petición
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def current_request_queries() -> Optional[RequestQueries]:
+    """Contador de la petición en curso (None fuera de una petición)"""
+    return _request_queries.get()
+
+
+class Histogram:
+    """Histograma acumulado con total, suma y máximo"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            value_sum, max_value = self._sum, self._max
+        cumulative, running = {}, 0
+        for bound, count in zip([*self.buckets, "+Inf"], counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {
+            "buckets": cumulative,
+            "count": running,
+            "sum": round(value_sum, 6),
+            "max": round(max_value, 6),
+        }
+
+
+class RequestMetrics:
+    """Latencia, estados y consultas SQL por ruta (plantilla, ej: /devices/{id})"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.total_queries = 0
+        self.total_db_seconds = 0.0
+
+    def _histogram(self, store: dict, key: Tuple[str, str], buckets) -> Histogram:
+        histogram = store.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = store.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        queries: int, db_seconds: float) -> None:
+        key = (method, route)
+        with self._lock:
+            self.responses[(method, route, status)] = self.responses.get((method, route, status), 0) + 1
+        self._histogram(self.latency, key, LATENCY_BUCKETS_S).observe(seconds)
+        self._histogram(self.queries, key, QUERY_BUCKETS).observe(queries)
+        self._histogram(self.db_time, key, LATENCY_BUCKETS_S).observe(db_seconds)
+
+    def observe_query(self, seconds: float) -> None:
+        with self._lock:
+            self.total_queries += 1
+            self.total_db_seconds += seconds
+
+
+request_metrics = RequestMetrics()
+
+
+def _route_label(scope, root_path: str) -> str:
+    """Plantilla de la ruta (acota la cardinalidad: /devices/{id}, no /devices/17)"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    mounted = scope.get("root_path", "")
+    if mounted != root_path:
+        return mounted[len(root_path):] + "/*"
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia, código de estado y consultas SQL de cada petición
+
+    ASGI puro (sin BaseHTTPMiddleware) para no agregar tareas ni copiar el cuerpo de
+    las respuestas en streaming; la latencia incluye el envío completo del cuerpo.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root_path = scope.get("root_path", "")
+        status_code = 500
+        stats = RequestQueries()
+        token = _request_queries.set(stats)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            route = _route_label(scope, root_path)
+            request_metrics.observe_request(
+                scope["method"], route, status_code,
+                time.perf_counter() - start, stats.count, stats.seconds,
+            )
+            # Después del cuerpo completo: cuenta también las consultas de las exportaciones en streaming
+            if stats.budget is not None:
+                stats.budget.check(scope["method"], route, stats.count)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    request_metrics.observe_query(elapsed)
+
+
+def install_query_hooks(engine) -> None:
+    """Cuenta consultas y tiempo en la base por petición (engine sync o AsyncEngine)"""
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, histogram: Histogram, **labels) -> None:
+    snapshot = histogram.snapshot()
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+
+
+def render_prometheus(pool_monitors: Optional[dict] = None) -> str:
+    """Métricas en formato de texto de Prometheus"""
+    metrics = request_metrics
+    # Copias bajo el lock: otras peticiones agregan rutas mientras se recorre
+    with metrics._lock:
+        responses = dict(metrics.responses)
+        latency, queries, db_time = dict(metrics.latency), dict(metrics.queries), dict(metrics.db_time)
+        total_queries, total_db_seconds = metrics.total_queries, metrics.total_db_seconds
+    lines = []
+
+    lines.append("# HELP http_requests_total Peticiones HTTP por ruta y código de estado")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route, status), count in sorted(responses.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    for name, store, help_text in (
+        ("http_request_duration_seconds", latency, "Latencia de las peticiones HTTP"),
+        ("http_request_db_queries", queries, "Consultas SQL por petición"),
+        ("http_request_db_seconds", db_time, "Tiempo en la base de datos por petición"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), histogram in sorted(store.items()):
+            _render_histogram(lines, name, histogram, method=method, route=route)
+
+    lines.append("# HELP db_queries_total Consultas SQL ejecutadas (incluye tareas fuera de peticiones)")
+    lines.append("# TYPE db_queries_total counter")
+    lines.append(f"db_queries_total {total_queries}")
+    lines.append("# HELP db_query_seconds_total Tiempo total en consultas SQL")
+    lines.append("# TYPE db_query_seconds_total counter")
+    lines.append(f"db_query_seconds_total {round(total_db_seconds, 6)}")
+
+    if pool_monitors:
+        snapshots = {name: monitor.snapshot() for name, monitor in pool_monitors.items()}
+        for key, kind, help_text in (
+            ("checked_out", "gauge", "Conexiones en uso"),
+            ("overflow", "gauge", "Conexiones abiertas por encima de pool_size"),
+            ("connects", "counter", "Conexiones abiertas"),
+            ("invalidations", "counter", "Conexiones invalidadas"),
+            ("timeouts", "counter", "Esperas del pool que agotaron pool_timeout"),
+        ):
+            suffix = "_total" if kind == "counter" else ""
+            lines.append(f"# HELP db_pool_{key}{suffix} {help_text}")
+            lines.append(f"# TYPE db_pool_{key}{suffix} {kind}")
+            for name, snapshot in snapshots.items():
+                if key in snapshot:
+                    lines.append(f"db_pool_{key}{suffix}{_labels(pool=name)} {snapshot[key]}")
+        lines.append("# HELP db_pool_wait_milliseconds Espera para obtener una conexión del pool")
+        lines.append("# TYPE db_pool_wait_milliseconds histogram")
+        for name, monitor in pool_monitors.items():
+            _render_histogram(lines, "db_pool_wait_milliseconds", monitor.wait_ms, pool=name)
+
+    return "\n".join(lines) + "\n"
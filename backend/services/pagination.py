@@ -0,0 +1,157 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+from datetime import date, datetime
+from enum import Enum
+from typing import List, Optional, Sequence, Tuple
+import base64
+import binascii
+import json
+
+# Cabeceras de la respuesta paginada (el cuerpo sigue siendo la lista, por compatibilidad)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Cursor opaco con los valores de orden de la última fila de la página"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _matches_type(value, column) -> bool:
+    """Valor del cursor compatible con el tipo de su columna de orden (None: columna nula)"""
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    try:
+        expected = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        # Expresiones sin tipo (relevancia de la búsqueda): cualquier escalar
+        return isinstance(value, (int, float, str))
+    if expected is float:
+        return isinstance(value, (int, float))
+    if expected is date:
+        return isinstance(value, date) and not isinstance(value, datetime)
+    if isinstance(expected, type) and issubclass(expected, Enum):
+        return value in {member.value for member in expected}
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List:
+    """Valores de un cursor de encode_cursor, validados contra las columnas de orden"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Tamaño de cursor inválido")
+        values = [_decode_value(v) for v in values]
+        if not all(_matches_type(v, c) for v, c in zip(values, columns)):
+            raise ValueError("Tipo de valor de cursor inválido")
+        return values
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _after(keys: Sequence[Tuple], values: Sequence):
+    """
+    Condición "fila posterior al cursor" para un orden de varias columnas
+
+    (a, b) > (va, vb) se expande como a > va OR (a = va AND b > vb), respetando la
+    dirección de cada columna, para que sirva con órdenes mixtos asc/desc.
+    """
+    conditions = []
+    for i, (column, descending) in enumerate(keys):
+        previous = [keys[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*previous, step))
+    return or_(*conditions)
+
+
+def count_estimate(query) -> int:
+    """
+    Total de filas de la consulta
+
+    En PostgreSQL se usa la estimación del planificador (EXPLAIN), que no recorre la
+    tabla; en otras bases se cuenta.
+    """
+    session = query.session
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql":
+        compiled = query.order_by(None).statement.compile(dialect=bind.dialect)
+        plan = session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return query.order_by(None).count()
+
+
+def paginate(
+    query,
+    keys: Sequence[Tuple],
+    response: Response,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    rank=None,
+) -> list:
+    """
+    Pagina una consulta por cursor (keyset) manteniendo skip/limit por compatibilidad
+
+    El cursor de la siguiente página se envía en la cabecera X-Next-Cursor (ausente en
+    la última página) y, si se pide, el total en X-Total-Count.
+
+    Args:
+        query: Consulta de una entidad
+        keys: Orden único de la consulta como [(columna, descendente)], terminando en el id
+        response: Respuesta donde escribir las cabeceras
+        limit: Tamaño de página
+        skip: Filas a saltar (solo si no hay cursor)
+        cursor: Cursor devuelto por la página anterior
+        include_total: Incluir el total (estimado en PostgreSQL)
+        rank: Relevancia de la búsqueda, primer criterio de orden si se indica
+
+    Returns:
+        Lista de entidades de la página
+    """
+    if rank is not None:
+        keys = [(rank, True), *keys]
+
+    if include_total:
+        response.headers[TOTAL_COUNT_HEADER] = str(count_estimate(query))
+
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, [column for column, _ in keys])))
+
+    query = query.add_columns(*[column for column, _ in keys])
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in keys])
+    if skip and not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        # limit < 1 (llamadas internas sin la validación de Query) no deja fila para el cursor
+        if rows:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][1:])
+    return [row[0] for row in rows]
@@ -5,7 +5,50 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
+from functools import lru_cache
+import copy
 import os
+import uuid
+
+LOGO_PATH = "backend/static/images/cropped-logo.png"
+
+# Versión del diseño de las actas: forma parte de la clave del almacén de PDFs,
+# subirla cuando cambien textos, estilos o tablas para no servir actas viejas
+ACTA_TEMPLATE_VERSION = "1"
+
+ENTREGA_BODY_TEXT = """
+    Con el fin de facilitar el desempeño de sus funciones, por este medio se le hace asignación 
+    formal de un (01) celular con su cargador.
+    <br/><br/>
+    Asimismo, se le hace de su conocimiento que, en caso de pérdida, avería por mal uso o cualquier 
+    otro tipo de afectación que no permita el correcto funcionamiento del equipo, el valor total del 
+    mismo deberá ser cubierto por Usted.
+    <br/><br/>
+    En caso de que el equipo presente cualquier tipo de falla, se le solicita notificar de inmediato 
+    al departamento de informática y no realizar por su cuenta ninguna acción, como, por ejemplo: 
+    abrirlo, llevar a un técnico particular para intentar repararlo, etc.
+    <br/><br/>
+    Este equipo es propiedad de la empresa New Century, por lo que queda completamente prohibido 
+    agregar documentos, archivos o programas de uso personal sin la autorización del departamento 
+    de Informática y con la previa autorización de su jefe inmediato.
+    <br/><br/>
+    Sin más a que referirme, saludos
+    <br/><br/>
+    Atentamente,
+    """
+
+REMISION_FINAL_TEXT = """
+    Sin más a que referirme, saludos
+    """
+
+SIGNATURE_TEXT = """
+    <br/><br/>
+    _______________________________&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
+    _______________________________<br/>
+    <b>Entregué conforme</b>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
+    &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
+    <b>Recibí conforme</b>
+    """
 
 
 def format_date_spanish(date_obj):
@@ -21,13 +64,110 @@ def format_date_spanish(date_obj):
     return f"{d.day:02d} de {months[d.month]} del {d.year}"
 
 
-def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/static/pdfs") -> str:
+def _pdf_filename(prefix: str, employee_name: str) -> str:
+    """Nombre único del PDF (varias actas del mismo empleado pueden generarse en el mismo segundo)"""
+    return f"{prefix}_{employee_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.pdf"
+
+
+class ActaTemplate:
+    """
+    Recursos compartidos de las actas: estilos, logo decodificado, estilos de tabla
+    y párrafos fijos ya parseados. Se construye una sola vez por proceso; cada render
+    solo arma los campos variables.
+    """
+
+    def __init__(self, logo_path: str = LOGO_PATH):
+        self.styles = getSampleStyleSheet()
+        self.normal = self.styles['Normal']
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=14,
+            textColor=colors.black,
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+        self.logo = self._load_logo(logo_path)
+        self.entrega_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ])
+        self.remision_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        # Fragmentos parseados de los textos fijos: {(texto, estilo): frags}
+        self._frags = {}
+        for text, style in [
+            ("MEMORANDO", self.title_style),
+            ("ACTA DE REMISIÓN DE EQUIPOS", self.title_style),
+            (ENTREGA_BODY_TEXT, self.normal),
+            (REMISION_FINAL_TEXT, self.normal),
+            (SIGNATURE_TEXT, self.normal),
+        ]:
+            self._frags[(text, style.name)] = Paragraph(text, style).frags
+
+    @staticmethod
+    def _load_logo(logo_path: str):
+        """Carga y decodifica el logo una vez; None si no existe"""
+        if not os.path.exists(logo_path):
+            return None
+        try:
+            # Mantener aspect ratio aprox
+            img = Image(logo_path, width=1.5*inch, height=0.55*inch)
+            img.hAlign = 'LEFT'
+            # El flowable conserva su ImageReader: el PNG se decodifica en el primer render
+            return img
+        except Exception:
+            return None
+
+    def paragraph(self, text: str, style: ParagraphStyle = None) -> Paragraph:
+        """Crea un Paragraph reutilizando el parseo si el texto es fijo"""
+        style = style or self.normal
+        frags = self._frags.get((text, style.name))
+        if frags is None:
+            return Paragraph(text, style)
+        return Paragraph(text, style, frags=frags)
+
+    def header(self) -> list:
+        """Logo y espacio inicial"""
+        if self.logo is None:
+            return []
+        # Copia por render: el flowable guarda el canvas al dibujarse (renders en hilos
+        # concurrentes); la copia comparte la imagen ya decodificada
+        return [copy.copy(self.logo), Spacer(1, 0.1*inch)]
+
+
+@lru_cache(maxsize=1)
+def get_template() -> ActaTemplate:
+    """Plantilla compilada del proceso"""
+    return ActaTemplate()
+
+
+def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/static/pdfs", filename: str = None) -> str:
     """
     Genera el PDF del Acta de Entrega basado en el formato proporcionado
     
     Args:
         assignment_data: Diccionario con datos de la asignación
         output_dir: Directorio donde guardar el PDF
+        filename: Nombre del archivo (por defecto, derivado del empleado y la hora)
         
     Returns:
         str: Ruta del archivo PDF generado
@@ -36,7 +176,7 @@ def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/stat
     os.makedirs(output_dir, exist_ok=True)
     
     # Nombre del archivo
-    filename = f"acta_entrega_{assignment_data['employee_name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    filename = filename or _pdf_filename("acta_entrega", assignment_data['employee_name'])
     filepath = os.path.join(output_dir, filename)
     
     # Crear documento
@@ -44,35 +184,13 @@ def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/stat
                            rightMargin=72, leftMargin=72,
                            topMargin=72, bottomMargin=18)
     
-    # Contenedor para elementos
-    elements = []
+    template = get_template()
 
-    # Logo
-    logo_path = "backend/static/images/cropped-logo.png"
-    if os.path.exists(logo_path):
-        try:
-            # Mantener aspect ratio aprox
-            img = Image(logo_path, width=1.5*inch, height=0.55*inch)
-            img.hAlign = 'LEFT'
-            elements.append(img)
-            elements.append(Spacer(1, 0.1*inch))
-        except Exception:
-            pass
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        textColor=colors.black,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
+    # Contenedor para elementos (logo incluido)
+    elements = template.header()
     
     # Título
-    elements.append(Paragraph("MEMORANDO", title_style))
+    elements.append(template.paragraph("MEMORANDO", template.title_style))
     elements.append(Spacer(1, 0.2*inch))
     
     # Información del memorando
@@ -89,34 +207,13 @@ def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/stat
     ]
     
     for line in memo_info:
-        elements.append(Paragraph(line, styles['Normal']))
+        elements.append(Paragraph(line, template.normal))
         elements.append(Spacer(1, 0.1*inch))
     
     elements.append(Spacer(1, 0.3*inch))
     
     # Cuerpo del texto
-    body_text = """
-    Con el fin de facilitar el desempeño de sus funciones, por este medio se le hace asignación 
-    formal de un (01) celular con su cargador.
-    <br/><br/>
-    Asimismo, se le hace de su conocimiento que, en caso de pérdida, avería por mal uso o cualquier 
-    otro tipo de afectación que no permita el correcto funcionamiento del equipo, el valor total del 
-    mismo deberá ser cubierto por Usted.
-    <br/><br/>
-    En caso de que el equipo presente cualquier tipo de falla, se le solicita notificar de inmediato 
-    al departamento de informática y no realizar por su cuenta ninguna acción, como, por ejemplo: 
-    abrirlo, llevar a un técnico particular para intentar repararlo, etc.
-    <br/><br/>
-    Este equipo es propiedad de la empresa New Century, por lo que queda completamente prohibido 
-    agregar documentos, archivos o programas de uso personal sin la autorización del departamento 
-    de Informática y con la previa autorización de su jefe inmediato.
-    <br/><br/>
-    Sin más a que referirme, saludos
-    <br/><br/>
-    Atentamente,
-    """
-    
-    elements.append(Paragraph(body_text, styles['Normal']))
+    elements.append(template.paragraph(ENTREGA_BODY_TEXT))
     elements.append(Spacer(1, 0.4*inch))
     
     # Tabla de equipos
@@ -143,32 +240,13 @@ def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/stat
     ]
     
     table = Table(table_data, colWidths=[1.6*inch, 0.7*inch, 0.7*inch, 1.2*inch, 1.3*inch, 0.3*inch, 0.6*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-    ]))
+    table.setStyle(template.entrega_table_style)
     
     elements.append(table)
     elements.append(Spacer(1, 0.5*inch))
     
     # Firmas
-    signature_text = """
-    <br/><br/>
-    _______________________________&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
-    _______________________________<br/>
-    <b>Entregué conforme</b>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
-    &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
-    <b>Recibí conforme</b>
-    """
-    
-    elements.append(Paragraph(signature_text, styles['Normal']))
+    elements.append(template.paragraph(SIGNATURE_TEXT))
     
     # Construir PDF
     doc.build(elements)
@@ -176,13 +254,14 @@ def generate_acta_entrega(assignment_data: dict, output_dir: str = "backend/stat
     return filepath
 
 
-def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/static/pdfs") -> str:
+def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/static/pdfs", filename: str = None) -> str:
     """
     Genera el PDF del Acta de Remisión basado en el formato proporcionado
     
     Args:
         assignment_data: Diccionario con datos de la devolución
         output_dir: Directorio donde guardar el PDF
+        filename: Nombre del archivo (por defecto, derivado del empleado y la hora)
         
     Returns:
         str: Ruta del archivo PDF generado
@@ -191,7 +270,7 @@ def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/sta
     os.makedirs(output_dir, exist_ok=True)
     
     # Nombre del archivo
-    filename = f"acta_remision_{assignment_data['employee_name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    filename = filename or _pdf_filename("acta_remision", assignment_data['employee_name'])
     filepath = os.path.join(output_dir, filename)
     
     # Crear documento
@@ -199,34 +278,13 @@ def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/sta
                            rightMargin=72, leftMargin=72,
                            topMargin=72, bottomMargin=18)
     
-    # Contenedor para elementos
-    elements = []
+    template = get_template()
 
-    # Logo
-    logo_path = "backend/static/images/cropped-logo.png"
-    if os.path.exists(logo_path):
-        try:
-            img = Image(logo_path, width=1.5*inch, height=0.55*inch)
-            img.hAlign = 'LEFT'
-            elements.append(img)
-            elements.append(Spacer(1, 0.1*inch))
-        except Exception:
-            pass
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        textColor=colors.black,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
+    # Contenedor para elementos (logo incluido)
+    elements = template.header()
     
     # Título
-    elements.append(Paragraph("ACTA DE REMISIÓN DE EQUIPOS", title_style))
+    elements.append(template.paragraph("ACTA DE REMISIÓN DE EQUIPOS", template.title_style))
     elements.append(Spacer(1, 0.3*inch))
     
     # Información
@@ -237,10 +295,11 @@ def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/sta
     <b>Fecha de asignación original:</b> {format_date_spanish(assignment_data['fecha_asignacion'])}<br/>
     """
     
-    elements.append(Paragraph(info_text, styles['Normal']))
+    elements.append(Paragraph(info_text, template.normal))
     elements.append(Spacer(1, 0.3*inch))
     
     # Tabla de equipos devueltos
+    fecha_generacion = assignment_data.get('fecha_generacion') or datetime.now()
     table_data = [
         ['Equipo', 'Marca', 'Modelo', 'No. Serie / IMEI', 'Fecha', 'Cant.'],
         [
@@ -248,7 +307,7 @@ def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/sta
             assignment_data['device_marca'],
             assignment_data['device_modelo'],
             f"S/N: {assignment_data.get('device_numero_serie', 'N/A')}\nIMEI: {assignment_data.get('device_imei', 'N/A')}",
-            format_date_spanish(datetime.now()), # Fecha de generación
+            format_date_spanish(fecha_generacion), # Fecha de generación
             '1'
         ],
         [
@@ -256,24 +315,13 @@ def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/sta
             assignment_data['device_marca'],
             '',
             '',
-            format_date_spanish(datetime.now()),
+            format_date_spanish(fecha_generacion),
             '1'
         ]
     ]
     
     table = Table(table_data, colWidths=[1.3*inch, 0.9*inch, 0.9*inch, 1.6*inch, 1.3*inch, 0.4*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
+    table.setStyle(template.remision_table_style)
     
     elements.append(table)
     elements.append(Spacer(1, 0.3*inch))
@@ -281,27 +329,15 @@ def generate_acta_remision(assignment_data: dict, output_dir: str = "backend/sta
     # Observaciones
     if assignment_data.get('observaciones'):
         obs_text = f"<b>Observaciones:</b> {assignment_data['observaciones']}"
-        elements.append(Paragraph(obs_text, styles['Normal']))
+        elements.append(Paragraph(obs_text, template.normal))
         elements.append(Spacer(1, 0.3*inch))
     
     # Texto final
-    final_text = """
-    Sin más a que referirme, saludos
-    """
-    elements.append(Paragraph(final_text, styles['Normal']))
+    elements.append(template.paragraph(REMISION_FINAL_TEXT))
     elements.append(Spacer(1, 0.5*inch))
     
     # Firmas
-    signature_text = """
-    <br/><br/>
-    _______________________________&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
-    _______________________________<br/>
-    <b>Entregué conforme</b>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
-    &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;
-    <b>Recibí conforme</b>
-    """
-    
-    elements.append(Paragraph(signature_text, styles['Normal']))
+    elements.append(template.paragraph(SIGNATURE_TEXT))
     
     # Construir PDF
     doc.build(elements)
@@ -0,0 +1,178 @@
+# Las actas se renderizan en un pool de procesos para no bloquear los workers de la API
+# (ReportLab es intensivo en CPU y retiene el GIL)
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from dotenv import load_dotenv
+import multiprocessing
+import os
+import threading
+
+from backend.database import SessionLocal
+from backend.models.assignment import Assignment, ActaStatus
+from backend.services.pdf_generator import generate_acta_entrega, generate_acta_remision
+from backend.services.pdf_store import acta_filename, prepare_acta_data, render_to_store
+
+load_dotenv()
+
+# Número de procesos de render. 0 = generar en línea (útil para scripts y desarrollo)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+
+GENERATORS = {
+    "entrega": generate_acta_entrega,
+    "remision": generate_acta_remision,
+}
+
+# Carpeta física de los PDFs (servida en /pdfs)
+PDF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "pdfs")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: los hijos no heredan conexiones abiertas del pool de SQLAlchemy
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def submit_render(doc_type: str, data_pdf: dict) -> Future:
+    """
+    Envía el render de un acta al pool y devuelve un Future con la ruta del PDF
+
+    Args:
+        doc_type: "entrega" o "remision"
+        data_pdf: Datos del acta (ver generate_acta_entrega / generate_acta_remision)
+    """
+    generator = GENERATORS[doc_type]
+    data_pdf = prepare_acta_data(doc_type, data_pdf)
+
+    # Misma entrada, misma acta: si ya está en el almacén no se vuelve a renderizar
+    stored_path = os.path.join(PDF_DIR, acta_filename(doc_type, data_pdf))
+    if PDF_WORKERS <= 0 or os.path.exists(stored_path):
+        future = Future()
+        try:
+            future.set_result(render_to_store(generator, doc_type, data_pdf, PDF_DIR))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    try:
+        return _get_executor().submit(render_to_store, generator, doc_type, data_pdf, PDF_DIR)
+    except BrokenProcessPool:
+        # Un proceso hijo murió (ej: OOM); se recrea el pool una vez
+        _reset_executor()
+        return _get_executor().submit(render_to_store, generator, doc_type, data_pdf, PDF_DIR)
+
+
+def pdf_file_path(url: Optional[str]) -> Optional[str]:
+    """Ruta física de un acta guardada (url relativa a static, ej: /pdfs/archivo.pdf) o None si no existe"""
+    if not url:
+        return None
+    file_path = os.path.join(PDF_DIR, os.path.basename(url))
+    return file_path if os.path.exists(file_path) else None
+
+
+def build_acta_data(assignment: Assignment, doc_type: str, user) -> dict:
+    """
+    Datos para regenerar el acta de una asignación existente
+
+    Args:
+        assignment: Asignación con employee y device cargados
+        doc_type: "entrega" o "remision"
+        user: Usuario que solicita el acta (responsable de la entrega)
+    """
+    if doc_type == "entrega":
+        return {
+            "employee_name": assignment.employee.nombre_completo,
+            "employee_cargo": assignment.employee.cargo,
+            "responsable_nombre": user.username,
+            "responsable_cargo": getattr(user.role, "value", "Admin"),
+            "fecha_asignacion": assignment.fecha_asignacion,
+            "numero_telefono": assignment.device.numero_telefono,
+            "device_marca": assignment.device.marca,
+            "device_modelo": assignment.device.modelo,
+            "device_imei": assignment.device.imei,
+            "device_estado_fisico": assignment.device.estado_fisico.value
+        }
+    return {
+        "employee_name": assignment.employee.nombre_completo,
+        "employee_cargo": assignment.employee.cargo,
+        "fecha_asignacion": assignment.fecha_asignacion,
+        "fecha_devolucion": assignment.fecha_devolucion,
+        "device_marca": assignment.device.marca,
+        "device_modelo": assignment.device.modelo,
+        "device_numero_serie": assignment.device.numero_serie,
+        "device_imei": assignment.device.imei,
+        "observaciones": assignment.observaciones
+    }
+
+
+def render_acta(doc_type: str, data_pdf: dict) -> str:
+    """Renderiza un acta en el pool y espera el resultado (para descargas bajo demanda)"""
+    return submit_render(doc_type, data_pdf).result()
+
+
+def _record_result(assignment_id: int, doc_type: str, future: Future) -> None:
+    """Guarda la URL y el estado del acta cuando termina el render"""
+    db = SessionLocal()
+    try:
+        assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+        if not assignment:
+            return
+        try:
+            pdf_path = future.result()
+            setattr(assignment, f"acta_{doc_type}_url", f"/pdfs/{os.path.basename(pdf_path)}")
+            setattr(assignment, f"acta_{doc_type}_estado", ActaStatus.LISTO.value)
+        except Exception as e:
+            print(f"Error generando PDF de {doc_type} (asignación {assignment_id}): {e}")
+            setattr(assignment, f"acta_{doc_type}_estado", ActaStatus.ERROR.value)
+        db.commit()
+    except Exception as e:
+        print(f"Error registrando estado del PDF (asignación {assignment_id}): {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def track_render(assignment_id: int, doc_type: str, data_pdf: dict) -> Future:
+    """Encola el render y registra la URL y el estado en la asignación al terminar"""
+    future = submit_render(doc_type, data_pdf)
+    future.add_done_callback(lambda f: _record_result(assignment_id, doc_type, f))
+    return future
+
+
+def enqueue_acta(db, assignment: Assignment, doc_type: str, data_pdf: dict) -> None:
+    """
+    Marca el acta como pendiente y la encola para generarse fuera de la petición
+
+    El estado pendiente se confirma antes de encolar para que el callback, que usa
+    su propia sesión, siempre encuentre la fila actualizada.
+    """
+    setattr(assignment, f"acta_{doc_type}_estado", ActaStatus.PENDIENTE.value)
+    db.commit()
+
+    track_render(assignment.id, doc_type, data_pdf)
+
+
+def shutdown() -> None:
+    """Detiene el pool esperando los trabajos en curso (al apagar la aplicación)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,214 @@
+"""
+Almacén de actas direccionado por contenido y respuestas HTTP cacheables
+
+Cada acta se guarda con un nombre derivado del hash de sus datos de entrada (tipo,
+datos y versión del diseño), de modo que volver a pedir la misma acta reutiliza el
+archivo en lugar de renderizarlo y dejar copias huérfanas en backend/static/pdfs.
+Los archivos se escriben una sola vez y no cambian, así que se sirven con ETag fuerte
+(hash del contenido), Cache-Control y soporte de Range.
+"""
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import uuid
+
+from backend.services.pdf_generator import ACTA_TEMPLATE_VERSION
+
+# Los archivos del almacén no cambian nunca: se pueden cachear indefinidamente
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Las rutas por asignación pueden apuntar a otra acta: revalidar siempre con el ETag
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def prepare_acta_data(doc_type: str, data_pdf: dict) -> dict:
+    """
+    Fija la fecha de generación del acta de remisión
+
+    La remisión imprime la fecha en que se genera; se incluye en los datos para que
+    forme parte de la clave y el acta de otro día no se confunda con la de hoy.
+    """
+    if doc_type == "remision" and not data_pdf.get("fecha_generacion"):
+        return {**data_pdf, "fecha_generacion": date.today()}
+    return data_pdf
+
+
+def acta_key(doc_type: str, data_pdf: dict) -> str:
+    """Hash (sha256) de los datos con los que se renderiza el acta"""
+    payload = json.dumps(
+        {"doc_type": doc_type, "version": ACTA_TEMPLATE_VERSION, "data": data_pdf},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def acta_filename(doc_type: str, data_pdf: dict) -> str:
+    """Nombre del acta en el almacén: legible por el empleado y único por contenido"""
+    employee = data_pdf['employee_name'].replace(' ', '_').replace('/', '_')
+    return f"acta_{doc_type}_{employee}_{acta_key(doc_type, data_pdf)[:24]}.pdf"
+
+
+def render_to_store(generator: Callable, doc_type: str, data_pdf: dict, output_dir: str) -> str:
+    """
+    Renderiza el acta en el almacén si aún no existe y devuelve su ruta
+
+    Se ejecuta en los procesos del pool. El PDF se escribe en un archivo temporal y
+    se mueve al final, así dos renders simultáneos de la misma acta nunca dejan un
+    archivo a medio escribir.
+    """
+    path = os.path.join(output_dir, acta_filename(doc_type, data_pdf))
+    if os.path.exists(path):
+        return path
+
+    tmp_path = generator(data_pdf, output_dir, filename=f".{uuid.uuid4().hex}.tmp")
+    os.replace(tmp_path, path)
+    return path
+
+
+@lru_cache(maxsize=1024)
+def _content_etag(path: str, mtime_ns: int, size: int) -> str:
+    """ETag fuerte: hash del contenido (en caché mientras el archivo no cambie)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def file_etag(path: str, stat_result: Optional[os.stat_result] = None) -> str:
+    stat_result = stat_result or os.stat(path)
+    return _content_etag(path, stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def _etag_matches(etag: str, header: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Rango único "bytes=inicio-fin" como (inicio, fin) inclusivos
+
+    Devuelve None si la cabecera no es un rango simple (se responde el archivo
+    completo) y lanza ValueError si el rango no se puede satisfacer.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Sufijo: últimos N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Rango vacío")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Rango fuera del archivo")
+    return start, end
+
+
+def _iter_file_range(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(
+    request_headers,
+    path: str,
+    cache_control: str,
+    filename: Optional[str] = None,
+    media_type: str = "application/pdf",
+    stat_result: Optional[os.stat_result] = None,
+    head: bool = False,
+) -> Response:
+    """
+    Respuesta de archivo con ETag fuerte, Cache-Control, 304 y rangos (206 / 416)
+
+    Args:
+        request_headers: Cabeceras de la petición
+        path: Ruta del archivo
+        cache_control: Valor de Cache-Control
+        filename: Nombre para Content-Disposition (None = sin cabecera)
+        media_type: Tipo de contenido
+        stat_result: os.stat del archivo, si ya se tiene
+        head: True si la petición es HEAD (sin cuerpo)
+    """
+    stat_result = stat_result or os.stat(path)
+    size = stat_result.st_size
+    etag = file_etag(path, stat_result)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match and _etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            body = iter(()) if head else _iter_file_range(path, start, end)
+            return StreamingResponse(body, status_code=206, media_type=media_type, headers=headers)
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat_result,
+        headers=headers,
+    )
+
+
+def pdf_response(request: Request, path: str, filename: Optional[str] = None) -> Response:
+    """Respuesta de un acta descargada por asignación (revalidada en cada uso con el ETag)"""
+    return cached_file_response(
+        request.headers,
+        path,
+        REVALIDATE_CACHE_CONTROL,
+        filename=filename,
+        head=request.method == "HEAD",
+    )
+
+
+class PdfStaticFiles(StaticFiles):
+    """Montaje /pdfs: los archivos del almacén no cambian, se cachean como inmutables"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        request = Request(scope)
+        return cached_file_response(
+            request.headers,
+            str(full_path),
+            IMMUTABLE_CACHE_CONTROL,
+            media_type="application/pdf",
+            stat_result=stat_result,
+            head=request.method == "HEAD",
+        )
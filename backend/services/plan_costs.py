@@ -0,0 +1,284 @@
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, update, Date
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+from typing import List, Optional, Sequence, Tuple
+import threading
+
+from backend.database import SessionLocal
+from backend.models.assignment import Assignment
+from backend.models.device import Device
+from backend.models.employee import Employee
+from backend.models.plan import Plan
+from backend.models.plan_cost_rollup import PlanCostRollup, PlanCostRollupVersion
+from backend.services.depreciation import device_valuation_subquery
+
+# Dimensiones por las que se puede agrupar (columnas de Employee y de PlanCostRollup)
+ROLLUP_DIMENSIONS = ("departamento", "ubicacion", "empresa")
+
+# Un solo llenado a la vez por proceso (entre workers decide la restricción única)
+_refresh_lock = threading.Lock()
+
+# Intentos de un llenado que se cruza con invalidaciones antes de dejarlo para la próxima vez
+REFRESH_ATTEMPTS = 3
+
+# Llenado en segundo plano lanzado por el reporte (uno a la vez por proceso)
+_background = None
+_background_lock = threading.Lock()
+
+
+def month_start(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+def shift_months(mes: date, meses: int) -> date:
+    """Primer día del mes desplazado en meses (negativo: hacia atrás)"""
+    total = mes.year * 12 + mes.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def months_between(desde: date, hasta: date) -> List[date]:
+    """Primer día de cada mes entre desde y hasta (inclusive)"""
+    meses, mes = [], month_start(desde)
+    while mes <= hasta:
+        meses.append(mes)
+        mes = shift_months(mes, 1)
+    return meses
+
+
+def month_lines_query(mes: date, corte: date, dimensions: Sequence[str] = ROLLUP_DIMENSIONS,
+                      depreciacion: bool = True):
+    """
+    Líneas activas al corte del mes agrupadas por dimensiones del empleado
+
+    Un solo GROUP BY sobre las asignaciones activas en la fecha de corte (fin de mes, u
+    hoy para el mes en curso): cada línea suma el costo mensual de su plan y, si se
+    pide, la depreciación del equipo durante el mes (valor al inicio - valor al corte,
+    con la misma regla que Device.calcular_depreciacion).
+
+    Args:
+        mes: Primer día del mes
+        corte: Fecha en la que se toman las asignaciones activas
+        dimensions: Columnas de Employee por las que agrupar
+        depreciacion: Incluir la depreciación del mes
+
+    Returns:
+        Select con las dimensiones, lineas, costo_planes y depreciacion
+    """
+    groups = [func.coalesce(getattr(Employee, d), "").label(d) for d in dimensions]
+    columns = [
+        *groups,
+        func.count(Assignment.id).label("lineas"),
+        func.coalesce(func.sum(func.coalesce(Plan.costo_mensual, 0)), 0).label("costo_planes"),
+    ]
+    query = (
+        select()
+        .select_from(Assignment)
+        .join(Employee, Assignment.employee_id == Employee.id)
+        .join(Device, Assignment.device_id == Device.id)
+        .outerjoin(Plan, Device.plan_id == Plan.id)
+        .where(
+            Assignment.fecha_asignacion <= corte,
+            or_(Assignment.fecha_devolucion.is_(None), Assignment.fecha_devolucion > corte),
+        )
+    )
+
+    if depreciacion:
+        # Valor al cierre del mes anterior y al corte, acotados al costo (compras dentro del mes)
+        inicio = device_valuation_subquery(mes - timedelta(days=1))
+        fin = device_valuation_subquery(corte)
+        query = query.join(inicio, inicio.c.id == Device.id).join(fin, fin.c.id == Device.id)
+        valor_inicio = case((inicio.c.valor_actual < inicio.c.costo_inicial, inicio.c.valor_actual),
+                            else_=inicio.c.costo_inicial)
+        valor_fin = case((fin.c.valor_actual < fin.c.costo_inicial, fin.c.valor_actual),
+                         else_=fin.c.costo_inicial)
+        columns.append(func.coalesce(func.sum(valor_inicio - valor_fin), 0).label("depreciacion"))
+
+    return query.add_columns(*columns).group_by(*groups)
+
+
+def _rollup_version(db: Session, for_update: bool = False) -> Optional[int]:
+    query = select(PlanCostRollupVersion.generacion).where(PlanCostRollupVersion.id == 1)
+    if for_update:
+        query = query.with_for_update()
+    return db.execute(query).scalar()
+
+
+def refresh_plan_cost_rollup(db: Session, today: Optional[date] = None) -> int:
+    """
+    Completa plan_cost_rollups con los meses cerrados que faltan
+
+    Incremental: calcula los meses cerrados desde la primera asignación que no tienen
+    filas (normalmente ninguno, el mes que acaba de cerrar o los descartados por
+    invalidate_plan_cost_rollup), con un INSERT ... SELECT por mes; un mes sin líneas
+    guarda una fila en cero para no quedar pendiente. No supone que los meses
+    guardados sean un prefijo: un llenado que se cruzó con una invalidación no deja
+    huecos. Un mes cerrado conserva el departamento, el costo del plan y la
+    depreciación con los que se calculó.
+
+    Una escritura sin commit no es visible para el llenado, y su DELETE no ve las filas
+    del llenado sin commit. Por eso el llenado vuelve a leer la versión de la tabla
+    (plan_cost_rollup_version) con FOR UPDATE antes de su commit. Si una invalidación
+    la incrementó, FOR UPDATE espera el commit de esa escritura y el llenado se
+    descarta y se repite. Si no, la fila queda bloqueada hasta el commit del llenado,
+    y la siguiente invalidación borra después sus filas.
+
+    Se ejecuta en upgrade_db, en el hilo de la foto diaria y en segundo plano cuando el
+    reporte encuentra meses sin calcular (schedule_plan_cost_refresh), nunca dentro de
+    una petición.
+
+    Returns:
+        Número de meses calculados
+    """
+    actual = month_start(today or date.today())
+    columns = ["mes", *ROLLUP_DIMENSIONS, "lineas", "costo_planes", "depreciacion"]
+    with _refresh_lock:
+        for _ in range(REFRESH_ATTEMPTS):
+            version = _rollup_version(db)
+            primera = db.execute(select(func.min(Assignment.fecha_asignacion))).scalar()
+            if primera is None:
+                db.rollback()
+                return 0
+            guardados = set(db.execute(select(PlanCostRollup.mes).distinct()).scalars())
+            faltantes = [m for m in months_between(primera, actual) if m < actual and m not in guardados]
+            if not faltantes:
+                db.rollback()
+                return 0
+
+            try:
+                for mes in faltantes:
+                    rows = (
+                        month_lines_query(mes, shift_months(mes, 1) - timedelta(days=1))
+                        .add_columns(literal(mes, Date).label("mes"))
+                        .subquery()
+                    )
+                    result = db.execute(insert(PlanCostRollup).from_select(columns, select(*[rows.c[c] for c in columns])))
+                    if not result.rowcount:
+                        db.add(PlanCostRollup(mes=mes, lineas=0, costo_planes=0, depreciacion=0))
+                db.flush()
+                if _rollup_version(db, for_update=True) != version:
+                    # Una escritura invalidó meses mientras se calculaban
+                    db.rollback()
+                    continue
+                db.commit()
+            except IntegrityError:
+                # Otro worker llenó los mismos meses
+                db.rollback()
+                return 0
+            return len(faltantes)
+        print(f"⚠️  Costo por línea: llenado descartado {REFRESH_ATTEMPTS} veces por invalidaciones concurrentes")
+        return 0
+
+
+def run_plan_cost_refresh() -> None:
+    """Completa plan_cost_rollups con una sesión propia (hilos fuera de las peticiones)"""
+    db = SessionLocal()
+    try:
+        meses = refresh_plan_cost_rollup(db)
+        if meses:
+            print(f"✓ Costo por línea: {meses} meses cerrados calculados")
+    except Exception as e:
+        print(f"✗ Error calculando el costo por línea: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def schedule_plan_cost_refresh() -> None:
+    """Lanza run_plan_cost_refresh en un hilo, salvo que ya haya uno en curso"""
+    global _background
+    with _background_lock:
+        if _background is not None and _background.is_alive():
+            return
+        _background = threading.Thread(target=run_plan_cost_refresh, name="plan-costs", daemon=True)
+        _background.start()
+
+
+def wait_plan_cost_refresh(timeout: Optional[float] = None) -> None:
+    """Espera el llenado en segundo plano en curso, si lo hay"""
+    with _background_lock:
+        background = _background
+    if background is not None:
+        background.join(timeout)
+
+
+def invalidate_plan_cost_rollup(db, desde: Optional[date] = None) -> None:
+    """
+    Descarta los meses cerrados desde la fecha dada (None: todos) para recalcularlos
+
+    Se ejecuta en la transacción de quien llama; una fecha del mes en curso no afecta
+    a meses cerrados y no ejecuta consultas. Primero incrementa la versión de la tabla:
+    el UPDATE bloquea la fila hasta el commit de quien llama, así un llenado en curso
+    descarta lo que calculó sin ver esta escritura (ver refresh_plan_cost_rollup) y
+    las invalidaciones con fecha pasada se serializan entre sí.
+    """
+    if desde is not None and desde >= month_start(date.today()):
+        return
+    db.execute(
+        update(PlanCostRollupVersion)
+        .where(PlanCostRollupVersion.id == 1)
+        .values(generacion=PlanCostRollupVersion.generacion + 1)
+    )
+    stmt = delete(PlanCostRollup)
+    if desde is not None:
+        stmt = stmt.where(PlanCostRollup.mes >= month_start(desde))
+    db.execute(stmt)
+
+
+def plan_cost_rows(db: Session, dimensions: Sequence[str], desde: date, hasta: date,
+                   depreciacion: bool = False) -> Tuple[List[dict], List[date]]:
+    """
+    Costo mensual de líneas por mes y dimensiones, de desde a hasta
+
+    Los meses cerrados salen de plan_cost_rollups (un GROUP BY sobre la tabla
+    agregada); el mes en curso, si está en el rango, se calcula en vivo. Los meses
+    cerrados que la tabla todavía no tiene (recién creada, mes que acaba de cerrar o
+    invalidado por una escritura) no se calculan aquí: se devuelven como pendientes y
+    se completan en segundo plano.
+
+    Returns:
+        (filas, pendientes): filas {mes, *dimensiones, lineas, costo_planes[, depreciacion]}
+        ordenadas por mes y los meses cerrados del rango que faltan por calcular
+    """
+    actual = month_start(date.today())
+    groups = [getattr(PlanCostRollup, d) for d in dimensions]
+    rows = db.execute(
+        select(
+            PlanCostRollup.mes,
+            *groups,
+            func.sum(PlanCostRollup.lineas).label("lineas"),
+            func.sum(PlanCostRollup.costo_planes).label("costo_planes"),
+            func.sum(PlanCostRollup.depreciacion).label("depreciacion"),
+        )
+        .where(and_(PlanCostRollup.mes >= month_start(desde), PlanCostRollup.mes <= hasta,
+                    PlanCostRollup.mes < actual))
+        .group_by(PlanCostRollup.mes, *groups)
+        .order_by(PlanCostRollup.mes, *groups)
+    ).mappings().all()
+
+    # Meses del rango sin filas guardadas (los anteriores a la primera asignación no cuentan)
+    guardados = {r["mes"] for r in rows}
+    pendientes = [m for m in months_between(desde, hasta) if m < actual and m not in guardados]
+    if pendientes:
+        primera = db.execute(select(func.min(Assignment.fecha_asignacion))).scalar()
+        pendientes = [m for m in pendientes if primera is not None and m >= month_start(primera)]
+        if pendientes:
+            schedule_plan_cost_refresh()
+
+    # Las filas en cero de los meses sin líneas solo marcan el mes como calculado
+    rows = [dict(r) for r in rows if r["lineas"]]
+    if hasta >= actual:
+        live = db.execute(month_lines_query(actual, date.today(), dimensions, depreciacion)).mappings().all()
+        live = sorted(live, key=lambda r: [r[d] for d in dimensions])
+        rows += [{"mes": actual, **r} for r in live]
+
+    filas = []
+    for row in rows:
+        fila = {"mes": row["mes"].strftime("%Y-%m")}
+        fila.update({d: row[d] or None for d in dimensions})
+        fila["lineas"] = int(row["lineas"])
+        fila["costo_planes"] = round(float(row["costo_planes"]), 2)
+        if depreciacion:
+            fila["depreciacion"] = round(float(row["depreciacion"]), 2)
+        filas.append(fila)
+    return filas, pendientes
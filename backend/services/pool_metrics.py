@@ -0,0 +1,153 @@
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from typing import Dict, Optional
+import threading
+import time
+
+from backend.services.metrics import Histogram
+
+# Límites de los histogramas (acumulados, como los "le" de Prometheus)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+AGE_BUCKETS_S = (60, 300, 900, 1800, 3600, 7200, 14400)
+
+
+class PoolMonitor:
+    """
+    Telemetría de un pool de conexiones de SQLAlchemy a partir de sus eventos
+
+    - Espera para obtener una conexión (ms), medida en el pool monitoreado
+    - Edad de la conexión entregada en cada checkout (s) y de las conexiones vivas
+    - Conexiones abiertas, invalidadas (ej: pre-ping tras un reinicio de Postgres) y
+      timeouts del pool (el "QueuePool limit ... reached")
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.wait_ms = Histogram(WAIT_BUCKETS_MS)
+        self.checkout_age_s = Histogram(AGE_BUCKETS_S)
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self._opened_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def pool_class(self, base):
+        """Subclase de la clase de pool que mide la espera de cada checkout"""
+        monitor = self
+
+        class MonitoredPool(base):
+            def _do_get(self):
+                start = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except exc.TimeoutError:
+                    with monitor._lock:
+                        monitor.timeouts += 1
+                    raise
+                finally:
+                    monitor.wait_ms.observe((time.perf_counter() - start) * 1000)
+
+        MonitoredPool.__name__ = f"Monitored{base.__name__}"
+        return MonitoredPool
+
+    def attach(self, engine) -> None:
+        """Registra los eventos del pool (engine sync o AsyncEngine)"""
+        self.engine = getattr(engine, "sync_engine", engine)
+        pool = self.engine.pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        event.listen(pool, "close", self._on_close)
+        event.listen(pool, "close_detached", self._on_close_detached)
+        event.listen(pool, "detach", self._on_detach)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+            self._opened_at[id(dbapi_connection)] = time.monotonic()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        opened_at = self._opened_at.get(id(dbapi_connection))
+        with self._lock:
+            self.checkouts += 1
+        if opened_at is not None:
+            self.checkout_age_s.observe(time.monotonic() - opened_at)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._opened_at.pop(id(dbapi_connection), None)
+
+    def _on_detach(self, dbapi_connection, connection_record):
+        # Una conexión desacoplada deja de pertenecer al pool
+        self._on_close(dbapi_connection, connection_record)
+
+    def _on_close_detached(self, dbapi_connection):
+        self._on_close(dbapi_connection, None)
+
+    def snapshot(self) -> dict:
+        """Estado actual del pool y métricas acumuladas"""
+        pool = self.engine.pool if self.engine is not None else None
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - opened for opened in self._opened_at.values()]
+            counters = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+            }
+        stats = {"pool": type(pool).__name__ if pool is not None else None}
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        stats.update(counters)
+        stats["wait_ms"] = self.wait_ms.snapshot()
+        stats["checkout_age_s"] = self.checkout_age_s.snapshot()
+        stats["connection_age_s"] = {
+            "open": len(ages),
+            "max": round(max(ages), 1) if ages else 0,
+            "avg": round(sum(ages) / len(ages), 1) if ages else 0,
+        }
+        return stats
+
+
+def engine_options(
+    url: str,
+    monitor: Optional[PoolMonitor],
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: int,
+    pool_pre_ping: bool,
+    pool_recycle: int,
+) -> dict:
+    """
+    Argumentos de create_engine / create_async_engine para la configuración del pool
+
+    Los parámetros de tamaño solo aplican a los pools con cola (QueuePool); SQLite en
+    memoria o aiosqlite usan el pool por defecto del dialecto sin ellos.
+    """
+    parsed = make_url(url)
+    base = parsed.get_dialect().get_pool_class(parsed)
+    options = {"pool_pre_ping": pool_pre_ping}
+    if issubclass(base, QueuePool):
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+        )
+    if monitor is not None:
+        options["poolclass"] = monitor.pool_class(base)
+    return options
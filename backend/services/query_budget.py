@@ -0,0 +1,50 @@
+from dotenv import load_dotenv
+import os
+
+from backend.services.metrics import current_request_queries
+
+load_dotenv()
+
+# "log": avisa por consola al exceder el presupuesto; "raise": además lanza
+# QueryBudgetExceeded (desarrollo y pruebas, ver scripts/check_query_budgets.py); "off"
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").lower()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Una petición ejecutó más consultas SQL que las declaradas para su endpoint"""
+
+
+class QueryBudget:
+    """Máximo de consultas SQL de una petición, auth incluida"""
+
+    def __init__(self, max_queries: int):
+        self.max_queries = max_queries
+
+    def check(self, method: str, route: str, used: int) -> None:
+        if used <= self.max_queries:
+            return
+        message = f"{method} {route} ejecutó {used} consultas (presupuesto: {self.max_queries}). ¿N+1?"
+        print(f"⚠️  Presupuesto de consultas excedido: {message}")
+        if QUERY_BUDGET_MODE == "raise":
+            raise QueryBudgetExceeded(message)
+
+
+def query_budget(max_queries: int):
+    """
+    Dependency que declara el máximo de consultas SQL de un endpoint
+
+    Se evalúa en MetricsMiddleware al terminar la respuesta (cuerpo en streaming
+    incluido), por lo que cuenta también las consultas de auth y de las exportaciones.
+
+    Uso: @router.get("/", dependencies=[Depends(query_budget(5))])
+    """
+    budget = QueryBudget(max_queries)
+
+    async def declare_budget() -> None:
+        if QUERY_BUDGET_MODE == "off":
+            return
+        stats = current_request_queries()
+        if stats is not None:
+            stats.budget = budget
+
+    return declare_budget
@@ -0,0 +1,200 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Optional
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
+import threading
+import time
+
+load_dotenv()
+
+# Configuración
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "60"))
+REPORT_CACHE_MAXSIZE = int(os.getenv("REPORT_CACHE_MAXSIZE", "256"))
+# Si se define (ej: redis://localhost:6379/0) la caché se comparte entre workers
+REPORT_CACHE_URL = os.getenv("REPORT_CACHE_URL")
+
+_MISSING = object()
+
+
+class MemoryCacheBackend:
+    """Caché en memoria del proceso con expiración (TTL) y desalojo LRU"""
+
+    def __init__(self, maxsize: int = REPORT_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: int, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Se invalidó mientras se calculaba: el valor ya está desactualizado
+                return
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+
+class RedisCacheBackend:
+    """
+    Caché compartida entre workers (uvicorn --workers N) sobre Redis
+
+    Los valores se guardan en JSON. La invalidación incrementa un contador de
+    generación que forma parte de cada clave, por lo que es atómica y no requiere
+    recorrer las claves existentes; las entradas viejas expiran solas por TTL.
+    """
+
+    def __init__(self, url: str, prefix: str = "reports"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("REPORT_CACHE_URL requiere el paquete 'redis' (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def generation(self) -> str:
+        return (self._client.get(f"{self._prefix}:generation") or b"0").decode()
+
+    def _key(self, key: str, generation: Optional[str] = None) -> str:
+        return f"{self._prefix}:{generation or self.generation()}:{key}"
+
+    def get(self, key: str) -> Any:
+        raw = self._client.get(self._key(key))
+        if raw is None:
+            return _MISSING
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: int, generation: Optional[str] = None) -> None:
+        # Con la generación leída antes de calcular: si hubo una invalidación, el valor
+        # queda bajo una generación que ya no se lee
+        self._client.set(self._key(key, generation), json.dumps(value, default=str), ex=ttl)
+
+    def clear(self) -> None:
+        self._client.incr(f"{self._prefix}:generation")
+
+
+class ReportCache:
+    """
+    Caché de reportes agregados (dashboard, conteos por estado, etc.)
+
+    Las escrituras de dispositivos, asignaciones y empleados llaman a invalidate()
+    después del commit. Mientras un reporte se calcula, las demás peticiones de la
+    misma clave esperan el resultado en lugar de recalcularlo.
+
+    Los locks por clave llevan la cuenta de quienes los usan y se descartan al quedar
+    libres: las claves incluyen fechas y parámetros, no se acumulan.
+    """
+
+    def __init__(self, backend, ttl: int = REPORT_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._locks = {}  # clave -> [threading.Lock, usuarios]
+        self._async_locks = {}  # clave -> [asyncio.Lock, usuarios]
+        self._locks_guard = threading.Lock()
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    @asynccontextmanager
+    async def _async_key_lock(self, key: str):
+        # Solo desde el event loop: la cuenta no necesita otro lock
+        entry = self._async_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._async_locks[key]
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        """Devuelve el valor en caché o lo calcula con compute() y lo guarda"""
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            return value
+
+        with self._key_lock(key):
+            value = self.backend.get(key)
+            if value is _MISSING:
+                # Generación previa al cálculo: si invalidate() llega mientras tanto, no se guarda
+                generation = self.backend.generation()
+                value = compute()
+                self.backend.set(key, value, ttl or self.ttl, generation)
+        return value
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[Any]],
+                                   ttl: Optional[int] = None) -> Any:
+        """
+        Como get_or_compute para endpoints async: compute() es una corrutina (ej: run_db)
+
+        Las peticiones de la misma clave esperan con un asyncio.Lock, nunca con un
+        threading.Lock en el hilo del event loop (con ASYNC_DB_ENABLED, run_sync corre
+        ahí y bloquearía el loop mientras otra corrutina tiene el lock).
+        """
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            return value
+
+        async with self._async_key_lock(key):
+            value = self.backend.get(key)
+            if value is _MISSING:
+                generation = self.backend.generation()
+                value = await compute()
+                self.backend.set(key, value, ttl or self.ttl, generation)
+        return value
+
+    def invalidate(self) -> None:
+        """Descarta todos los reportes en caché"""
+        self.backend.clear()
+
+
+def build_report_cache() -> ReportCache:
+    """Crea la caché según la configuración (Redis si hay REPORT_CACHE_URL, memoria si no)"""
+    if REPORT_CACHE_URL:
+        return ReportCache(RedisCacheBackend(REPORT_CACHE_URL))
+    return ReportCache(MemoryCacheBackend())
+
+
+report_cache = build_report_cache()
+
+
+def invalidate_reports() -> None:
+    """Invalida los reportes tras una escritura que afecta inventario, asignaciones o empleados"""
+    report_cache.invalidate()
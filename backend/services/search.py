@@ -0,0 +1,216 @@
+from sqlalchemy import case, column, func, or_, select, table, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import Optional
+import threading
+
+from backend.models.assignment import Assignment
+from backend.models.device import Device
+from backend.models.employee import Employee
+
+# Columnas indexadas para la búsqueda global, por tabla
+SEARCH_COLUMNS = {
+    "devices": ("marca", "modelo", "imei", "numero_telefono"),
+    "employees": ("nombre_completo",),
+}
+
+# El tokenizador trigram de FTS5 necesita al menos 3 caracteres
+_FTS_MIN_LENGTH = 3
+
+# Motor de búsqueda disponible por base de datos: "trgm", "fts5" o "like"
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _search_backend(db: Session) -> str:
+    """Detecta (una vez por base de datos) si están instalados los índices de búsqueda"""
+    bind = db.get_bind()
+    key = str(bind.url)
+    with _backends_lock:
+        if key not in _backends:
+            if bind.dialect.name == "postgresql":
+                installed = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+                _backends[key] = "trgm" if installed else "like"
+            elif bind.dialect.name == "sqlite":
+                installed = db.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'devices_fts'")).first()
+                _backends[key] = "fts5" if installed else "like"
+            else:
+                _backends[key] = "like"
+        return _backends[key]
+
+
+def _like_pattern(term: str) -> str:
+    """Patrón '%term%' con los comodines del término escapados (carácter de escape '/')"""
+    escaped = term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
+def _ranked_matches(db: Session, model, term: str):
+    """
+    Ids de model que coinciden con el término y su relevancia (rank, mayor es mejor)
+
+    - PostgreSQL con pg_trgm: ILIKE servido por los índices GIN trigram, ordenado por
+      word_similarity.
+    - SQLite con FTS5: MATCH sobre la tabla trigram, ordenado por bm25.
+    - Sin índices (o término corto para FTS5): ILIKE, primero las coincidencias por prefijo.
+    """
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model.__tablename__]]
+    backend = _search_backend(db)
+
+    if backend == "fts5" and len(term) >= _FTS_MIN_LENGTH:
+        fts = table(f"{model.__tablename__}_fts", column("rowid"))
+        fts_ref = column(fts.name)
+        phrase = '"' + term.replace('"', '""') + '"'
+        rank = (-func.bm25(fts_ref)).label("rank")
+        stmt = select(fts.c.rowid.label("id"), rank).select_from(fts).where(fts_ref.op("MATCH")(phrase))
+    else:
+        pattern = _like_pattern(term)
+        condition = or_(*[c.ilike(pattern, escape="/") for c in columns])
+        if backend == "trgm":
+            rank = func.greatest(*[func.coalesce(func.word_similarity(term, c), 0) for c in columns])
+        else:
+            prefix = pattern[1:]
+            rank = case((or_(*[c.ilike(prefix, escape="/") for c in columns]), 1.0), else_=0.5)
+        rank = rank.label("rank")
+        stmt = select(model.id.label("id"), rank).where(condition)
+
+    return stmt.subquery()
+
+
+def _best_rank(*selects):
+    """Une varias fuentes de coincidencias (id, rank) quedándose con el mejor rank por id"""
+    combined = union_all(*selects).subquery()
+    return select(combined.c.id, func.max(combined.c.rank).label("rank")).group_by(combined.c.id).subquery()
+
+
+def employee_matches(db: Session, term: str):
+    """Empleados por nombre"""
+    return _ranked_matches(db, Employee, term)
+
+
+def device_matches(db: Session, term: str):
+    """Dispositivos por marca, modelo, IMEI, número o nombre del empleado que lo tiene asignado"""
+    devices = _ranked_matches(db, Device, term)
+    employees = _ranked_matches(db, Employee, term)
+    held = (
+        select(Assignment.device_id.label("id"), employees.c.rank)
+        .join(employees, employees.c.id == Assignment.employee_id)
+        .where(Assignment.fecha_devolucion == None)
+    )
+    return _best_rank(select(devices.c.id, devices.c.rank), held)
+
+
+def assignment_matches(db: Session, term: str):
+    """Asignaciones por nombre del empleado o datos del dispositivo"""
+    devices = _ranked_matches(db, Device, term)
+    employees = _ranked_matches(db, Employee, term)
+    return _best_rank(
+        select(Assignment.id.label("id"), devices.c.rank).join(devices, devices.c.id == Assignment.device_id),
+        select(Assignment.id.label("id"), employees.c.rank).join(employees, employees.c.id == Assignment.employee_id),
+    )
+
+
+MATCHERS = {
+    "devices": device_matches,
+    "employees": employee_matches,
+    "assignments": assignment_matches,
+}
+
+
+def join_search(query, db: Session, entity: str, id_column, term: Optional[str]):
+    """
+    Une una consulta con las coincidencias de la búsqueda global
+
+    Todas las coincidencias filtran la consulta (el total y las páginas no se
+    truncan); el tamaño de la respuesta lo acota la paginación.
+
+    Returns:
+        (consulta, rank): rank es la columna de relevancia, o None si no hay término
+    """
+    term = (term or "").strip()
+    if not term:
+        return query, None
+
+    matches = MATCHERS[entity](db, term)
+    return query.join(matches, matches.c.id == id_column), matches.c.rank
+
+
+def apply_search(query, db: Session, entity: str, id_column, term: Optional[str],
+                 ranked: bool = True):
+    """
+    Filtra una consulta con la búsqueda global (función compartida por listados y exportaciones)
+
+    Args:
+        query: Consulta a filtrar
+        db: Sesión
+        entity: "devices", "employees" o "assignments"
+        id_column: Columna id de la entidad en la consulta (ej: Device.id)
+        term: Texto buscado (vacío = sin filtro)
+        ranked: Ordenar primero por relevancia
+
+    Returns:
+        La consulta unida a las coincidencias
+    """
+    query, rank = join_search(query, db, entity, id_column, term)
+    if ranked and rank is not None:
+        query = query.order_by(rank.desc())
+    return query
+
+
+def _install_trgm(conn) -> None:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for table_name, columns in SEARCH_COLUMNS.items():
+        for name in columns:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{name}_trgm "
+                f"ON {table_name} USING gin ({name} gin_trgm_ops)"
+            ))
+
+
+def _install_fts5(conn) -> None:
+    for table_name, columns in SEARCH_COLUMNS.items():
+        fts = f"{table_name}_fts"
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table_name}', content_rowid='id', tokenize='trigram')"
+        ))
+        # Triggers: el índice se mantiene al día en cada escritura
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table_name} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        ))
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def install_search_indexes(engine: Engine) -> str:
+    """
+    Crea los índices de búsqueda (idempotente)
+
+    PostgreSQL: extensión pg_trgm e índices GIN trigram. SQLite: tablas FTS5 trigram
+    sincronizadas por triggers. Devuelve el motor instalado.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            _install_trgm(conn)
+            backend = "trgm"
+        elif engine.dialect.name == "sqlite":
+            _install_fts5(conn)
+            backend = "fts5"
+        else:
+            backend = "like"
+
+    with _backends_lock:
+        _backends[str(engine.url)] = backend
+    return backend
@@ -0,0 +1,174 @@
+# Foto diaria del inventario (fleet_snapshots): la tendencia histórica se lee de unas
+# cientos de filas en lugar de recalcular todo el historial de asignaciones
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+import os
+import threading
+
+from backend.database import SessionLocal
+from backend.models.assignment import Assignment
+from backend.models.device import Device, DeviceStatus
+from backend.models.employee import Employee
+from backend.models.fleet_snapshot import FleetSnapshot
+from backend.services.depreciation import device_valuation_subquery
+from backend.services.plan_costs import run_plan_cost_refresh
+
+load_dotenv()
+
+# Foto programada una vez al día a esta hora local (HH:MM), en un hilo de cada worker
+SNAPSHOT_SCHEDULER_ENABLED = os.getenv("SNAPSHOT_SCHEDULER_ENABLED", "True").lower() == "true"
+SNAPSHOT_TIME = os.getenv("SNAPSHOT_TIME", "23:50")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def compute_snapshot(db: Session, fecha: date) -> dict:
+    """Conteos por estado, costo, valor en libros a la fecha y asignaciones activas (una consulta)"""
+    valuation = device_valuation_subquery(fecha, Device.estado)
+    row = db.execute(
+        select(
+            func.count(valuation.c.id).label("dispositivos"),
+            *[func.count(valuation.c.id).filter(valuation.c.estado == estado).label(estado.value)
+              for estado in DeviceStatus],
+            func.coalesce(func.sum(valuation.c.costo_inicial), 0).label("costo_total"),
+            func.coalesce(func.sum(valuation.c.valor_actual), 0).label("valor_libros"),
+            select(func.count(Assignment.id)).where(Assignment.fecha_devolucion.is_(None))
+            .scalar_subquery().label("asignaciones_activas"),
+            select(func.count(Employee.id)).scalar_subquery().label("empleados"),
+        )
+    ).one()
+    return {
+        "dispositivos": row.dispositivos,
+        "disponibles": getattr(row, DeviceStatus.DISPONIBLE.value),
+        "asignados": getattr(row, DeviceStatus.ASIGNADO.value),
+        "baja": getattr(row, DeviceStatus.BAJA.value),
+        "costo_total": round(float(row.costo_total), 2),
+        "valor_libros": round(float(row.valor_libros), 2),
+        "asignaciones_activas": row.asignaciones_activas,
+        "empleados": row.empleados,
+    }
+
+
+def take_snapshot(db: Session, origen: str = "manual", today: Optional[date] = None) -> FleetSnapshot:
+    """
+    Guarda (o reemplaza) la foto del día con el estado actual del inventario
+
+    Una fila por fecha: tomarla de nuevo el mismo día la actualiza, así la foto
+    programada de la noche deja el estado al cierre del día.
+
+    Args:
+        db: Sesión
+        origen: "programado" o "manual"
+        today: Fecha de la foto (default: hoy)
+
+    Returns:
+        La foto guardada
+    """
+    fecha = today or date.today()
+    values = compute_snapshot(db, fecha)
+    for attempt in range(2):
+        snapshot = db.query(FleetSnapshot).filter(FleetSnapshot.fecha == fecha).first()
+        if snapshot is None:
+            snapshot = FleetSnapshot(fecha=fecha)
+            db.add(snapshot)
+        for key, value in values.items():
+            setattr(snapshot, key, value)
+        snapshot.origen = origen
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # Otro worker insertó la foto del día al mismo tiempo: se actualiza la suya
+            db.rollback()
+            if attempt:
+                raise
+    db.refresh(snapshot)
+    return snapshot
+
+
+def has_snapshot(db: Session, fecha: date) -> bool:
+    return db.query(FleetSnapshot.id).filter(FleetSnapshot.fecha == fecha).first() is not None
+
+
+def _parse_time(value: str) -> time:
+    try:
+        hours, minutes = value.split(":")
+        return time(int(hours), int(minutes))
+    except ValueError:
+        print(f"⚠️  SNAPSHOT_TIME inválido ({value!r}), se usa 23:50")
+        return time(23, 50)
+
+
+class SnapshotScheduler:
+    """
+    Hilo que toma la foto diaria a la hora configurada
+
+    Al iniciar toma la del día si todavía no existe (servidor apagado a la hora
+    programada). Con varios workers cada uno tiene su hilo; la restricción única por
+    fecha deja una sola fila. Cada pasada también completa plan_cost_rollups (el mes
+    que acaba de cerrar).
+    """
+
+    def __init__(self, at: time):
+        self.at = at
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="snapshots", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        next_run = datetime.combine(now.date(), self.at)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def _snapshot(self, only_if_missing: bool = False) -> None:
+        db = SessionLocal()
+        try:
+            if only_if_missing and has_snapshot(db, date.today()):
+                return
+            snapshot = take_snapshot(db, origen="programado")
+            print(f"✓ Foto del inventario del {snapshot.fecha.isoformat()} guardada")
+        except Exception as e:
+            print(f"✗ Error tomando la foto del inventario: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        self._snapshot(only_if_missing=True)
+        run_plan_cost_refresh()
+        while not self._stop.wait(self.seconds_until_next()):
+            self._snapshot()
+            run_plan_cost_refresh()
+
+
+def start_scheduler() -> None:
+    """Inicia la foto diaria programada (si SNAPSHOT_SCHEDULER_ENABLED)"""
+    global _scheduler
+    if not SNAPSHOT_SCHEDULER_ENABLED:
+        return
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SnapshotScheduler(_parse_time(SNAPSHOT_TIME))
+            _scheduler.start()
+
+
+def shutdown() -> None:
+    """Detiene el hilo de la foto diaria"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
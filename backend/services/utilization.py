@@ -0,0 +1,121 @@
+from sqlalchemy import Date, Float, Integer, case, cast, func, literal, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from datetime import date, timedelta
+from typing import Optional
+
+from backend.models.assignment import Assignment
+from backend.models.device import Device
+
+
+class day_number(FunctionElement):
+    """Número de día de una fecha: la resta de dos da los días entre ellas (PostgreSQL y SQLite)"""
+    type = Integer()
+    name = "day_number"
+    inherit_cache = True
+
+
+@compiles(day_number)
+def _day_number(element, compiler, **kw):
+    return f"({compiler.process(element.clauses, **kw)} - DATE '1970-01-01')"
+
+
+@compiles(day_number, "sqlite")
+def _day_number_sqlite(element, compiler, **kw):
+    return f"CAST(julianday({compiler.process(element.clauses, **kw)}) AS INTEGER)"
+
+
+def _greatest(a, b):
+    return case((a > b, a), else_=b)
+
+
+def _least(a, b):
+    return case((a < b, a), else_=b)
+
+
+def utilization_window(desde: date, hasta: date, today: Optional[date] = None) -> date:
+    """Fin (exclusivo) del periodo: el día siguiente a hasta, sin pasar de hoy"""
+    return min(hasta + timedelta(days=1), today or date.today())
+
+
+def device_utilization_subquery(desde: date, hasta: date, today: Optional[date] = None):
+    """
+    Uso de cada dispositivo entre desde y hasta, calculado en la base
+
+    Los días cuentan como Assignment.dias_asignado (la devolución no cuenta, una
+    asignación activa llega hasta hoy) y el periodo de cada equipo empieza en su fecha
+    de compra. El máximo de los fines anteriores del mismo equipo (MAX como función de
+    ventana hasta la fila previa) da el tiempo en el cajón antes de cada asignación y
+    evita contar dos veces los tramos solapados o anidados del historial importado.
+
+    Returns:
+        Subquery por dispositivo con id, dias_periodo, dias_asignado, dias_inactivo,
+        utilizacion (0-100, None sin periodo), responsables, asignaciones,
+        inactivo_max y dias_sin_asignar (inactivo al final del periodo)
+    """
+    today = today or date.today()
+    fin_periodo = utilization_window(desde, hasta, today)
+    inicio = day_number(literal(desde, Date))
+    fin = day_number(literal(fin_periodo, Date))
+    inicio_equipo = _greatest(inicio, day_number(Device.fecha_compra))
+
+    # Una fila por asignación iniciada antes del fin del periodo, con el mayor fin de las anteriores
+    fin_asignacion = day_number(func.coalesce(Assignment.fecha_devolucion, literal(today, Date)))
+    tramos = (
+        select(
+            Assignment.device_id,
+            Assignment.employee_id,
+            day_number(Assignment.fecha_asignacion).label("ini"),
+            fin_asignacion.label("fin"),
+            func.max(fin_asignacion).over(
+                partition_by=Assignment.device_id,
+                order_by=(Assignment.fecha_asignacion, Assignment.id),
+                rows=(None, -1),
+            ).label("fin_anterior"),
+            inicio_equipo.label("inicio"),
+        )
+        .join(Device, Assignment.device_id == Device.id)
+        .where(Assignment.fecha_asignacion < fin_periodo)
+        .subquery()
+    )
+
+    # Recorte al periodo: desde el mayor entre el inicio, el del equipo y el fin de las anteriores
+    desde_tramo = _greatest(_greatest(tramos.c.ini, tramos.c.inicio), func.coalesce(tramos.c.fin_anterior, tramos.c.inicio))
+    hasta_tramo = _least(tramos.c.fin, fin)
+    anterior = _greatest(func.coalesce(tramos.c.fin_anterior, tramos.c.inicio), tramos.c.inicio)
+    por_equipo = (
+        select(
+            tramos.c.device_id,
+            func.sum(_greatest(hasta_tramo - desde_tramo, 0)).label("asignado"),
+            func.max(_greatest(_least(tramos.c.ini, fin) - anterior, 0)).label("hueco_max"),
+            func.max(hasta_tramo).label("ultimo_fin"),
+            func.count().label("asignaciones"),
+            func.count(func.distinct(tramos.c.employee_id)).label("responsables"),
+        )
+        .where(tramos.c.fin > tramos.c.inicio, tramos.c.ini < fin)
+        .group_by(tramos.c.device_id)
+        .subquery()
+    )
+
+    periodo = _greatest(fin - inicio_equipo, 0)
+    asignado = func.coalesce(por_equipo.c.asignado, 0)
+    final = case(
+        (por_equipo.c.ultimo_fin.is_(None), periodo),
+        else_=_greatest(fin - _greatest(por_equipo.c.ultimo_fin, inicio_equipo), 0),
+    )
+    return (
+        select(
+            Device.id.label("id"),
+            periodo.label("dias_periodo"),
+            asignado.label("dias_asignado"),
+            (periodo - asignado).label("dias_inactivo"),
+            case((periodo > 0, cast(asignado, Float) * 100 / periodo)).label("utilizacion"),
+            func.coalesce(por_equipo.c.responsables, 0).label("responsables"),
+            func.coalesce(por_equipo.c.asignaciones, 0).label("asignaciones"),
+            _greatest(func.coalesce(por_equipo.c.hueco_max, 0), final).label("inactivo_max"),
+            final.label("dias_sin_asignar"),
+        )
+        .outerjoin(por_equipo, por_equipo.c.device_id == Device.id)
+        .where(Device.fecha_compra < fin_periodo)
+        .subquery()
+    )